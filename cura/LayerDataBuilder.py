@@ -7,17 +7,35 @@ from UM.Mesh.MeshBuilder import MeshBuilder
 from .LayerData import LayerData
 
 import numpy
-from typing import Dict, Optional
+from typing import Dict, Optional, Set, Tuple
 
 
 class LayerDataBuilder(MeshBuilder):
     """Builder class for constructing a :py:class:`cura.LayerData.LayerData` object"""
 
+    # The shape of an element and the type of each buffer that has an element per vertex.
+    _vertex_buffer_formats = {
+        "vertices": ((3, ), numpy.float32),
+        "colors": ((4, ), numpy.float32),
+        "line_dimensions": ((2, ), numpy.float32),
+        "feedrates": ((), numpy.float32),
+        "extruders": ((), numpy.float32),
+        "line_types": ((), numpy.float32),
+        "material_colors": ((4, ), numpy.float32)
+    }  # type: Dict[str, Tuple[Tuple[int, ...], type]]
+
     def __init__(self) -> None:
         super().__init__()
         self._layers = {}  # type: Dict[int, Layer]
         self._element_counts = {}  # type: Dict[int, int]
 
+        # Buffers of the layers that were built so far, so that build(incremental = True) can append to them. They
+        # have room for more vertices and indices than were built, so that they don't need to grow with every build.
+        self._built_layers = set()  # type: Set[int]
+        self._built_buffers = {}  # type: Dict[str, numpy.ndarray]
+        self._built_vertex_count = 0
+        self._built_index_count = 0
+
     def addLayer(self, layer: int) -> None:
         if layer not in self._layers:
             self._layers[layer] = Layer(layer)
@@ -43,76 +61,123 @@ class LayerDataBuilder(MeshBuilder):
 
         self._layers[layer].setThickness(thickness)
 
-    def build(self, material_color_map, line_type_brightness = 1.0):
+    def build(self, material_color_map, line_type_brightness = 1.0, incremental = False):
         """Return the layer data as :py:class:`cura.LayerData.LayerData`.
 
         :param material_color_map: [r, g, b, a] for each extruder row.
         :param line_type_brightness: compatibility layer view uses line type brightness of 0.5
+        :param incremental: Only build the layers that were added since the previous call and append them to the
+            buffers that were built then, instead of rebuilding the entire mesh. If a new layer would end up in
+            between layers that were already built, the entire mesh is rebuilt anyway.
         """
 
-        vertex_count = 0
-        index_count = 0
-        for layer, data in self._layers.items():
-            vertex_count += data.lineMeshVertexCount()
-            index_count += data.lineMeshElementCount()
-
-        vertices = numpy.empty((vertex_count, 3), numpy.float32)
-        line_dimensions = numpy.empty((vertex_count, 2), numpy.float32)
-        colors = numpy.empty((vertex_count, 4), numpy.float32)
-        indices = numpy.empty((index_count, 2), numpy.int32)
-        feedrates = numpy.empty((vertex_count), numpy.float32)
-        extruders = numpy.empty((vertex_count), numpy.float32)
-        line_types = numpy.empty((vertex_count), numpy.float32)
-
-        vertex_offset = 0
-        index_offset = 0
-        for layer, data in sorted(self._layers.items()):
-            vertex_offset, index_offset = data.build(vertex_offset, index_offset, vertices, colors, line_dimensions, feedrates, extruders, line_types, indices)
-            self._element_counts[layer] = data.elementCount
-
-        self.addVertices(vertices)
+        new_layers = sorted(layer for layer in self._layers if layer not in self._built_layers)
+        if not incremental or not self._built_layers or (new_layers and new_layers[0] < max(self._built_layers)):
+            self._built_layers = set()
+            self._built_buffers = {}
+            self._built_vertex_count = 0
+            self._built_index_count = 0
+            self._element_counts = {}
+            new_layers = sorted(self._layers)
+
+        vertex_start = self._built_vertex_count
+        index_start = self._built_index_count
+        vertex_end = vertex_start + sum(self._layers[layer].lineMeshVertexCount() for layer in new_layers)
+        index_end = index_start + sum(self._layers[layer].lineMeshElementCount() for layer in new_layers)
+        self._reserveBuffers(vertex_end, index_end, grow = incremental)
+        buffers = self._built_buffers
+
+        # The new layers are built into the buffers right after the layers that were built before.
+        vertex_offset = vertex_start
+        index_offset = index_start
+        for layer in new_layers:
+            vertex_offset, index_offset = self._layers[layer].build(vertex_offset, index_offset, buffers["vertices"], buffers["colors"], buffers["line_dimensions"], buffers["feedrates"], buffers["extruders"], buffers["line_types"], buffers["indices"])
+            self._element_counts[layer] = self._layers[layer].elementCount
+            self._built_layers.add(layer)
+        self._built_vertex_count = vertex_end
+        self._built_index_count = index_end
+
+        colors = buffers["colors"][vertex_start:vertex_end]
+        extruders = buffers["extruders"][vertex_start:vertex_end]
+        line_types = buffers["line_types"][vertex_start:vertex_end]
         colors[:, 0:3] *= line_type_brightness
-        self.addColors(colors)
-        self.addIndices(indices.flatten())
 
         # Note: we're using numpy indexing here.
         # See also: https://docs.scipy.org/doc/numpy/reference/arrays.indexing.html
-        material_colors = numpy.zeros((line_dimensions.shape[0], 4), dtype=numpy.float32)
+        material_colors = buffers["material_colors"][vertex_start:vertex_end]
+        material_colors[:] = 0
         for extruder_nr in range(material_color_map.shape[0]):
             material_colors[extruders == extruder_nr] = material_color_map[extruder_nr]
         # Set material_colors with indices where line_types (also numpy array) == MoveCombingType
         material_colors[line_types == LayerPolygon.MoveCombingType] = colors[line_types == LayerPolygon.MoveCombingType]
         material_colors[line_types == LayerPolygon.MoveRetractionType] = colors[line_types == LayerPolygon.MoveRetractionType]
 
+        # The mesh gets the parts of the buffers that were built. They are read-only, so that the mesh uses them
+        # instead of copying them. Later builds only write after these parts.
+        buffers = {name: self._builtPart(buffer, vertex_end) for name, buffer in buffers.items() if name != "indices"}
+        buffers["indices"] = self._builtPart(self._built_buffers["indices"], index_end).reshape(-1)
+
         attributes = {
             "line_dimensions": {
-                "value": line_dimensions,
+                "value": buffers["line_dimensions"],
                 "opengl_name": "a_line_dim",
                 "opengl_type": "vector2f"
                 },
             "extruders": {
-                "value": extruders,
+                "value": buffers["extruders"],
                 "opengl_name": "a_extruder",
                 "opengl_type": "float"  # Strangely enough, the type has to be float while it is actually an int.
                 },
             "colors": {
-                "value": material_colors,
+                "value": buffers["material_colors"],
                 "opengl_name": "a_material_color",
                 "opengl_type": "vector4f"
                 },
             "line_types": {
-                "value": line_types,
+                "value": buffers["line_types"],
                 "opengl_name": "a_line_type",
                 "opengl_type": "float"
                 },
             "feedrates": {
-                "value": feedrates,
+                "value": buffers["feedrates"],
                 "opengl_name": "a_feedrate",
                 "opengl_type": "float"
                 }
             }
 
-        return LayerData(vertices=self.getVertices(), normals=self.getNormals(), indices=self.getIndices(),
-                        colors=self.getColors(), uvs=self.getUVCoordinates(), file_name=self.getFileName(),
-                        center_position=self.getCenterPosition(), layers=self._layers,
-                        element_counts=self._element_counts, attributes=attributes)
+        # Only hand out the layers that are in the mesh, since layers that were added later have no vertices yet.
+        layers = {layer: self._layers[layer] for layer in self._built_layers}
+        return LayerData(vertices=buffers["vertices"], normals=self.getNormals(), indices=buffers["indices"],
+                        colors=buffers["colors"], uvs=self.getUVCoordinates(), file_name=self.getFileName(),
+                        center_position=self.getCenterPosition(), layers=layers,
+                        element_counts=dict(self._element_counts), attributes=attributes)
+
+    def _reserveBuffers(self, vertex_count: int, index_count: int, grow: bool) -> None:
+        """Make sure that the buffers have room for a number of vertices and indices, keeping what was built so far.
+
+        :param grow: Whether to make room for more than that when the buffers are too small, so that appending to them
+            again doesn't make them grow again right away. The total of the copies is then linear in the final size.
+        """
+
+        vertex_capacity = len(self._built_buffers["vertices"]) if "vertices" in self._built_buffers else -1
+        if vertex_count > vertex_capacity:
+            vertex_capacity = max(vertex_count, 2 * vertex_capacity) if grow else vertex_count
+            for name, (shape, dtype) in self._vertex_buffer_formats.items():
+                self._built_buffers[name] = self._grownBuffer(self._built_buffers.get(name), self._built_vertex_count, (vertex_capacity, ) + shape, dtype)
+        index_capacity = len(self._built_buffers["indices"]) if "indices" in self._built_buffers else -1
+        if index_count > index_capacity:
+            index_capacity = max(index_count, 2 * index_capacity) if grow else index_count
+            self._built_buffers["indices"] = self._grownBuffer(self._built_buffers.get("indices"), self._built_index_count, (index_capacity, 2), numpy.int32)
+
+    @staticmethod
+    def _grownBuffer(buffer: Optional[numpy.ndarray], used_count: int, shape: Tuple[int, ...], dtype: type) -> numpy.ndarray:
+        new_buffer = numpy.empty(shape, dtype)
+        if buffer is not None and used_count > 0:
+            new_buffer[:used_count] = buffer[:used_count]
+        return new_buffer
+
+    @staticmethod
+    def _builtPart(buffer: numpy.ndarray, count: int) -> numpy.ndarray:
+        part = buffer[:count]
+        part.flags.writeable = False
+        return part
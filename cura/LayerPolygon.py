@@ -2,7 +2,7 @@
 # Cura is released under the terms of the LGPLv3 or higher.
 import numpy
 
-from typing import Optional, cast
+from typing import List, Optional, cast
 
 from UM.Qt.Bindings.Theme import Theme
 from UM.Qt.QtApplication import QtApplication
@@ -26,6 +26,10 @@ class LayerPolygon:
 
     __jump_map = numpy.logical_or(numpy.logical_or(numpy.arange(__number_of_types) == NoneType, numpy.arange(__number_of_types) == MoveCombingType), numpy.arange(__number_of_types) == MoveRetractionType)
 
+    # When type is used as index returns true if type == LayerPolygon.InfillType or type == LayerPolygon.SkinType or type == LayerPolygon.SupportInfillType
+    # Should be generated in better way, not hardcoded.
+    __is_infill_or_skin_type_map = numpy.array([0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0], dtype = bool)
+
     def __init__(self, extruder: int, line_types: numpy.ndarray, data: numpy.ndarray, line_widths: numpy.ndarray, line_thicknesses: numpy.ndarray, line_feedrates: numpy.ndarray) -> None:
         """LayerPolygon, used in ProcessSlicedLayersJob
 
@@ -38,11 +42,7 @@ class LayerPolygon:
         """
 
         self._extruder = extruder
-        self._types = line_types
-        for i in range(len(self._types)):
-            if self._types[i] >= self.__number_of_types: # Got faulty line data from the engine.
-                Logger.log("w", "Found an unknown line type: %s", i)
-                self._types[i] = self.NoneType
+        self._types = self.clampLineTypes(line_types)
         self._data = data
         self._line_widths = line_widths
         self._line_thicknesses = line_thicknesses
@@ -63,13 +63,92 @@ class LayerPolygon:
         self._color_map = LayerPolygon.getColorMap()
         self._colors = self._color_map[self._types]  # type: numpy.ndarray
 
-        # When type is used as index returns true if type == LayerPolygon.InfillType or type == LayerPolygon.SkinType or type == LayerPolygon.SupportInfillType
-        # Should be generated in better way, not hardcoded.
-        self._is_infill_or_skin_type_map = numpy.array([0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0], dtype = numpy.bool)
-
         self._build_cache_line_mesh_mask = None  # type: Optional[numpy.ndarray]
         self._build_cache_needed_points = None  # type: Optional[numpy.ndarray]
 
+    @classmethod
+    def fromArrays(cls, extruders: numpy.ndarray, line_offsets: numpy.ndarray, line_types: numpy.ndarray, data: numpy.ndarray, line_widths: numpy.ndarray, line_thicknesses: numpy.ndarray, line_feedrates: numpy.ndarray) -> List["LayerPolygon"]:
+        """Create many LayerPolygons at once from concatenated arrays.
+
+        Everything that the constructor and buildCache compute per polygon is computed here for all polygons in one
+        go. The polygons get views on the concatenated arrays.
+        :param extruders: array with the position of the extruder of each polygon
+        :param line_offsets: array with the index of the first line of each polygon, followed by the total line count
+        :param line_types: array with line_types of all polygons
+        :param data: points of all polygons. Each polygon has one point more than it has lines.
+        :param line_widths: array with line widths of all polygons
+        :param line_thicknesses: array with line thicknesses of all polygons
+        :param line_feedrates: array with line feedrates of all polygons
+        :return: A list with a LayerPolygon per polygon, with its cache built.
+        """
+
+        line_types = cls.clampLineTypes(line_types)
+        line_begins = line_offsets[:-1]
+        line_ends = line_offsets[1:]
+        line_counts = line_ends - line_begins
+
+        jump_mask = cls.__jump_map[line_types]
+        color_map = cls.getColorMap()
+        colors = color_map[line_types]
+
+        # Only if the type of line segment changes do we need to add an extra vertex to change colors. The first line
+        # of each polygon always needs its own first vertex.
+        same_type = numpy.zeros(len(line_types), dtype = bool)
+        same_type[1:] = (line_types[1:] == line_types[:-1]).ravel()
+        same_type[line_begins[line_counts > 0]] = False
+        needed_points = numpy.ones((len(line_types), 2), dtype = bool)
+        needed_points[:, 0] = numpy.logical_not(same_type)
+
+        # Sums per polygon are the differences of cumulative sums at the polygon boundaries.
+        jump_sums = numpy.concatenate(([0], numpy.cumsum(jump_mask)))
+        jump_counts = jump_sums[line_ends] - jump_sums[line_begins]
+        same_type_sums = numpy.concatenate(([0], numpy.cumsum(same_type)))
+        same_type_counts = same_type_sums[line_ends] - same_type_sums[line_begins]
+
+        polygons = []  # type: List[LayerPolygon]
+        for i in range(len(line_counts)):
+            begin = line_begins[i]
+            end = line_ends[i]
+            polygon = cls.__new__(cls)
+            polygon._extruder = int(extruders[i])
+            polygon._types = line_types[begin:end]
+            # Polygon i starts i points after its first line, since each polygon before it has one extra point.
+            polygon._data = data[begin + i:end + i + 1]
+            polygon._line_widths = line_widths[begin:end]
+            polygon._line_thicknesses = line_thicknesses[begin:end]
+            polygon._line_feedrates = line_feedrates[begin:end]
+
+            polygon._jump_mask = jump_mask[begin:end]
+            polygon._jump_count = jump_counts[i]
+            polygon._mesh_line_count = line_counts[i] - jump_counts[i]
+            polygon._vertex_count = polygon._mesh_line_count + same_type_counts[i]
+            polygon._color_map = color_map
+            polygon._colors = colors[begin:end]
+
+            # The same as what buildCache computes: all lines are in the line mesh.
+            polygon._build_cache_line_mesh_mask = numpy.ones(polygon._jump_mask.shape, dtype = bool)
+            polygon._build_cache_needed_points = needed_points[begin:end]
+            polygon._vertex_begin = 0
+            polygon._vertex_end = 2 * line_counts[i] - same_type_counts[i]
+            polygon._index_begin = 0
+            polygon._index_end = line_counts[i]
+            polygons.append(polygon)
+        return polygons
+
+    @classmethod
+    def clampLineTypes(cls, line_types: numpy.ndarray) -> numpy.ndarray:
+        """Replace line types that are unknown to the front-end with NoneType.
+
+        :param line_types: array with line types, which may be read-only.
+        :return: array with the known line types. This is the original array if all line types were known.
+        """
+
+        unknown = line_types >= cls.__number_of_types
+        if numpy.any(unknown):  # Got faulty line data from the engine.
+            Logger.log("w", "Found %s unknown line types", numpy.count_nonzero(unknown))
+            line_types = numpy.where(unknown, cls.NoneType, line_types).astype(line_types.dtype)
+        return line_types
+
     def buildCache(self) -> None:
         # For the line mesh we do not draw Infill or Jumps. Therefore those lines are filtered out.
         self._build_cache_line_mesh_mask = numpy.ones(self._jump_mask.shape, dtype = bool)
@@ -112,10 +191,12 @@ class LayerPolygon:
         line_mesh_mask = self._build_cache_line_mesh_mask
         needed_points_list = self._build_cache_needed_points
 
-        # Index to the points we need to represent the line mesh. This is constructed by generating simple
-        # start and end points for each line. For line segment n these are points n and n+1. Row n reads [n n+1] 
-        # Then then the indices for the points we don't need are thrown away based on the pre-calculated list. 
-        index_list = ( numpy.arange(len(self._types)).reshape((-1, 1)) + numpy.array([[0, 1]]) ).reshape((-1, 1))[needed_points_list.reshape((-1, 1))]
+        # Index to the points we need to represent the line mesh. Each line segment n has a start and end vertex, at
+        # flat position 2n and 2n+1 of the needed points list, which are points n and n+1.
+        # The indices for the points we don't need are thrown away based on the pre-calculated list.
+        needed_positions = numpy.flatnonzero(needed_points_list)
+        line_list = needed_positions >> 1  # The line segment that each vertex belongs to.
+        index_list = line_list + (needed_positions & 1)  # The point that each vertex is.
 
         # The relative values of begin and end indices have already been set in buildCache, so we only need to offset them to the parents offset.
         self._vertex_begin += vertex_offset
@@ -124,20 +205,20 @@ class LayerPolygon:
         # Points are picked based on the index list to get the vertices needed. 
         vertices[self._vertex_begin:self._vertex_end, :] = self._data[index_list, :]
 
-        # Create an array with colors for each vertex and remove the color data for the points that has been thrown away. 
-        colors[self._vertex_begin:self._vertex_end, :] = numpy.tile(self._colors, (1, 2)).reshape((-1, 4))[needed_points_list.ravel()]
+        # The per line data is picked for each vertex based on the line it belongs to.
+        colors[self._vertex_begin:self._vertex_end, :] = self._colors.reshape((-1, 4))[line_list]
 
         # Create an array with line widths and thicknesses for each vertex.
-        line_dimensions[self._vertex_begin:self._vertex_end, 0] = numpy.tile(self._line_widths, (1, 2)).reshape((-1, 1))[needed_points_list.ravel()][:, 0]
-        line_dimensions[self._vertex_begin:self._vertex_end, 1] = numpy.tile(self._line_thicknesses, (1, 2)).reshape((-1, 1))[needed_points_list.ravel()][:, 0]
+        line_dimensions[self._vertex_begin:self._vertex_end, 0] = self._line_widths.ravel()[line_list]
+        line_dimensions[self._vertex_begin:self._vertex_end, 1] = self._line_thicknesses.ravel()[line_list]
 
         # Create an array with feedrates for each line
-        feedrates[self._vertex_begin:self._vertex_end] = numpy.tile(self._line_feedrates, (1, 2)).reshape((-1, 1))[needed_points_list.ravel()][:, 0]
+        feedrates[self._vertex_begin:self._vertex_end] = self._line_feedrates.ravel()[line_list]
 
         extruders[self._vertex_begin:self._vertex_end] = self._extruder
 
         # Convert type per vertex to type per line
-        line_types[self._vertex_begin:self._vertex_end] = numpy.tile(self._types, (1, 2)).reshape((-1, 1))[needed_points_list.ravel()][:, 0]
+        line_types[self._vertex_begin:self._vertex_end] = self._types.ravel()[line_list]
 
         # The relative values of begin and end indices have already been set in buildCache, so we only need to offset them to the parents offset.
         self._index_begin += index_offset
@@ -160,7 +241,7 @@ class LayerPolygon:
         return self._color_map[line_types]
 
     def isInfillOrSkinType(self, line_types: numpy.ndarray) -> numpy.ndarray:
-        return self._is_infill_or_skin_type_map[line_types]
+        return self.__is_infill_or_skin_type_map[line_types]
 
     def lineMeshVertexCount(self) -> int:
         return self._vertex_end - self._vertex_begin
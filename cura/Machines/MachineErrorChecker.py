@@ -1,28 +1,53 @@
 # Copyright (c) 2020 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+import threading
 import time
 
-from collections import deque
+from functools import partial
 
 from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtProperty
-from typing import Optional, Any, Set
+from typing import Callable, Dict, Iterable, List, Optional, Any, Set, Tuple, TYPE_CHECKING
 
+from UM.Job import Job
 from UM.Logger import Logger
 from UM.Settings.SettingDefinition import SettingDefinition
+from UM.Settings.SettingRelation import RelationType
 from UM.Settings.Validator import ValidatorState
 
 import cura.CuraApplication
 
+if TYPE_CHECKING:
+    from UM.Settings.ContainerStack import ContainerStack
+    from UM.Settings.Interfaces import ContainerInterface
+    from UM.Settings.SettingRelation import SettingRelation
+    from cura.Settings.GlobalStack import GlobalStack
+
+
+def _hasErrorValue(stack: "ContainerStack", key: str) -> bool:
+    """Whether a setting in a stack has a value that is not valid."""
+
+    validation_state = stack.getProperty(key, "validationState")
+    if validation_state is None:
+        # Setting is not validated. This can happen if there is only a setting definition.
+        # We do need to validate it, because a setting definitions value can be set by a function, which could
+        # be an invalid setting.
+        definition = stack.getSettingDefinition(key)
+        validator_type = SettingDefinition.getValidatorForType(definition.type)
+        if validator_type:
+            validator = validator_type(key)
+            validation_state = validator(stack)
+    return validation_state in (ValidatorState.Exception, ValidatorState.MaximumError, ValidatorState.MinimumError, ValidatorState.Invalid)
+
 
 class MachineErrorChecker(QObject):
     """This class performs setting error checks for the currently active machine.
 
-    The whole error checking process is pretty heavy which can take ~0.5 secs, so it can cause GUI to lag. The idea
-    here is to split the whole error check into small tasks, each of which only checks a single setting key in a
-    stack. According to my profiling results, the maximal runtime for such a sub-task is <0.03 secs, which should be
-    good enough. Moreover, if any changes happened to the machine, we can cancel the check in progress without wait
-    for it to finish the complete work.
+    Checking all settings is pretty heavy and can take ~0.5 secs. So all settings are only checked when the containers
+    of the machine change. When a setting value changes, only that setting and the settings that depend on it are
+    checked again. The settings are checked by a job on a worker thread, against a snapshot of the settings, and the
+    results are applied all at once on the main thread. If the machine changes during a check, another check is
+    started as soon as it is done.
     """
 
     def __init__(self, parent: Optional[QObject] = None) -> None:
@@ -31,10 +56,8 @@ class MachineErrorChecker(QObject):
         self._global_stack = None
 
         self._has_errors = True  # Result of the error check, indicating whether there are errors in the stack
-        self._error_keys = set()  # type: Set[str] # A set of settings keys that have errors
-        self._error_keys_in_progress = set()  # type: Set[str]  # The variable that stores the results of the currently in progress check
-
-        self._stacks_and_keys_to_check = None  # type: Optional[deque]  # a FIFO queue of tuples (stack, key) to check for errors
+        self._error_keys = {}  # type: Dict[str, Set[str]] # The keys of the settings that have errors, per stack ID.
+        self._check_job = None  # type: Optional[ValidateSettingsJob] # The job of the check that is in progress.
 
         self._need_to_check = False  # Whether we need to schedule a new check or not. This flag is set when a new
                                      # error check needs to take place while there is already one running at the moment.
@@ -51,7 +74,22 @@ class MachineErrorChecker(QObject):
         self._error_check_timer.setInterval(100)
         self._error_check_timer.setSingleShot(True)
 
-        self._keys_to_check = set()  # type: Set[str]
+        self._keys_to_check = set()  # type: Set[str] # Settings that changed since the last check.
+        self._check_all_keys = True  # Whether all settings need to be checked, e.g. because the containers changed.
+
+        # Set whenever there is no error check scheduled or in progress, so that other threads can wait for the result.
+        self._check_finished_event = threading.Event()
+        self._check_finished_event.set()
+        self.needToWaitForResultChanged.connect(self._updateCheckFinishedEvent)
+
+        # Whether the settings that are changed in the top of a stack have errors, by stack ID. Cleared when the stack
+        # or the machine changes.
+        self._stack_has_errors = {}  # type: Dict[str, bool]
+        self._stack_has_errors_lock = threading.Lock()
+        # Increased whenever results are cleared, so that results of checks that ran in the meantime are not kept.
+        self._stack_has_errors_generation = 0
+        # The stacks that are connected to, with their callback, by stack ID. This keeps the callbacks alive.
+        self._stack_changed_callbacks = {}  # type: Dict[str, Tuple[ContainerStack, Callable[..., None]]]
 
     def initialize(self) -> None:
         self._error_check_timer.timeout.connect(self._rescheduleCheck)
@@ -62,6 +100,9 @@ class MachineErrorChecker(QObject):
         # Whenever the machine settings get changed, we schedule an error check.
         self._machine_manager.globalContainerChanged.connect(self.startErrorCheck)
 
+        # Stop listening to the stacks of which the errors were checked once they're gone.
+        self._application.getContainerRegistry().containerRemoved.connect(self._onContainerRemoved)
+
         self._onMachineChanged()
 
     def _onMachineChanged(self) -> None:
@@ -75,6 +116,11 @@ class MachineErrorChecker(QObject):
 
         self._global_stack = self._machine_manager.activeMachine
 
+        # The results of a check of the previous machine don't apply any more.
+        self._check_job = None
+        self._check_in_progress = False
+        self._error_keys = {}
+
         if self._global_stack:
             self._global_stack.propertyChanged.connect(self.startErrorCheckPropertyChanged)
             self._global_stack.containersChanged.connect(self.startErrorCheck)
@@ -95,10 +141,116 @@ class MachineErrorChecker(QObject):
     def needToWaitForResult(self) -> bool:
         return self._need_to_check or self._check_in_progress
 
+    def waitForResult(self, timeout: Optional[float] = None) -> bool:
+        """Block until there is no error check scheduled or in progress any more.
+
+        The results of the error check are applied on the main thread, so this must only be called from other threads,
+        like jobs.
+        :param timeout: The maximum time to wait in seconds, or None to wait until the check is finished.
+        :return: Whether the check is finished, i.e. False if the timeout expired.
+        """
+
+        return self._check_finished_event.wait(timeout)
+
+    def _updateCheckFinishedEvent(self) -> None:
+        if self.needToWaitForResult:
+            self._check_finished_event.clear()
+        else:
+            self._check_finished_event.set()
+
+    def stackHasErrors(self, stack: "ContainerStack") -> bool:
+        """Whether a setting that is changed in the top container of a stack, or that depends on one, has an error.
+
+        This is meant for stacks that are not part of the machine, like the stacks of per-object settings. The result is
+        remembered until the stack or the machine settings change, so asking it again is cheap. It can be called from
+        any thread.
+        :param stack: The stack to check.
+        :return: True if one of those settings has an error value, False otherwise.
+        """
+
+        stack_id = stack.getId()
+        with self._stack_has_errors_lock:
+            if stack_id in self._stack_has_errors:
+                return self._stack_has_errors[stack_id]
+            connected = self._stack_changed_callbacks.get(stack_id)
+            if connected is None or connected[0] is not stack:  # Not connected yet, or to a removed stack with the same ID.
+                if connected is not None:
+                    self._disconnectCheckedStack(*connected)
+                callback = partial(self._onCheckedStackChanged, stack_id)
+                self._stack_changed_callbacks[stack_id] = (stack, callback)
+                stack.propertyChanged.connect(callback)
+                stack.containersChanged.connect(callback)
+            generation = self._stack_has_errors_generation
+
+        has_errors = self._findStackErrors(stack)
+        with self._stack_has_errors_lock:
+            # If the stack or the machine changed during the check, the result may be outdated already.
+            if generation == self._stack_has_errors_generation:
+                self._stack_has_errors[stack_id] = has_errors
+        return has_errors
+
+    def _onCheckedStackChanged(self, stack_id: str, *args: Any) -> None:
+        with self._stack_has_errors_lock:
+            self._stack_has_errors.pop(stack_id, None)
+            self._stack_has_errors_generation += 1
+
+    def _onContainerRemoved(self, container: "ContainerInterface") -> None:
+        stack_id = container.getId()
+        with self._stack_has_errors_lock:
+            connected = self._stack_changed_callbacks.get(stack_id)
+            if connected is None or connected[0] is not container:
+                return
+            del self._stack_changed_callbacks[stack_id]
+            self._stack_has_errors.pop(stack_id, None)
+            self._stack_has_errors_generation += 1
+        self._disconnectCheckedStack(*connected)
+
+    @staticmethod
+    def _disconnectCheckedStack(stack: "ContainerStack", callback: Callable[..., None]) -> None:
+        stack.propertyChanged.disconnect(callback)
+        stack.containersChanged.disconnect(callback)
+
+    def _clearStackHasErrors(self) -> None:
+        with self._stack_has_errors_lock:
+            self._stack_has_errors.clear()
+            self._stack_has_errors_generation += 1
+
+    def _findStackErrors(self, stack: "ContainerStack") -> bool:
+        top_of_stack = stack.getTop()
+        changed_setting_keys = top_of_stack.getAllKeys()
+
+        # Add all relations to changed settings as well.
+        for key in top_of_stack.getAllKeys():
+            instance = top_of_stack.getInstance(key)
+            if instance is None:
+                continue
+            self._addRelations(changed_setting_keys, instance.definition.relations)
+
+        for changed_setting_key in changed_setting_keys:
+            if _hasErrorValue(stack, changed_setting_key):
+                Logger.log("w", "Setting %s of stack %s is not valid.", changed_setting_key, stack.getId())
+                return True
+        return False
+
+    def _addRelations(self, relations_set: Set[str], relations: List["SettingRelation"]) -> None:
+        """Recursive function to put all settings that require each other for value changes in a list
+
+        :param relations_set: Set of keys of settings that are influenced
+        :param relations: list of relation objects that need to be checked.
+        """
+
+        for relation in filter(lambda r: r.role == "value" or r.role == "limit_to_extruder", relations):
+            if relation.type == RelationType.RequiresTarget:
+                continue
+
+            relations_set.add(relation.target.key)
+            self._addRelations(relations_set, relation.target.relations)
+
     def startErrorCheckPropertyChanged(self, key: str, property_name: str) -> None:
         """Start the error check for property changed
 
-        this is seperate from the startErrorCheck because it ignores a number property types
+        this is seperate from the startErrorCheck because it ignores a number property types. Only the changed setting
+        and the settings that depend on it are checked.
 
         :param key:
         :param property_name:
@@ -107,14 +259,20 @@ class MachineErrorChecker(QObject):
         if property_name != "value":
             return
         self._keys_to_check.add(key)
-        self.startErrorCheck()
+        self._scheduleErrorCheck()
 
     def startErrorCheck(self, *args: Any) -> None:
-        """Starts the error check timer to schedule a new error check.
+        """Starts the error check timer to schedule a new error check of all settings.
 
         :param args:
         """
 
+        self._check_all_keys = True
+        self._scheduleErrorCheck()
+
+    def _scheduleErrorCheck(self) -> None:
+        # The settings of other stacks can depend on the machine settings, so their errors have to be checked again.
+        self._clearStackHasErrors()
         if not self._check_in_progress:
             self._need_to_check = True
             self.needToWaitForResultChanged.emit()
@@ -124,91 +282,149 @@ class MachineErrorChecker(QObject):
         """This function is called by the timer to reschedule a new error check.
 
         If there is no check in progress, it will start a new one. If there is any, it sets the "_need_to_check" flag
-        to notify the current check to stop and start a new one.
+        so that a new check is started when the current check is done.
         """
 
-        if self._check_in_progress and not self._need_to_check:
-            self._need_to_check = True
-            self.needToWaitForResultChanged.emit()
+        if self._check_job is not None:
+            if not self._need_to_check:
+                self._need_to_check = True
+                self.needToWaitForResultChanged.emit()
             return
 
-        self._error_keys_in_progress = set()
-        self._need_to_check = False
-        self.needToWaitForResultChanged.emit()
-
         global_stack = self._machine_manager.activeMachine
         if global_stack is None:
             Logger.log("i", "No active machine, nothing to check.")
-            return
-
-        # Populate the (stack, key) tuples to check
-        self._stacks_and_keys_to_check = deque()
-        for stack in global_stack.extruderList:
-            if not self._keys_to_check:
-                self._keys_to_check = stack.getAllKeys()
-
-            for key in self._keys_to_check:
-                self._stacks_and_keys_to_check.append((stack, key))
-
-        self._application.callLater(self._checkStack)
-        self._start_time = time.time()
-        Logger.log("d", "New error check scheduled.")
-
-    def _checkStack(self) -> None:
-        if self._need_to_check:
-            Logger.log("d", "Need to check for errors again. Discard the current progress and reschedule a check.")
+            self._need_to_check = False
             self._check_in_progress = False
-            self._application.callLater(self.startErrorCheck)
+            self.needToWaitForResultChanged.emit()
             return
 
+        keys_to_check = None if self._check_all_keys else self._keys_to_check
+        self._keys_to_check = set()
+        self._check_all_keys = False
+        self._need_to_check = False
         self._check_in_progress = True
+        self.needToWaitForResultChanged.emit()
 
-        # If there is nothing to check any more, it means there is no error.
-        if not self._stacks_and_keys_to_check:
-            # Finish
-            self._setResult(False)
-            return
-
-        # Get the next stack and key to check
-        stack, key = self._stacks_and_keys_to_check.popleft()
+        self._start_time = time.time()
+        self._check_job = ValidateSettingsJob(global_stack, keys_to_check)
+        self._check_job.finished.connect(self._onCheckJobFinished)
+        self._check_job.startOnOwnThread()
+        Logger.log("d", "New error check scheduled for %s settings.", "all" if keys_to_check is None else len(keys_to_check))
 
-        enabled = stack.getProperty(key, "enabled")
-        if not enabled:
-            self._application.callLater(self._checkStack)
+    def _onCheckJobFinished(self, job: "ValidateSettingsJob") -> None:
+        if job is not self._check_job:  # The machine changed in the meantime.
             return
+        self._check_job = None
+
+        # Apply all results of the job at once.
+        if job.checksAllKeys():
+            self._error_keys = {}
+        for stack_id, checked_keys in job.getCheckedKeys().items():
+            error_keys = self._error_keys.get(stack_id, set()) - checked_keys
+            error_keys |= job.getErrorKeys().get(stack_id, set())
+            self._error_keys[stack_id] = error_keys
+        has_errors = any(self._error_keys.values())
 
-        validation_state = stack.getProperty(key, "validationState")
-        if validation_state is None:
-            # Setting is not validated. This can happen if there is only a setting definition.
-            # We do need to validate it, because a setting definitions value can be set by a function, which could
-            # be an invalid setting.
-            definition = stack.getSettingDefinition(key)
-            validator_type = SettingDefinition.getValidatorForType(definition.type)
-            if validator_type:
-                validator = validator_type(key)
-                validation_state = validator(stack)
-        if validation_state in (ValidatorState.Exception, ValidatorState.MaximumError, ValidatorState.MinimumError, ValidatorState.Invalid):
-            # Since we don't know if any of the settings we didn't check is has an error value, store the list for the
-            # next check.
-            keys_to_recheck = {setting_key for stack, setting_key in self._stacks_and_keys_to_check}
-            keys_to_recheck.add(key)
-            self._setResult(True, keys_to_recheck = keys_to_recheck)
+        if self._need_to_check:
+            Logger.log("d", "Need to check for errors again. Start a new check for the settings that changed.")
+            self._check_in_progress = False
+            self._rescheduleCheck()
             return
 
-        # Schedule the check for the next key
-        self._application.callLater(self._checkStack)
+        self._setResult(has_errors)
 
-    def _setResult(self, result: bool, keys_to_recheck = None) -> None:
+    def _setResult(self, result: bool) -> None:
         if result != self._has_errors:
             self._has_errors = result
             self.hasErrorUpdated.emit()
             self._machine_manager.stacksValidationChanged.emit()
-        if keys_to_recheck is None:
-            self._keys_to_check = set()
-        else:
-            self._keys_to_check = keys_to_recheck
         self._need_to_check = False
         self._check_in_progress = False
         self.needToWaitForResultChanged.emit()
         self.errorCheckFinished.emit()
         Logger.log("i", "Error check finished, result = %s, time = %0.1fs", result, time.time() - self._start_time)
+
+
+class ValidateSettingsJob(Job):
+    """Checks the settings of the extruders of a machine for errors, on a worker thread."""
+
+    def __init__(self, global_stack: "GlobalStack", keys: Optional[Set[str]] = None) -> None:
+        """Creates a job to check settings.
+
+        :param global_stack: The machine to check the settings of.
+        :param keys: The keys of the settings that changed. These and all settings that depend on them are checked. None
+            to check all settings.
+        """
+
+        super().__init__()
+        self._global_stack = global_stack
+        self._keys = keys
+        self._checked_keys = {}  # type: Dict[str, Set[str]] # The settings that were checked, per stack ID.
+        self._error_keys = {}  # type: Dict[str, Set[str]] # The settings that have errors, per stack ID.
+
+    def startOnOwnThread(self) -> None:
+        """Run the job on a thread of its own instead of on the job queue.
+
+        Jobs on the job queue, like StartSliceJob, wait for the result of the check. If they took all threads of the
+        queue, the check would never run.
+        """
+
+        threading.Thread(target = self._runOnOwnThread, name = "ValidateSettingsJob", daemon = True).start()
+
+    def _runOnOwnThread(self) -> None:
+        try:
+            self.run()
+        except Exception:
+            Logger.logException("e", "Exception while checking the settings for errors.")
+        self.finished.emit(self)  # Like the job queue does, which gets the result to the main thread.
+
+    def checksAllKeys(self) -> bool:
+        return self._keys is None
+
+    def getCheckedKeys(self) -> Dict[str, Set[str]]:
+        return self._checked_keys
+
+    def getErrorKeys(self) -> Dict[str, Set[str]]:
+        return self._error_keys
+
+    def run(self) -> None:
+        keys = None  # type: Optional[Set[str]]
+        if self._keys is not None:
+            keys = self.getDependentKeys(self._global_stack.getBottom(), self._keys)
+
+        # Validate against a snapshot, so that settings that many other settings depend on are evaluated only once.
+        with self._global_stack.takingSettingsSnapshot():
+            for stack in self._global_stack.extruderList:
+                all_keys = stack.getAllKeys()
+                stack_keys = all_keys if keys is None else keys & all_keys
+                error_keys = set()  # type: Set[str]
+                for key in stack_keys:
+                    if stack.getProperty(key, "enabled") and _hasErrorValue(stack, key):
+                        error_keys.add(key)
+                    Job.yieldThread()
+                self._checked_keys[stack.getId()] = stack_keys
+                self._error_keys[stack.getId()] = error_keys
+
+    @staticmethod
+    def getDependentKeys(definition: Any, keys: Iterable[str]) -> Set[str]:
+        """Get the keys of the given settings and of all settings that depend on them, directly or indirectly.
+
+        :param definition: The definition container to find the relations between the settings in.
+        :param keys: The keys of the settings to start with.
+        """
+
+        result = set()  # type: Set[str]
+        keys_to_visit = list(keys)
+        while keys_to_visit:
+            key = keys_to_visit.pop()
+            if key in result:
+                continue
+            result.add(key)
+            definitions = definition.findDefinitions(key = key)
+            if not definitions:
+                continue
+            for relation in definitions[0].relations:
+                if relation.type == RelationType.RequiredByTarget:
+                    keys_to_visit.append(relation.target.key)
+        return result
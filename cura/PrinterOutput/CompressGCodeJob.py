@@ -0,0 +1,156 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading
+from typing import Callable, Iterator, List, Optional, Union
+
+from PyQt5.QtCore import QIODevice, QObject
+
+from UM.Job import Job
+
+from cura.Utils.GzipStream import GzipStream
+
+
+class CompressedGCodeStream(QIODevice):
+    """A sequential device to read compressed g-code from while it's still being compressed.
+
+    It can be used as the body of a network request, so that the upload can start before the compression is finished.
+    The data is appended from the thread of the compression, and read from the thread of the network access manager.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._finished = False
+        self._size = 0
+        self.open(QIODevice.ReadOnly)
+
+    def appendData(self, data: bytes) -> None:
+        """Add data that can be read from the stream."""
+
+        if not data:
+            return
+        with self._lock:
+            self._buffer += data
+            self._size += len(data)
+        self.readyRead.emit()
+
+    def finish(self) -> None:
+        """Mark that no more data will be appended, so that the stream ends once the remaining data is read."""
+
+        with self._lock:
+            self._finished = True
+        self.readyRead.emit()
+        self.readChannelFinished.emit()
+
+    def isFinished(self) -> bool:
+        with self._lock:
+            return self._finished
+
+    def getAppendedSize(self) -> int:
+        """Get how many bytes were appended so far, whether they were read or not."""
+
+        with self._lock:
+            return self._size
+
+    def isSequential(self) -> bool:
+        return True
+
+    def bytesAvailable(self) -> int:
+        with self._lock:
+            return len(self._buffer) + super().bytesAvailable()
+
+    def atEnd(self) -> bool:
+        with self._lock:
+            return self._finished and not self._buffer and super().bytesAvailable() == 0
+
+    def readData(self, max_size: int) -> Optional[bytes]:
+        with self._lock:
+            if not self._buffer and self._finished:
+                return None  # End of the stream.
+            data = bytes(self._buffer[:max_size])
+            del self._buffer[:max_size]
+            return data
+
+    def writeData(self, data: bytes) -> int:
+        return -1  # Data can only be appended by the compression.
+
+
+class CompressGCodeJob(Job):
+    """Compresses g-code with gzip into a CompressedGCodeStream, on a worker thread.
+
+    The compressed data becomes available in the stream while the rest of the g-code is still being compressed. The
+    result of the job is the number of compressed bytes, or None if the job was aborted.
+    """
+
+    batch_size = 256 * 1024  # Number of characters of g-code to compress at a time.
+
+    def __init__(self, gcode: Union[str, List[str]], stream: CompressedGCodeStream, compression_level: int = 9,
+                 on_batch_compressed: Optional[Callable[["CompressGCodeJob"], None]] = None) -> None:
+        """Creates a job to compress g-code.
+
+        :param gcode: The g-code, as a single string or as a list of pieces like the g-code writer produces.
+        :param stream: The stream to append the compressed data to. It's finished once the job is done, also when it's
+            aborted.
+        :param compression_level: The zlib compression level, from 1 (fastest) to 9 (smallest).
+        :param on_batch_compressed: Called with the job after every batch, on the thread that compresses, e.g. to abort
+            the job.
+        """
+
+        super().__init__()
+        self._gcode = gcode
+        self._stream = stream
+        self._compression_level = compression_level
+        self._abort_requested = False
+        self._on_batch_compressed = on_batch_compressed
+
+    def abort(self) -> None:
+        """Stops the compression the next time that the job checks for it, which is after every batch."""
+
+        self._abort_requested = True
+
+    def isAborted(self) -> bool:
+        return self._abort_requested
+
+    def write(self, data: bytes) -> int:
+        """Called with the compressed data while it's being compressed."""
+
+        self._stream.appendData(data)
+        return len(data)
+
+    def run(self) -> None:
+        gzip_stream = GzipStream(self, compression_level = self._compression_level)  # type: ignore  # Only write() is needed.
+        try:
+            batched_pieces = []  # type: List[str]
+            batched_length = 0
+            for piece in self._pieces():
+                if self._abort_requested:
+                    self.setResult(None)
+                    return
+
+                # If the g-code was read from a file, it's a list of all lines in that file. Compressing them one by
+                # one would be extremely slow, so they are batched.
+                batched_pieces.append(piece)
+                batched_length += len(piece)
+                if batched_length >= self.batch_size:
+                    gzip_stream.write("".join(batched_pieces).encode("utf-8"))
+                    batched_pieces = []
+                    batched_length = 0
+                    if self._on_batch_compressed is not None:
+                        self._on_batch_compressed(self)
+                    Job.yieldThread()
+
+            if batched_pieces:
+                gzip_stream.write("".join(batched_pieces).encode("utf-8"))
+            gzip_stream.close()
+            self.setResult(self._stream.getAppendedSize())
+        finally:
+            self._stream.finish()
+
+    def _pieces(self) -> Iterator[str]:
+        if isinstance(self._gcode, str):
+            for start in range(0, len(self._gcode), self.batch_size):
+                yield self._gcode[start:start + self.batch_size]
+        else:
+            yield from self._gcode
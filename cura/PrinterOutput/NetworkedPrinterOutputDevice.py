@@ -7,16 +7,16 @@ from UM.Scene.SceneNode import SceneNode #For typing.
 from cura.API import Account
 from cura.CuraApplication import CuraApplication
 
+from cura.PrinterOutput.CompressGCodeJob import CompressGCodeJob, CompressedGCodeStream
 from cura.PrinterOutput.PrinterOutputDevice import PrinterOutputDevice, ConnectionState, ConnectionType
 
 from PyQt5.QtNetwork import QHttpMultiPart, QHttpPart, QNetworkRequest, QNetworkAccessManager, QNetworkReply, QAuthenticator
-from PyQt5.QtCore import pyqtProperty, pyqtSignal, pyqtSlot, QObject, QUrl, QCoreApplication
+from PyQt5.QtCore import pyqtProperty, pyqtSignal, pyqtSlot, QIODevice, QObject, QUrl
 from time import time
 from typing import Callable, Dict, List, Optional, Union
 from enum import IntEnum
 
 import os  # To get the username
-import gzip
 
 from cura.Settings.CuraContainerRegistry import CuraContainerRegistry
 
@@ -52,10 +52,13 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
         # QHttpMultiPart objects need to be kept alive and not garbage collected during the
         # HTTP which uses them. We hold references to these QHttpMultiPart objects here.
         self._kept_alive_multiparts = {}        # type: Dict[QNetworkReply, QHttpMultiPart]
+        # The same goes for devices that are streamed as the body of a request.
+        self._kept_alive_bodies = {}            # type: Dict[QNetworkReply, QIODevice]
 
         self._sending_gcode = False
         self._compressing_gcode = False
         self._gcode = []                    # type: List[str]
+        self._compress_gcode_job = None     # type: Optional[CompressGCodeJob]
         self._connection_state_before_timeout = None    # type: Optional[ConnectionState]
 
     def requestWrite(self, nodes: List["SceneNode"], file_name: Optional[str] = None, limit_mimetypes: bool = False,
@@ -71,47 +74,57 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
     def authenticationState(self) -> AuthState:
         return self._authentication_state
 
-    def _compressDataAndNotifyQt(self, data_to_append: str) -> bytes:
-        compressed_data = gzip.compress(data_to_append.encode("utf-8"))
-        self._progress_message.setProgress(-1)  # Tickle the message so that it's clear that it's still being used.
-        QCoreApplication.processEvents()  # Ensure that the GUI does not freeze.
+    def _compressGCodeStream(self) -> CompressedGCodeStream:
+        """Start compressing the g-code on a worker thread.
 
-        # Pretend that this is a response, as zipping might take a bit of time.
+        The compressed g-code can be read from the returned stream while it's being compressed, e.g. by passing it as
+        the body of a request to put() or post(), so that the upload starts before the compression is finished.
+        """
+
+        self._abortCompressingGCode()
+        self._compressing_gcode = True
+        stream = CompressedGCodeStream()
+        self._compress_gcode_job = CompressGCodeJob(self._gcode, stream, on_batch_compressed = self._onGCodeBatchCompressed)
+        self._compress_gcode_job.finished.connect(self._onCompressGCodeFinished)
+        self._compress_gcode_job.start()
+        return stream
+
+    def _onGCodeBatchCompressed(self, job: CompressGCodeJob) -> None:
+        # Pretend that this is a response, as compressing might take a bit of time.
         # If we don't do this, the device might trigger a timeout.
         self._last_response_time = time()
-        return compressed_data
+        if not self._compressing_gcode:
+            job.abort()  # Sending was aborted.
 
-    def _compressGCode(self) -> Optional[bytes]:
-        self._compressing_gcode = True
+    def _onCompressGCodeFinished(self, job: CompressGCodeJob) -> None:
+        if job is self._compress_gcode_job:
+            self._compress_gcode_job = None
+            self._compressing_gcode = False
 
-        max_chars_per_line = int(1024 * 1024 / 4)  # 1/4 MB per line.
-        """Mash the data into single string"""
-        file_data_bytes_list = []
-        batched_lines = []
-        batched_lines_count = 0
+    def _abortCompressingGCode(self) -> None:
+        """Stop compressing the g-code, e.g. when sending it was aborted."""
 
-        for line in self._gcode:
-            if not self._compressing_gcode:
-                self._progress_message.hide()
-                # Stop trying to zip / send as abort was called.
-                return None
+        self._compressing_gcode = False
+        if self._compress_gcode_job is not None:
+            self._compress_gcode_job.abort()
+            self._compress_gcode_job = None
 
-            # if the gcode was read from a gcode file, self._gcode will be a list of all lines in that file.
-            # Compressing line by line in this case is extremely slow, so we need to batch them.
-            batched_lines.append(line)
-            batched_lines_count += len(line)
+    def _compressGCode(self) -> Optional[bytes]:
+        """Compress all of the g-code at once, on the calling thread.
 
-            if batched_lines_count >= max_chars_per_line:
-                file_data_bytes_list.append(self._compressDataAndNotifyQt("".join(batched_lines)))
-                batched_lines = []
-                batched_lines_count = 0
+        Prefer _compressGCodeStream(), which doesn't block the calling thread.
 
-        # Don't miss the last batch (If any)
-        if len(batched_lines) != 0:
-            file_data_bytes_list.append(self._compressDataAndNotifyQt("".join(batched_lines)))
+        :return: The compressed g-code, or None if the compression was aborted by setting _compressing_gcode to False.
+        """
 
+        self._compressing_gcode = True
+        stream = CompressedGCodeStream()
+        job = CompressGCodeJob(self._gcode, stream, on_batch_compressed = self._onGCodeBatchCompressed)
+        job.run()
         self._compressing_gcode = False
-        return b"".join(file_data_bytes_list)
+        if job.isAborted():
+            return None
+        return bytes(stream.readAll())
 
     def _update(self) -> None:
         if self._last_response_time:
@@ -185,18 +198,27 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
         if reply in self._kept_alive_multiparts:
             del self._kept_alive_multiparts[reply]
 
+    def _createBody(self, data: Union[str, bytes, QIODevice]) -> Union[bytes, QIODevice]:
+        if isinstance(data, (bytes, QIODevice)):
+            return data
+        return data.encode()
+
+    def _keepBodyAlive(self, reply: QNetworkReply, data: Union[str, bytes, QIODevice]) -> None:
+        if isinstance(data, QIODevice):
+            self._kept_alive_bodies[reply] = data
+
     def _validateManager(self) -> None:
         if self._manager is None:
             self._createNetworkManager()
         assert (self._manager is not None)
 
-    def put(self, url: str, data: Union[str, bytes], content_type: Optional[str] = "application/json",
+    def put(self, url: str, data: Union[str, bytes, QIODevice], content_type: Optional[str] = "application/json",
             on_finished: Optional[Callable[[QNetworkReply], None]] = None,
             on_progress: Optional[Callable[[int, int], None]] = None) -> None:
         """Sends a put request to the given path.
 
         :param url: The path after the API prefix.
-        :param data: The data to be sent in the body
+        :param data: The data to be sent in the body, or a device to read the body from while it's being sent.
         :param content_type: The content type of the body data.
         :param on_finished: The function to call when the response is received.
         :param on_progress: The function to call when the progress changes. Parameters are bytes_sent / bytes_total.
@@ -210,8 +232,8 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
             Logger.log("e", "No network manager was created to execute the PUT call with.")
             return
 
-        body = data if isinstance(data, bytes) else data.encode()  # type: bytes
-        reply = self._manager.put(request, body)
+        reply = self._manager.put(request, self._createBody(data))
+        self._keepBodyAlive(reply, data)
         self._registerOnFinishedCallback(reply, on_finished)
 
         if on_progress is not None:
@@ -253,14 +275,14 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
         reply = self._manager.get(request)
         self._registerOnFinishedCallback(reply, on_finished)
 
-    def post(self, url: str, data: Union[str, bytes],
+    def post(self, url: str, data: Union[str, bytes, QIODevice],
              on_finished: Optional[Callable[[QNetworkReply], None]],
              on_progress: Optional[Callable[[int, int], None]] = None) -> None:
 
         """Sends a post request to the given path.
 
         :param url: The path after the API prefix.
-        :param data: The data to be sent in the body
+        :param data: The data to be sent in the body, or a device to read the body from while it's being sent.
         :param on_finished: The function to call when the response is received.
         :param on_progress: The function to call when the progress changes. Parameters are bytes_sent / bytes_total.
         """
@@ -274,8 +296,8 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
             Logger.log("e", "Could not find manager.")
             return
 
-        body = data if isinstance(data, bytes) else data.encode()  # type: bytes
-        reply = self._manager.post(request, body)
+        reply = self._manager.post(request, self._createBody(data))
+        self._keepBodyAlive(reply, data)
         if on_progress is not None:
             reply.uploadProgress.connect(on_progress)
         self._registerOnFinishedCallback(reply, on_finished)
@@ -354,6 +376,7 @@ class NetworkedPrinterOutputDevice(PrinterOutputDevice):
         # As we don't want to keep them around forever, delete them if we get a reply.
         if reply.operation() == QNetworkAccessManager.PostOperation:
             self._clearCachedMultiPart(reply)
+        self._kept_alive_bodies.pop(reply, None)
 
         if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) is None:
             # No status code means it never even reached remote.
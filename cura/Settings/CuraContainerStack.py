@@ -1,7 +1,10 @@
 # Copyright (c) 2018 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
-from typing import Any, cast, List, Optional, Dict
+from contextlib import contextmanager
+import threading
+from types import MappingProxyType
+from typing import Any, cast, Iterator, List, Mapping, Optional, Dict, Set
 from PyQt5.QtCore import pyqtProperty, pyqtSignal, QObject
 
 from UM.Application import Application
@@ -13,6 +16,7 @@ from UM.Settings.InstanceContainer import InstanceContainer
 from UM.Settings.DefinitionContainer import DefinitionContainer
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.Settings.Interfaces import ContainerInterface, DefinitionContainerInterface
+from UM.Settings.SettingRelation import RelationType
 from cura.Settings import cura_empty_instance_containers
 
 from . import Exceptions
@@ -62,6 +66,11 @@ class CuraContainerStack(ContainerStack):
 
         self._settable_per_extruder_cache = {}  # type: Dict[str, Any]
 
+        # While a settings snapshot is being taken, the values that were already evaluated for it. Per thread, since
+        # other threads may get values of settings in the meantime, which must not be served from the snapshot.
+        self._snapshot_values = {}  # type: Dict[str, Dict[str, Any]] # keys are thread names
+        self._snapshot_key_order = []  # type: List[str] # Order to evaluate the settings in for a snapshot.
+
         self.setDirty(False)
 
     # This is emitted whenever the containersChanged signal from the ContainerStack base class is emitted.
@@ -381,6 +390,79 @@ class CuraContainerStack(ContainerStack):
 
         return cls._findInstanceContainerDefinitionId(definitions[0])
 
+    def getSettingsSnapshot(self) -> Mapping[str, Any]:
+        """Get the values of all settings in this stack at once.
+
+        The settings are evaluated in the order of their dependencies, and every setting is only evaluated once, also
+        if the values of many other settings depend on it. This is much faster than getting the value of each setting
+        separately. The values are the same as getProperty(key, "value") gives at this moment.
+
+        :return: An immutable mapping from setting keys to their values.
+        """
+
+        with self.takingSettingsSnapshot():
+            values = {}  # type: Dict[str, Any]
+            for key in self._getSnapshotKeyOrder():
+                values[key] = self.getProperty(key, "value")
+        return MappingProxyType(values)
+
+    @contextmanager
+    def takingSettingsSnapshot(self) -> Iterator[None]:
+        """Share the evaluated setting values between all stacks that may depend on each other, while taking a snapshot.
+
+        Within this context, each setting value that is asked in this thread is only evaluated once. Use it to ask many
+        properties at once, e.g. to validate settings, which then all see the same values. When a snapshot is already
+        being taken in this thread, the values of that snapshot keep being shared.
+        """
+
+        thread_name = threading.current_thread().name
+        started_stacks = [stack for stack in self._getSnapshotStacks() if thread_name not in stack._snapshot_values]
+        for stack in started_stacks:
+            stack._snapshot_values[thread_name] = {}
+        try:
+            yield
+        finally:
+            for stack in started_stacks:
+                del stack._snapshot_values[thread_name]
+
+    def _getSnapshotStacks(self) -> List["CuraContainerStack"]:
+        """Get the stacks that the settings of this stack may get their values from."""
+
+        return [self]
+
+    def _isResolvingSettings(self) -> bool:
+        """Whether a resolve function of a setting is being evaluated in this thread."""
+
+        next_stack = self.getNextStack()
+        return isinstance(next_stack, CuraContainerStack) and next_stack._isResolvingSettings()
+
+    def _getSnapshotKeyOrder(self) -> List[str]:
+        """Get the keys of all settings, such that each setting comes after the settings that its value depends on."""
+
+        keys = self.getAllKeys()
+        if len(keys) == len(self._snapshot_key_order) and keys.issuperset(self._snapshot_key_order):
+            return self._snapshot_key_order
+
+        definition = self.getBottom()
+        key_order = []  # type: List[str]
+        visited = set()  # type: Set[str]
+
+        def visit(key: str) -> None:
+            if key in visited:
+                return
+            visited.add(key)
+            definitions = definition.findDefinitions(key = key) if definition is not None else []
+            if definitions:
+                for relation in definitions[0].relations:
+                    if relation.type == RelationType.RequiresTarget and relation.target.key in keys:
+                        visit(relation.target.key)
+            key_order.append(key)
+
+        for key in sorted(keys):  # Sorted, so that the order is the same every time.
+            visit(key)
+        self._snapshot_key_order = key_order
+        return key_order
+
     def getExtruderPositionValueWithDefault(self, key):
         """getProperty for extruder positions, with translation from -1 to default extruder number"""
 
@@ -399,6 +481,15 @@ class CuraContainerStack(ContainerStack):
                 self._settable_per_extruder_cache[key] = super().getProperty(key, property_name, context)
                 return self._settable_per_extruder_cache[key]
 
+        if property_name == "value" and context is None and self._snapshot_values:
+            snapshot_values = self._snapshot_values.get(threading.current_thread().name)
+            # While a resolve function is evaluated, settings can get different values than normal, so don't share
+            # those with the rest of the snapshot.
+            if snapshot_values is not None and not self._isResolvingSettings():
+                if key not in snapshot_values:
+                    snapshot_values[key] = super().getProperty(key, property_name, context)
+                return snapshot_values[key]
+
         return super().getProperty(key, property_name, context)
 
 
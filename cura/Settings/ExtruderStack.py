@@ -1,7 +1,7 @@
 # Copyright (c) 2018 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
-from typing import Any, Dict, TYPE_CHECKING, Optional
+from typing import Any, Dict, List, TYPE_CHECKING, Optional
 
 from PyQt5.QtCore import pyqtProperty, pyqtSignal
 
@@ -161,6 +161,14 @@ class ExtruderStack(CuraContainerStack):
             context.popContainer()
         return result
 
+    @override(CuraContainerStack)
+    def _getSnapshotStacks(self) -> List[CuraContainerStack]:
+        # Settings that are not settable per extruder or are limited to another extruder come from the other stacks.
+        next_stack = self.getNextStack()
+        if next_stack is None:
+            return [self]
+        return next_stack._getSnapshotStacks()
+
     @override(CuraContainerStack)
     def _getMachineDefinition(self) -> ContainerInterface:
         if not self.getNextStack():
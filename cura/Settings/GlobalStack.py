@@ -3,7 +3,7 @@
 
 from collections import defaultdict
 import threading
-from typing import Any, Dict, Optional, Set, TYPE_CHECKING, List
+from typing import Any, Dict, Mapping, Optional, Set, TYPE_CHECKING, List
 import uuid
 
 from PyQt5.QtCore import pyqtProperty, pyqtSlot, pyqtSignal
@@ -248,6 +248,30 @@ class GlobalStack(CuraContainerStack):
             context.popContainer()
         return result
 
+    def getSettingsSnapshots(self) -> Dict[str, Mapping[str, Any]]:
+        """Get snapshots of the settings of this stack and of its extruders, taken at once.
+
+        Settings that the stacks share are only evaluated once for all snapshots.
+
+        :return: The snapshot of this stack with key "-1" and the snapshot of each extruder with its extruder number as
+            key, like the token replacement in start/end g-code uses them.
+        """
+
+        with self.takingSettingsSnapshot():
+            snapshots = {"-1": self.getSettingsSnapshot()}
+            for extruder in self.extruderList:
+                snapshot = extruder.getSettingsSnapshot()
+                snapshots[str(snapshot["extruder_nr"])] = snapshot
+        return snapshots
+
+    @override(CuraContainerStack)
+    def _getSnapshotStacks(self) -> List[CuraContainerStack]:
+        return [self] + list(self._extruders.values())
+
+    @override(CuraContainerStack)
+    def _isResolvingSettings(self) -> bool:
+        return bool(self._resolving_settings[threading.current_thread().name])
+
     @override(ContainerStack)
     def setNextStack(self, stack: CuraContainerStack, connect_signals: bool = True) -> None:
         """Overridden from ContainerStack
@@ -0,0 +1,170 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import struct
+import time
+from typing import BinaryIO, Deque, Optional
+import zlib
+
+_dictionary_size = 32 * 1024  # The window of deflate. Back-references can't reach further than this.
+
+
+def _compressBlock(block: bytes, dictionary: bytes, level: int) -> bytes:
+    """Compress a block of data into raw deflate data that ends on a byte boundary.
+
+    :param dictionary: The data before the block, to which the compressed data can refer.
+    """
+
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class GzipStream:
+    """A binary stream that compresses everything that is written to it into gzip format, and writes the result to
+    another stream while data comes in. Only the compressor's state and at most a few blocks are kept in memory.
+
+    With more than one thread, blocks of the data are compressed at the same time. Each block then gets the end of the
+    block before it as dictionary and is flushed to a byte boundary, so that the compressed blocks together still form
+    a single gzip member that any gzip reader can decompress.
+    """
+
+    block_size = 1024 * 1024
+
+    def __init__(self, stream: BinaryIO, compression_level: int = 9, thread_count: int = 1) -> None:
+        """Creates a compressing stream.
+
+        :param stream: The binary stream to write the compressed data to. It's not closed by close().
+        :param compression_level: The zlib compression level, from 1 (fastest) to 9 (smallest).
+        :param thread_count: How many threads to compress with. With 1, the data is compressed on the calling thread.
+        """
+
+        self._stream = stream
+        self._compression_level = compression_level
+        self._crc = 0
+        self._size = 0
+        self._header_written = False
+        self._closed = False
+
+        self._compressor = None  # type: Optional[zlib._Compress]
+        self._executor = None  # type: Optional[ThreadPoolExecutor]
+        self._max_pending_blocks = 0
+        self._pending_blocks = deque()  # type: Deque[Future]
+        self._buffer = bytearray()
+        self._dictionary = b""
+        if thread_count > 1:
+            self._executor = ThreadPoolExecutor(max_workers = thread_count)
+            self._max_pending_blocks = 2 * thread_count
+        else:
+            self._compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def write(self, data: bytes) -> int:
+        if self._closed:
+            raise ValueError("Write to closed GzipStream.")
+        if not data:
+            return 0
+        self._writeHeader()
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+
+        if self._compressor is not None:
+            compressed = self._compressor.compress(data)
+            if compressed:
+                self._stream.write(compressed)
+            return len(data)
+
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submitBlock(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def close(self) -> None:
+        """Write the rest of the compressed data and the gzip trailer. The stream that is written to stays open."""
+
+        if self._closed:
+            return
+        self._writeHeader()
+        try:
+            if self._compressor is not None:
+                self._stream.write(self._compressor.flush(zlib.Z_FINISH))
+            else:
+                if self._buffer:
+                    self._submitBlock(bytes(self._buffer))
+                    self._buffer = bytearray()
+                while self._pending_blocks:
+                    self._stream.write(self._pending_blocks.popleft().result())
+                # The blocks end with a flush, not with the last block of the deflate stream. Finish the stream with an
+                # empty last block.
+                self._stream.write(zlib.compressobj(self._compression_level, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH))
+            self._stream.write(struct.pack("<II", self._crc, self._size & 0xffffffff))
+        finally:
+            self._closed = True
+            if self._executor is not None:
+                self._executor.shutdown()
+
+    def abort(self) -> None:
+        """Stop without writing the rest of the compressed data and the gzip trailer, because the data that was written
+        is incomplete. What was written to the stream so far is then not a valid gzip file, so it can't be taken for
+        the complete data."""
+
+        if self._closed:
+            return
+        self._closed = True
+        for pending_block in self._pending_blocks:
+            pending_block.cancel()
+        self._pending_blocks.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self) -> "GzipStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def _writeHeader(self) -> None:
+        """Write the gzip header, like gzip.compress() does, before anything else is written."""
+
+        if self._header_written:
+            return
+        self._header_written = True
+        if self._compression_level == 9:
+            extra_flags = 2  # Maximum compression.
+        elif self._compression_level == 1:
+            extra_flags = 4  # Fastest compression.
+        else:
+            extra_flags = 0
+        self._stream.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", int(time.time())) + bytes((extra_flags, 255)))
+
+    def _submitBlock(self, block: bytes) -> None:
+        """Compress a block on another thread. Write the compressed blocks that are first in line when there are too
+        many blocks waiting, so that the blocks in memory are limited."""
+
+        while len(self._pending_blocks) >= self._max_pending_blocks:
+            self._stream.write(self._pending_blocks.popleft().result())
+        assert self._executor is not None
+        self._pending_blocks.append(self._executor.submit(_compressBlock, block, self._dictionary, self._compression_level))
+        self._dictionary = block[-_dictionary_size:]
+
+
+class TextEncodingStream:
+    """A text stream that writes what is written to it as UTF-8 to a binary stream, without keeping it in memory.
+
+    This allows writers that write text, like the g-code writer, to write into binary streams like a GzipStream.
+    """
+
+    def __init__(self, stream: BinaryIO, encoding: str = "utf-8") -> None:
+        self._stream = stream
+        self._encoding = encoding
+
+    def write(self, text: str) -> int:
+        self._stream.write(text.encode(self._encoding))
+        return len(text)
@@ -12,6 +12,13 @@ import sys
 if "" in sys.path:
     sys.path.remove("")
 
+# A frozen build starts its own executable for the processes of multiprocessing, e.g. to execute post-processing scripts
+# in. Let those do their work and exit before any of Cura is loaded. Unlike multiprocessing.freeze_support(), this
+# isn't limited to Windows.
+if getattr(sys, "frozen", False):
+    import multiprocessing.spawn
+    multiprocessing.spawn.freeze_support()
+
 import argparse
 import faulthandler
 import os
@@ -231,5 +238,8 @@ if ApplicationMetadata.CuraDebugMode:
     ssl_conf.setPeerVerifyMode(QSslSocket.VerifyNone)
     QSslConfiguration.setDefaultConfiguration(ssl_conf)
 
-app = CuraApplication()
-app.run()
+# Processes that multiprocessing starts, e.g. for post-processing scripts, import this file too. Only start Cura when it
+# is executed.
+if __name__ == "__main__":
+    app = CuraApplication()
+    app.run()
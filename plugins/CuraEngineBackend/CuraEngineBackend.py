@@ -7,7 +7,7 @@ import os
 from PyQt5.QtCore import QObject, QTimer, pyqtSlot
 import sys
 from time import time
-from typing import Any, cast, Dict, List, Optional, Set, TYPE_CHECKING
+from typing import Any, cast, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 
 from UM.Backend.Backend import Backend, BackendState
 from UM.Scene.SceneNode import SceneNode
@@ -17,14 +17,20 @@ from UM.Message import Message
 from UM.PluginRegistry import PluginRegistry
 from UM.Platform import Platform
 from UM.Qt.Duration import DurationFormat
+from UM.Resources import Resources
 from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Settings.Interfaces import DefinitionContainerInterface
 from UM.Settings.SettingInstance import SettingInstance #For typing.
 from UM.Tool import Tool #For typing.
 
 from cura.CuraApplication import CuraApplication
+from cura.Scene.CuraSceneNode import CuraSceneNode
 from cura.Settings.ExtruderManager import ExtruderManager
+from .EnginePool import EnginePool, EngineWorker
+from .ProcessGCodeJob import GCodeTokenLocations
 from .ProcessSlicedLayersJob import ProcessSlicedLayersJob
+from .SliceResultCache import SliceResult, SliceResultCache
+from .SliceScheduler import SliceScheduler
 from .StartSliceJob import StartSliceJob, StartJobResult
 
 import Arcus
@@ -42,6 +48,10 @@ catalog = i18nCatalog("cura")
 class CuraEngineBackend(QObject, Backend):
     backendError = Signal()
 
+    # The engines of the engine pool listen on ports from this far after the port of the main engine, so that they
+    # don't get in the way when the main engine needs to move to the next port.
+    ENGINE_POOL_PORT_OFFSET = 100
+
     def __init__(self) -> None:
         """Starts the back-end plug-in.
 
@@ -126,6 +136,7 @@ class CuraEngineBackend(QObject, Backend):
         self._start_slice_job = None #type: Optional[StartSliceJob]
         self._start_slice_job_build_plate = None #type: Optional[int]
         self._slicing = False #type: bool # Are we currently slicing?
+        self._main_engine_progress = 0.0 #type: float # How far the main engine is with slicing, from 0 to 1.
         self._restart = False #type: bool # Back-end is currently restarting?
         self._tool_active = False #type: bool # If a tool is active, some tasks do not have to do anything
         self._always_restart = True #type: bool # Always restart the engine when starting a new slice. Don't keep the process running. TODO: Fix engine statelessness.
@@ -142,6 +153,27 @@ class CuraEngineBackend(QObject, Backend):
         self._is_disabled = False #type: bool
 
         self._application.getPreferences().addPreference("general/auto_slice", False)
+        # Number of layers after which the layer view gets updated while processing the layers. 0 to only show the
+        # layers once all of them are processed.
+        self._application.getPreferences().addPreference("backend/layer_streaming_chunk_size", 50)
+
+        # Results of earlier slices, so slicing the same thing again (e.g. after an undo) doesn't need the engine.
+        self._application.getPreferences().addPreference("backend/slice_result_cache_size", 4)
+        self._application.getPreferences().addPreference("backend/slice_result_cache_on_disk", False)
+
+        # Where the print information tokens are in the g-code of each build plate, found while the g-code arrives.
+        self._gcode_token_locations = {} #type: Dict[int, GCodeTokenLocations]
+        # Search all g-code for the print information tokens after slicing, instead of only where they were found.
+        self._application.getPreferences().addPreference("backend/gcode_token_full_scan", False)
+        self._slice_result_cache = SliceResultCache(0) #type: SliceResultCache
+        self._updateSliceResultCache()
+        self._slice_fingerprint = None #type: Optional[str] # Fingerprint of the slice message that is being sliced.
+        self._slice_print_estimates = ({}, []) #type: Tuple[Dict[str, float], List[float]] # Print times and material amounts of the current slice.
+
+        # Additional engines to slice other build plates with while the main engine is slicing. 0 to slice one build
+        # plate at a time.
+        self._application.getPreferences().addPreference("backend/engine_pool_size", 0)
+        self._engine_pool = None #type: Optional[EnginePool] # Created once the plug-in is registered.
 
         self._use_timer = False #type: bool
         # When you update a setting and other settings get changed through inheritance, many propertyChanged signals are fired.
@@ -150,6 +182,10 @@ class CuraEngineBackend(QObject, Backend):
         self._change_timer = QTimer() #type: QTimer
         self._change_timer.setSingleShot(True)
         self._change_timer.setInterval(500)
+        # Determines the interval of the change timer from how long slices take and how quickly changes follow.
+        self._slice_scheduler = SliceScheduler()
+        # For each scene node, the properties that influence the slice result, to ignore changes that don't matter.
+        self._node_slice_states = {} #type: Dict[int, Tuple[Any, ...]]
         self.determineAutoSlicing()
         self._application.getPreferences().preferenceChanged.connect(self._onPreferencesChanged)
 
@@ -179,6 +215,8 @@ class CuraEngineBackend(QObject, Backend):
         self._machine_error_checker = self._application.getMachineErrorChecker()
         self._machine_error_checker.errorCheckFinished.connect(self._onStackErrorCheckFinished)
 
+        self._updateEnginePool()
+
     def close(self) -> None:
         """Terminate the engine process.
 
@@ -188,14 +226,27 @@ class CuraEngineBackend(QObject, Backend):
 
         # Terminate CuraEngine if it is still running at this point
         self._terminate()
+        if self._engine_pool is not None:
+            self._engine_pool.close()
+
+    def getSliceScheduler(self) -> SliceScheduler:
+        """Get the scheduler that decides how long to wait after a change before slicing.
+
+        Use it to see its statistics, or to change its policy.
+        """
 
-    def getEngineCommand(self) -> List[str]:
+        return self._slice_scheduler
+
+    def getEngineCommand(self, port: Optional[int] = None) -> List[str]:
         """Get the command that is used to call the engine.
 
         This is useful for debugging and used to actually start the engine.
+        :param port: The port the engine should connect to. Defaults to the port of the main engine.
         :return: list of commands and args / parameters.
         """
-        command = [self._application.getPreferences().getValue("backend/location"), "connect", "127.0.0.1:{0}".format(self._port), ""]
+        if port is None:
+            port = self._port
+        command = [self._application.getPreferences().getValue("backend/location"), "connect", "127.0.0.1:{0}".format(port), ""]
 
         parser = argparse.ArgumentParser(prog = "cura", add_help = False)
         parser.add_argument("--debug", action = "store_true", default = False, help = "Turn on the debug mode by setting this option.")
@@ -220,8 +271,20 @@ class CuraEngineBackend(QObject, Backend):
 
     @pyqtSlot()
     def stopSlicing(self) -> None:
+        self._stopMainSlicing()
+
+        # The build plates that the engine pool was slicing need to be sliced again.
+        if self._engine_pool is not None:
+            for build_plate_number in self._engine_pool.stopSlicing():
+                if build_plate_number not in self._build_plates_to_be_sliced:
+                    self._build_plates_to_be_sliced.append(build_plate_number)
+
+    def _stopMainSlicing(self) -> None:
+        """Stop slicing on the main engine and stop processing layers, leaving the engine pool alone."""
+
         self.setState(BackendState.NotStarted)
         if self._slicing:  # We were already slicing. Stop the old job.
+            self._slice_scheduler.registerSliceInterrupted()
             self._terminate()
             self._createSocket()
 
@@ -246,6 +309,9 @@ class CuraEngineBackend(QObject, Backend):
         Logger.log("i", "Starting to slice...")
         self._slice_start_time = time()
         if not self._build_plates_to_be_sliced:
+            if self._isEnginePoolSlicing():
+                Logger.log("d", "Nothing more to slice, waiting for the engine pool to finish.")
+                return
             self.processingProgress.emit(1.0)
             Logger.log("w", "Slice unnecessary, nothing has changed that needs reslicing.")
             self.setState(BackendState.Done)
@@ -279,7 +345,7 @@ class CuraEngineBackend(QObject, Backend):
 
         if self._process is None: # type: ignore
             self._createSocket()
-        self.stopSlicing()
+        self._stopMainSlicing()
         self._engine_is_fresh = False  # Yes we're going to use the engine
 
         self.processingProgress.emit(0.0)
@@ -287,6 +353,8 @@ class CuraEngineBackend(QObject, Backend):
 
         self._scene.gcode_dict[build_plate_to_be_sliced] = [] #type: ignore #[] indexed by build plate number
         self._slicing = True
+        self._main_engine_progress = 0.0
+        self._slice_scheduler.registerSliceStarted()
         self.slicingStarted.emit()
 
         self.determineAutoSlicing()  # Switch timer on or off if appropriate
@@ -298,6 +366,77 @@ class CuraEngineBackend(QObject, Backend):
         self._start_slice_job.start()
         self._start_slice_job.finished.connect(self._onStartSliceCompleted)
 
+        # Slice the other build plates at the same time, if there are engines for that.
+        self._dispatchToEnginePool()
+
+    def _dispatchToEnginePool(self) -> None:
+        """Start slicing the build plates that need slicing on the idle engines of the engine pool."""
+
+        if self._engine_pool is None:
+            return
+        num_objects = self._numObjectsPerBuildPlate()
+        active_build_plate = self._application.getMultiBuildPlateModel().activeBuildPlate
+        for worker in self._engine_pool.getIdleWorkers():
+            build_plate_to_be_sliced = None #type: Optional[int]
+            while self._build_plates_to_be_sliced and build_plate_to_be_sliced is None:
+                build_plate_to_be_sliced = self._build_plates_to_be_sliced.pop(0)
+                if build_plate_to_be_sliced not in num_objects or num_objects[build_plate_to_be_sliced] == 0:
+                    self._scene.gcode_dict[build_plate_to_be_sliced] = [] #type: ignore #Because we create this attribute in slice().
+                    Logger.log("d", "Build plate %s has no objects to be sliced, skipping", build_plate_to_be_sliced)
+                    build_plate_to_be_sliced = None
+            if build_plate_to_be_sliced is None:
+                return
+
+            Logger.log("d", "Going to slice build plate [%s] on the engine on port %s!", build_plate_to_be_sliced, worker.getPort())
+            self._stored_optimized_layer_data[build_plate_to_be_sliced] = []
+            self._scene.gcode_dict[build_plate_to_be_sliced] = [] #type: ignore #Because we create this attribute in slice().
+            if self._application.getPrintInformation() and build_plate_to_be_sliced == active_build_plate:
+                self._application.getPrintInformation().setToZeroPrintInformation(build_plate_to_be_sliced)
+
+            worker.reserve(build_plate_to_be_sliced)
+            job = StartSliceJob(worker.createSliceMessage())
+            job.setBuildPlate(build_plate_to_be_sliced)
+            worker.start_slice_job = job
+            job.finished.connect(self._onEnginePoolStartSliceCompleted)
+            job.start()
+
+    def _onEnginePoolStartSliceCompleted(self, job: StartSliceJob) -> None:
+        """Called when the slice message for an engine of the engine pool is built.
+
+        :param job: The start slice job that was just finished.
+        """
+
+        if self._engine_pool is None:
+            return
+        for worker in self._engine_pool.getWorkers():
+            if worker.start_slice_job is job:
+                break
+        else:  # The slice was stopped in the meantime.
+            return
+        build_plate_number = cast(int, worker.build_plate)
+
+        if job.isCancelled() or job.getError() or job.getResult() != StartJobResult.Finished:
+            # Let the main engine take this build plate, which reports the problem to the user.
+            worker.release()
+            self._build_plates_to_be_sliced.insert(0, build_plate_number)
+            if not self._slicing:
+                self.enableTimer()  # manually enable timer to be able to invoke slice, also when in manual slice mode
+                self._invokeSlice()
+            return
+
+        fingerprint = job.getSliceFingerprint()
+        cached_result = self._slice_result_cache.get(fingerprint)
+        if cached_result is not None:
+            Logger.log("d", "Using the cached slice result for build plate %s.", build_plate_number)
+            self._scene.gcode_dict[build_plate_number] = list(cached_result.gcode_list) #type: ignore #Because we generate this attribute dynamically.
+            self._stored_optimized_layer_data[build_plate_number] = list(cached_result.layers)
+            self.printDurationMessage.emit(build_plate_number, dict(cached_result.print_times), list(cached_result.material_amounts))
+            worker.release()
+            self._onEnginePoolSliceFinished(build_plate_number)
+            return
+
+        worker.slice(job.getSliceMessage(), fingerprint)
+
     def _terminate(self) -> None:
         """Terminate the engine process.
 
@@ -447,7 +586,16 @@ class CuraEngineBackend(QObject, Backend):
             self._invokeSlice()
             return
 
-        # Preparation completed, send it to the backend.
+        # Preparation completed. If the same message was sliced before, there's no need to send it to the backend.
+        fingerprint = job.getSliceFingerprint()
+        cached_result = self._slice_result_cache.get(fingerprint)
+        if cached_result is not None:
+            Logger.log("d", "Using the cached slice result for build plate %s.", self._start_slice_job_build_plate)
+            self._restoreSliceResult(cached_result)
+            return
+
+        self._slice_fingerprint = fingerprint
+        self._slice_print_estimates = ({}, [])
         self._socket.sendMessage(job.getSliceMessage())
 
         # Notify the user that it's now up to the backend to do it's job
@@ -531,6 +679,11 @@ class CuraEngineBackend(QObject, Backend):
                 if mesh_data is None or mesh_data.getVertices() is None:
                     return
 
+            if self._node_slice_states.get(id(source)) == self._getNodeSliceState(source):
+                # Nothing changed that influences the slice result, so let the current slice finish.
+                self._slice_scheduler.registerIgnoredChange()
+                return
+
             # There are some SceneNodes that do not have any build plate associated, then do not add to the list.
             if source_build_plate_number is not None:
                 build_plate_changed.add(source_build_plate_number)
@@ -544,6 +697,12 @@ class CuraEngineBackend(QObject, Backend):
                 self._postponed_scene_change_sources.append(source)
             return
 
+        if source != self._scene.getRoot():
+            self._node_slice_states[id(source)] = self._getNodeSliceState(source)
+        else:  # Forget the nodes that were removed.
+            node_ids = {id(node) for node in DepthFirstIterator(self._scene.getRoot())}
+            self._node_slice_states = {node_id: state for node_id, state in self._node_slice_states.items() if node_id in node_ids}
+        self._slice_scheduler.registerChange()
         self.stopSlicing()
         for build_plate_number in build_plate_changed:
             if build_plate_number not in self._build_plates_to_be_sliced:
@@ -554,6 +713,23 @@ class CuraEngineBackend(QObject, Backend):
 
         self._invokeSlice()
 
+    def _getNodeSliceState(self, node: SceneNode) -> Tuple[Any, ...]:
+        """Get the properties of a scene node that influence the slice result.
+
+        If these are the same as when the node was sliced, a change of the node (such as selecting it) needs no slice.
+        """
+
+        mesh_data = node.getMeshData()
+        return (
+            node.getWorldTransformation().getData().tobytes(),
+            id(mesh_data) if mesh_data is not None else None,
+            node.isVisible(),
+            node.isOutsideBuildArea() if isinstance(node, CuraSceneNode) else False,
+            node.callDecoration("getBuildPlateNumber"),
+            node.callDecoration("getActiveExtruderPosition"),
+            node.callDecoration("isGroup")
+        )
+
     def _onSocketError(self, error: Arcus.Error) -> None:
         """Called when an error occurs in the socket connection towards the engine.
 
@@ -626,6 +802,7 @@ class CuraEngineBackend(QObject, Backend):
         :param property: The property of the setting instance that has changed.
         """
         if property == "value":  # Only reslice if the value has changed.
+            self._slice_scheduler.registerChange()
             self.needsSlicing()
             self._onChanged()
 
@@ -667,9 +844,24 @@ class CuraEngineBackend(QObject, Backend):
         :param message: The protobuf message containing the slicing progress.
         """
 
-        self.processingProgress.emit(message.amount)
+        self._main_engine_progress = message.amount
+        self._emitSlicingProgress()
         self.setState(BackendState.Processing)
 
+    def _isEnginePoolSlicing(self) -> bool:
+        """Whether any engine of the engine pool is still busy with a build plate."""
+
+        return self._engine_pool is not None and bool(self._engine_pool.getBusyBuildPlates())
+
+    def _emitSlicingProgress(self) -> None:
+        """Report the progress of all engines that are slicing, the main engine and those of the engine pool."""
+
+        amounts = [worker.progress for worker in self._engine_pool.getBusyWorkers()] if self._engine_pool is not None else []
+        if self._slicing:
+            amounts.append(self._main_engine_progress)
+        if amounts:
+            self.processingProgress.emit(sum(amounts) / len(amounts))
+
     def _invokeSlice(self) -> None:
         if self._use_timer:
             # if the error check is scheduled, wait for the error check finish signal to trigger auto-slice,
@@ -681,7 +873,7 @@ class CuraEngineBackend(QObject, Backend):
             if self._machine_error_checker.needToWaitForResult:
                 self._change_timer.stop()
             else:
-                self._change_timer.start()
+                self._startChangeTimer()
 
     def _onSlicingFinishedMessage(self, message: Arcus.PythonMessage) -> None:
         """Called when the engine sends a message that slicing is finished.
@@ -689,36 +881,50 @@ class CuraEngineBackend(QObject, Backend):
         :param message: The protobuf message signalling that slicing is finished.
         """
 
-        self.setState(BackendState.Done)
-        self.processingProgress.emit(1.0)
-
         try:
             gcode_list = self._scene.gcode_dict[self._start_slice_job_build_plate] #type: ignore #Because we generate this attribute dynamically.
         except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
-            gcode_list = []
-        for index, line in enumerate(gcode_list):
-            replaced = line.replace("{print_time}", str(self._application.getPrintInformation().currentPrintTime.getDisplayString(DurationFormat.Format.ISO8601)))
-            replaced = replaced.replace("{filament_amount}", str(self._application.getPrintInformation().materialLengths))
-            replaced = replaced.replace("{filament_weight}", str(self._application.getPrintInformation().materialWeights))
-            replaced = replaced.replace("{filament_cost}", str(self._application.getPrintInformation().materialCosts))
-            replaced = replaced.replace("{jobname}", str(self._application.getPrintInformation().jobName))
+            gcode_list = None
 
-            gcode_list[index] = replaced
+        # Remember the result, before the print information gets filled in, in case the same message gets sliced again.
+        if self._slice_fingerprint is not None and gcode_list is not None:
+            layers = self._stored_optimized_layer_data.get(cast(int, self._start_slice_job_build_plate), [])
+            self._slice_result_cache.put(self._slice_fingerprint, SliceResult(list(gcode_list), list(layers), *self._slice_print_estimates))
+        self._slice_fingerprint = None
+
+        self._slice_scheduler.registerSliceFinished()
+        self._finishSlicing()
+
+    def _restoreSliceResult(self, result: SliceResult) -> None:
+        """Show the result of an earlier slice as if the engine had just sliced it.
+
+        :param result: The slice result to restore for the build plate that is being sliced.
+        """
+
+        self._scene.gcode_dict[self._start_slice_job_build_plate] = list(result.gcode_list) #type: ignore #Because we generate this attribute dynamically.
+        self._stored_optimized_layer_data[cast(int, self._start_slice_job_build_plate)] = list(result.layers)
+        self.printDurationMessage.emit(self._start_slice_job_build_plate, dict(result.print_times), list(result.material_amounts))
+        self._finishSlicing()
+
+    def _finishSlicing(self) -> None:
+        """Fill in the print information in the g-code and process the layers, now that the slice is done."""
 
         self._slicing = False
+        if self._isEnginePoolSlicing():
+            # The g-code isn't complete until the engine pool has sliced the other build plates too.
+            self.setState(BackendState.Processing)
+            self._emitSlicingProgress()
+        else:
+            self.setState(BackendState.Done)
+            self.processingProgress.emit(1.0)
+
+        self._replacePrintInformationTokens(cast(int, self._start_slice_job_build_plate))
         if self._slice_start_time:
             Logger.log("d", "Slicing took %s seconds", time() - self._slice_start_time )
         Logger.log("d", "Number of models per buildplate: %s", dict(self._numObjectsPerBuildPlate()))
 
         # See if we need to process the sliced layers job.
-        active_build_plate = self._application.getMultiBuildPlateModel().activeBuildPlate
-        if (
-            self._layer_view_active and
-            (self._process_layers_job is None or not self._process_layers_job.isRunning()) and
-            active_build_plate == self._start_slice_job_build_plate and
-            active_build_plate not in self._build_plates_to_be_sliced):
-
-            self._startProcessSlicedLayersJob(active_build_plate)
+        self._processLayersIfVisible(cast(int, self._start_slice_job_build_plate))
         # self._onActiveViewChanged()
         self._start_slice_job_build_plate = None
 
@@ -730,6 +936,144 @@ class CuraEngineBackend(QObject, Backend):
             self.enableTimer()  # manually enable timer to be able to invoke slice, also when in manual slice mode
             self._invokeSlice()
 
+    def _replacePrintInformationTokens(self, build_plate_number: int) -> None:
+        """Fill in the print information in the g-code of a build plate that was just sliced."""
+
+        try:
+            gcode_list = self._scene.gcode_dict[build_plate_number] #type: ignore #Because we generate this attribute dynamically.
+        except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
+            gcode_list = []
+
+        token_locations = self._gcode_token_locations.pop(build_plate_number, None)
+        if self._application.getPreferences().getValue("backend/gcode_token_full_scan") or token_locations is None or not token_locations.isTracking(gcode_list):
+            indices = range(len(gcode_list))  # E.g. g-code from the slice result cache, which wasn't tracked.
+        else:
+            indices = token_locations.getIndices()
+        if not indices:
+            return
+
+        print_information = self._application.getPrintInformation()
+        print_time = str(print_information.currentPrintTime.getDisplayString(DurationFormat.Format.ISO8601))
+        filament_amount = str(print_information.materialLengths)
+        filament_weight = str(print_information.materialWeights)
+        filament_cost = str(print_information.materialCosts)
+        job_name = str(print_information.jobName)
+        for index in indices:
+            replaced = gcode_list[index].replace("{print_time}", print_time)
+            replaced = replaced.replace("{filament_amount}", filament_amount)
+            replaced = replaced.replace("{filament_weight}", filament_weight)
+            replaced = replaced.replace("{filament_cost}", filament_cost)
+            replaced = replaced.replace("{jobname}", job_name)
+
+            gcode_list[index] = replaced
+
+    def _getGCodeTokenLocations(self, build_plate_number: int) -> GCodeTokenLocations:
+        """Get the object to add g-code chunks for a build plate with, remembering where the tokens are.
+
+        :raise KeyError: If there is no g-code list for the build plate.
+        """
+
+        gcode_list = self._scene.gcode_dict[build_plate_number] #type: ignore #Because we generate this attribute dynamically.
+        token_locations = self._gcode_token_locations.get(build_plate_number)
+        if token_locations is None or not token_locations.isTracking(gcode_list):
+            token_locations = GCodeTokenLocations(gcode_list)
+            self._gcode_token_locations[build_plate_number] = token_locations
+        return token_locations
+
+    def _processLayersIfVisible(self, build_plate_number: int) -> None:
+        """Start processing the sliced layers of a build plate, if the layer view shows that build plate."""
+
+        active_build_plate = self._application.getMultiBuildPlateModel().activeBuildPlate
+        if (
+            self._layer_view_active and
+            (self._process_layers_job is None or not self._process_layers_job.isRunning()) and
+            active_build_plate == build_plate_number and
+            active_build_plate not in self._build_plates_to_be_sliced):
+
+            self._startProcessSlicedLayersJob(active_build_plate)
+
+    def _onEnginePoolMessage(self, worker: EngineWorker, message: Arcus.PythonMessage) -> None:
+        """Called when an engine of the engine pool sends a message.
+
+        :param worker: The engine worker that received the message.
+        :param message: The protobuf message.
+        """
+
+        build_plate_number = worker.build_plate
+        if build_plate_number is None:  # A message about a slice that was stopped.
+            return
+
+        message_type = message.getTypeName()
+        if message_type == "cura.proto.LayerOptimized":
+            self._stored_optimized_layer_data.setdefault(build_plate_number, []).append(message)
+        elif message_type == "cura.proto.GCodeLayer":
+            try:
+                self._getGCodeTokenLocations(build_plate_number).append(message.data.decode("utf-8", "replace"))
+            except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
+                pass  # Throw the message away.
+        elif message_type == "cura.proto.GCodePrefix":
+            try:
+                self._getGCodeTokenLocations(build_plate_number).insertPrefix(message.data.decode("utf-8", "replace"))
+            except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
+                pass  # Throw the message away.
+        elif message_type == "cura.proto.Progress":
+            worker.progress = message.amount
+            self._emitSlicingProgress()
+            self.setState(BackendState.Processing)
+        elif message_type == "cura.proto.PrintTimeMaterialEstimates":
+            worker.print_estimates = (self._parseMessagePrintTimes(message), self._parseMessageMaterialAmounts(message))
+            self.printDurationMessage.emit(build_plate_number, *worker.print_estimates)
+        elif message_type == "cura.proto.SlicingFinished":
+            gcode_list = getattr(self._scene, "gcode_dict", {}).get(build_plate_number)
+            if worker.fingerprint is not None and gcode_list is not None:
+                layers = self._stored_optimized_layer_data.get(build_plate_number, [])
+                self._slice_result_cache.put(worker.fingerprint, SliceResult(list(gcode_list), list(layers), *worker.print_estimates))
+            worker.finish()
+            self._onEnginePoolSliceFinished(build_plate_number)
+
+    def _onEnginePoolSliceFinished(self, build_plate_number: int) -> None:
+        """Called when a build plate was sliced by the engine pool, to finish it and slice the next one."""
+
+        Logger.log("d", "Build plate %s was sliced by the engine pool.", build_plate_number)
+        self._replacePrintInformationTokens(build_plate_number)
+        self._processLayersIfVisible(build_plate_number)
+        self._dispatchToEnginePool()
+
+        if self._slicing or self._isEnginePoolSlicing():
+            self._emitSlicingProgress()
+        elif self._build_plates_to_be_sliced:
+            # No engine of the pool was free to take them, so let the main engine continue.
+            self.enableTimer()  # manually enable timer to be able to invoke slice, also when in manual slice mode
+            self._invokeSlice()
+        else:
+            self.setState(BackendState.Done)
+            self.processingProgress.emit(1.0)
+
+    def _onEnginePoolInterrupted(self, build_plate_number: int) -> None:
+        """Called when the connection with an engine of the pool failed while it was slicing a build plate."""
+
+        if build_plate_number not in self._build_plates_to_be_sliced:
+            self._build_plates_to_be_sliced.append(build_plate_number)
+        self._dispatchToEnginePool()
+
+    def _updateEnginePool(self) -> None:
+        """Start or stop engines of the engine pool to match the preference."""
+
+        if self._application.getUseExternalBackend():  # We can't start the extra engines ourselves.
+            return
+        pool_size = int(self._application.getPreferences().getValue("backend/engine_pool_size"))
+        if self._engine_pool is None:
+            if pool_size <= 0:
+                return
+            plugin_path = PluginRegistry.getInstance().getPluginPath(self.getPluginId())
+            if not plugin_path:
+                Logger.error("Could not get plugin path!", self.getPluginId())
+                return
+            protocol_file = os.path.abspath(os.path.join(plugin_path, "Cura.proto"))
+            self._engine_pool = EnginePool(protocol_file, self._port + self.ENGINE_POOL_PORT_OFFSET, self.getEngineCommand, self._onEnginePoolMessage, self._onEnginePoolInterrupted, lambda: self._port)
+        for build_plate_number in self._engine_pool.setSize(pool_size):
+            self._onEnginePoolInterrupted(build_plate_number)
+
     def _onGCodeLayerMessage(self, message: Arcus.PythonMessage) -> None:
         """Called when a g-code message is received from the engine.
 
@@ -737,7 +1081,7 @@ class CuraEngineBackend(QObject, Backend):
         """
 
         try:
-            self._scene.gcode_dict[self._start_slice_job_build_plate].append(message.data.decode("utf-8", "replace")) #type: ignore #Because we generate this attribute dynamically.
+            self._getGCodeTokenLocations(cast(int, self._start_slice_job_build_plate)).append(message.data.decode("utf-8", "replace"))
         except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
             pass  # Throw the message away.
 
@@ -749,7 +1093,7 @@ class CuraEngineBackend(QObject, Backend):
         """
 
         try:
-            self._scene.gcode_dict[self._start_slice_job_build_plate].insert(0, message.data.decode("utf-8", "replace")) #type: ignore #Because we generate this attribute dynamically.
+            self._getGCodeTokenLocations(cast(int, self._start_slice_job_build_plate)).insertPrefix(message.data.decode("utf-8", "replace"))
         except KeyError:  # Can occur if the g-code has been cleared while a slice message is still arriving from the other end.
             pass  # Throw the message away.
 
@@ -785,7 +1129,17 @@ class CuraEngineBackend(QObject, Backend):
             if self._machine_error_checker.needToWaitForResult:
                 self._change_timer.stop()
             else:
-                self._change_timer.start()
+                self._startChangeTimer()
+
+    def _onContainersChanged(self, *args: Any) -> None:
+        self._slice_scheduler.registerChange()
+        self._onChanged()
+
+    def _startChangeTimer(self) -> None:
+        """(Re)start the timer to slice after, with the delay that fits the recent slices and changes."""
+
+        self._change_timer.setInterval(self._slice_scheduler.getDelay())
+        self._change_timer.start()
 
     def _onPrintTimeMaterialEstimates(self, message: Arcus.PythonMessage) -> None:
         """Called when a print time message is received from the engine.
@@ -794,12 +1148,21 @@ class CuraEngineBackend(QObject, Backend):
             material amount per extruder
         """
 
+        material_amounts = self._parseMessageMaterialAmounts(message)
+        times = self._parseMessagePrintTimes(message)
+        self._slice_print_estimates = (times, material_amounts)
+        self.printDurationMessage.emit(self._start_slice_job_build_plate, times, material_amounts)
+
+    def _parseMessageMaterialAmounts(self, message: Arcus.PythonMessage) -> List[float]:
+        """Called for parsing message to retrieve the estimated material amount per extruder
+
+        :param message: The protobuf message containing the material amount per extruder
+        """
+
         material_amounts = []
         for index in range(message.repeatedMessageCount("materialEstimates")):
             material_amounts.append(message.getRepeatedMessage("materialEstimates", index).material_amount)
-
-        times = self._parseMessagePrintTimes(message)
-        self.printDurationMessage.emit(self._start_slice_job_build_plate, times, material_amounts)
+        return material_amounts
 
     def _parseMessagePrintTimes(self, message: Arcus.PythonMessage) -> Dict[str, float]:
         """Called for parsing message to retrieve estimated time per feature
@@ -862,7 +1225,8 @@ class CuraEngineBackend(QObject, Backend):
             self._onSceneChanged(source)
 
     def _startProcessSlicedLayersJob(self, build_plate_number: int) -> None:
-        self._process_layers_job = ProcessSlicedLayersJob(self._stored_optimized_layer_data[build_plate_number])
+        streaming_chunk_size = int(self._application.getPreferences().getValue("backend/layer_streaming_chunk_size"))
+        self._process_layers_job = ProcessSlicedLayersJob(self._stored_optimized_layer_data[build_plate_number], streaming_chunk_size)
         self._process_layers_job.setBuildPlate(build_plate_number)
         self._process_layers_job.finished.connect(self._onProcessLayersFinished)
         self._process_layers_job.start()
@@ -881,7 +1245,8 @@ class CuraEngineBackend(QObject, Backend):
                 if (active_build_plate in self._stored_optimized_layer_data and
                     not self._slicing and
                     not self._process_layers_job and
-                    active_build_plate not in self._build_plates_to_be_sliced):
+                    active_build_plate not in self._build_plates_to_be_sliced and
+                    (self._engine_pool is None or active_build_plate not in self._engine_pool.getBusyBuildPlates())):
 
                     self._startProcessSlicedLayersJob(active_build_plate)
             else:
@@ -903,21 +1268,21 @@ class CuraEngineBackend(QObject, Backend):
 
         if self._global_container_stack:
             self._global_container_stack.propertyChanged.disconnect(self._onSettingChanged)
-            self._global_container_stack.containersChanged.disconnect(self._onChanged)
+            self._global_container_stack.containersChanged.disconnect(self._onContainersChanged)
 
             for extruder in self._global_container_stack.extruderList:
                 extruder.propertyChanged.disconnect(self._onSettingChanged)
-                extruder.containersChanged.disconnect(self._onChanged)
+                extruder.containersChanged.disconnect(self._onContainersChanged)
 
         self._global_container_stack = self._application.getMachineManager().activeMachine
 
         if self._global_container_stack:
             self._global_container_stack.propertyChanged.connect(self._onSettingChanged)  # Note: Only starts slicing when the value changed.
-            self._global_container_stack.containersChanged.connect(self._onChanged)
+            self._global_container_stack.containersChanged.connect(self._onContainersChanged)
 
             for extruder in self._global_container_stack.extruderList:
                 extruder.propertyChanged.connect(self._onSettingChanged)
-                extruder.containersChanged.connect(self._onChanged)
+                extruder.containersChanged.connect(self._onContainersChanged)
             self._onChanged()
 
     def _onProcessLayersFinished(self, job: ProcessSlicedLayersJob) -> None:
@@ -945,18 +1310,35 @@ class CuraEngineBackend(QObject, Backend):
             self._use_timer = False
             self._change_timer.timeout.disconnect(self.slice)
 
+    def _updateSliceResultCache(self) -> None:
+        """Apply the preferences of the slice result cache."""
+
+        preferences = self._application.getPreferences()
+        self._slice_result_cache.setMaxSize(int(preferences.getValue("backend/slice_result_cache_size")))
+        if preferences.getValue("backend/slice_result_cache_on_disk"):
+            self._slice_result_cache.setStoragePath(os.path.join(Resources.getCacheStoragePath(), "slice_results"))
+        else:
+            self._slice_result_cache.setStoragePath(None)
+
     def _onPreferencesChanged(self, preference: str) -> None:
+        if preference in ("backend/slice_result_cache_size", "backend/slice_result_cache_on_disk"):
+            self._updateSliceResultCache()
+            return
+        if preference == "backend/engine_pool_size":
+            self._updateEnginePool()
+            return
         if preference != "general/auto_slice":
             return
         auto_slice = self.determineAutoSlicing()
         if auto_slice:
-            self._change_timer.start()
+            self._startChangeTimer()
 
     def tickle(self) -> None:
         """Tickle the backend so in case of auto slicing, it starts the timer."""
 
+        self._slice_scheduler.registerChange()
         if self._use_timer:
-            self._change_timer.start()
+            self._startChangeTimer()
 
     def _extruderChanged(self) -> None:
         if not self._multi_build_plate_model:
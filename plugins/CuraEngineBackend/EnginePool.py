@@ -0,0 +1,261 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import subprocess
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from UM.Backend.SignalSocket import SignalSocket
+from UM.Job import Job
+from UM.Logger import Logger
+
+import Arcus
+
+
+class EngineWorker:
+    """A CuraEngine process with its own socket, to slice a build plate next to the main engine of the backend.
+
+    The engine is restarted after every slice, so each slice starts with a fresh engine.
+    """
+
+    def __init__(self, protocol_file: str, port: int, engine_command: Callable[[int], List[str]], message_handler: Callable[["EngineWorker", Arcus.PythonMessage], None], interrupted_handler: Callable[[int], None], is_port_reserved: Optional[Callable[[int], bool]] = None) -> None:
+        """Creates an engine worker. Call start() to start the engine.
+
+        :param protocol_file: The protobuf file with the messages to register on the socket.
+        :param port: The port to listen on for the engine. If it's taken, the next free port is used.
+        :param engine_command: Function that creates the command to start the engine with for a port.
+        :param message_handler: Function that is called with this worker and each message that the engine sends.
+        :param interrupted_handler: Function that is called with the build plate that was being sliced when the
+            connection with the engine failed.
+        :param is_port_reserved: Function that tells whether a port is used by another engine, so that it's skipped.
+        """
+
+        self._protocol_file = protocol_file
+        self._is_port_reserved = is_port_reserved
+        self._port = self._findPort(port)
+        self._engine_command = engine_command
+        self._message_handler = message_handler
+        self._interrupted_handler = interrupted_handler
+
+        self._socket = None  # type: Optional[SignalSocket]
+        self._process = None  # type: Optional[subprocess.Popen]
+        self._connected = False
+
+        # State of the slice that this worker is busy with.
+        self.build_plate = None  # type: Optional[int]
+        self.start_slice_job = None  # type: Optional[Job]
+        self.fingerprint = None  # type: Optional[str]
+        self.print_estimates = ({}, [])  # type: Tuple[Dict[str, float], List[float]]
+        self.progress = 0.0  # How far the engine is with slicing the build plate, from 0 to 1.
+
+    def getPort(self) -> int:
+        return self._port
+
+    def isIdle(self) -> bool:
+        """Whether the engine is connected and not slicing, so it can take a new slice message."""
+
+        return self._connected and self.build_plate is None
+
+    def isBusy(self) -> bool:
+        return self.build_plate is not None
+
+    def createSliceMessage(self) -> Arcus.PythonMessage:
+        return self._socket.createMessage("cura.proto.Slice")
+
+    def reserve(self, build_plate: int) -> None:
+        """Reserve the worker for slicing a build plate, while its slice message is being built."""
+
+        self.build_plate = build_plate
+        self.start_slice_job = None
+        self.fingerprint = None
+        self.print_estimates = ({}, [])
+        self.progress = 0.0
+
+    def slice(self, message: Arcus.PythonMessage, fingerprint: Optional[str] = None) -> None:
+        """Send a slice message to the engine, for the build plate that the worker is reserved for."""
+
+        self.fingerprint = fingerprint
+        if self._socket is not None:
+            self._socket.sendMessage(message)
+
+    def release(self) -> None:
+        """Stop reserving the worker for a build plate, without having sent a slice message to the engine."""
+
+        self.build_plate = None
+        self.start_slice_job = None
+        self.fingerprint = None
+
+    def finish(self) -> None:
+        """Called when the engine finished slicing. Restarts the engine for the next slice."""
+
+        self.stop()
+        self.start()
+
+    def start(self) -> None:
+        """Create the socket. The engine is started as soon as the socket is listening."""
+
+        self._connected = False
+        self._socket = SignalSocket()
+        self._socket.stateChanged.connect(self._onSocketStateChanged)
+        self._socket.messageReceived.connect(self._onMessageReceived)
+        self._socket.error.connect(self._onSocketError)
+        if not self._socket.registerAllMessageTypes(self._protocol_file):
+            Logger.log("e", "Could not register Cura protocol messages for engine on port %s: %s", self._port, self._socket.getLastError())
+        self._socket.listen("127.0.0.1", self._port)
+
+    def stop(self) -> Optional[int]:
+        """Stop the engine and close the socket.
+
+        :return: The build plate that the worker was slicing, if any, so that it can be sliced again later.
+        """
+
+        build_plate = self.build_plate
+        self.release()
+        self._connected = False
+        if self._process is not None:
+            try:
+                self._process.terminate()
+                self._process.wait()
+            except Exception as e:  # Terminating a process that is already terminating causes an exception.
+                Logger.log("d", "Exception occurred while trying to kill engine on port %s: %s", self._port, str(e))
+            self._process = None
+        if self._socket is not None:
+            self._socket.stateChanged.disconnect(self._onSocketStateChanged)
+            self._socket.messageReceived.disconnect(self._onMessageReceived)
+            self._socket.error.disconnect(self._onSocketError)
+            self._socket.close()
+            self._socket = None
+        return build_plate
+
+    def restart(self) -> Optional[int]:
+        build_plate = self.stop()
+        self.start()
+        return build_plate
+
+    def _startEngine(self) -> None:
+        command = self._engine_command(self._port)
+        kwargs = {}  # type: Dict[str, Any]
+        if sys.platform == "win32":
+            su = subprocess.STARTUPINFO()
+            su.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            su.wShowWindow = subprocess.SW_HIDE
+            kwargs["startupinfo"] = su
+            kwargs["creationflags"] = 0x00004000  # BELOW_NORMAL_PRIORITY_CLASS
+        try:
+            # The output of the engine isn't read, so don't let it fill up a pipe.
+            self._process = subprocess.Popen(command, stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, **kwargs)
+        except OSError:
+            Logger.logException("e", "Unable to start engine on port %s", self._port)
+
+    def _onSocketStateChanged(self, state: Arcus.SocketState) -> None:
+        if state == Arcus.SocketState.Listening:
+            self._startEngine()
+        elif state == Arcus.SocketState.Connected:
+            Logger.log("d", "Pool engine connected on port %s", self._port)
+            self._connected = True
+
+    def _onMessageReceived(self) -> None:
+        if self._socket is None:
+            return
+        message = self._socket.takeNextMessage()
+        self._message_handler(self, message)
+
+    def _findPort(self, port: int) -> int:
+        """Get the first port from the given port on that isn't used by another engine."""
+
+        while self._is_port_reserved is not None and self._is_port_reserved(port):
+            port += 1
+        return port
+
+    def _onSocketError(self, error: Arcus.Error) -> None:
+        if error.getErrorCode() == Arcus.ErrorCode.Debug:
+            return
+        Logger.log("w", "Socket error of pool engine on port %s: %s", self._port, error.toString())
+        if error.getErrorCode() == Arcus.ErrorCode.BindFailedError:
+            self._port = self._findPort(self._port + 1)  # Someone else is using this port. Try the next one.
+        build_plate = self.restart()
+        if build_plate is not None:
+            self._interrupted_handler(build_plate)
+
+
+class EnginePool:
+    """A pool of engine workers, to slice multiple build plates at the same time."""
+
+    def __init__(self, protocol_file: str, first_port: int, engine_command: Callable[[int], List[str]], message_handler: Callable[[EngineWorker, Arcus.PythonMessage], None], interrupted_handler: Callable[[int], None], get_main_port: Optional[Callable[[], int]] = None) -> None:
+        """Creates an empty engine pool. Use setSize() to start engines.
+
+        :param protocol_file: The protobuf file with the messages to register on the sockets.
+        :param first_port: The port of the first engine. The other engines get the ports after it.
+        :param engine_command: Function that creates the command to start an engine with for a port.
+        :param message_handler: Function that is called with the worker and each message that an engine sends.
+        :param interrupted_handler: Function that is called with the build plate that an engine was slicing when
+            the connection with it failed.
+        :param get_main_port: Function that gets the current port of the main engine, which the pool must not use.
+        """
+
+        self._protocol_file = protocol_file
+        self._first_port = first_port
+        self._get_main_port = get_main_port
+        self._engine_command = engine_command
+        self._message_handler = message_handler
+        self._interrupted_handler = interrupted_handler
+        self._workers = []  # type: List[EngineWorker]
+
+    def getSize(self) -> int:
+        return len(self._workers)
+
+    def setSize(self, size: int) -> List[int]:
+        """Start or stop engines to get the given number of engines.
+
+        :return: The build plates that stopped engines were slicing.
+        """
+
+        interrupted_build_plates = []  # type: List[int]
+        while len(self._workers) > max(size, 0):
+            build_plate = self._workers.pop().stop()
+            if build_plate is not None:
+                interrupted_build_plates.append(build_plate)
+        while len(self._workers) < size:
+            port = self._first_port + len(self._workers)
+            if self._workers:
+                port = max(port, self._workers[-1].getPort() + 1)
+            worker = EngineWorker(self._protocol_file, port, self._engine_command, self._message_handler, self._interrupted_handler, self._isPortReserved)
+            worker.start()
+            self._workers.append(worker)
+        return interrupted_build_plates
+
+    def _isPortReserved(self, port: int) -> bool:
+        """Whether a port is used by the main engine or by one of the engines of the pool."""
+
+        if self._get_main_port is not None and port == self._get_main_port():
+            return True
+        return any(worker.getPort() == port for worker in self._workers)
+
+    def getWorkers(self) -> List[EngineWorker]:
+        return self._workers
+
+    def getIdleWorkers(self) -> List[EngineWorker]:
+        return [worker for worker in self._workers if worker.isIdle()]
+
+    def getBusyBuildPlates(self) -> List[int]:
+        return [worker.build_plate for worker in self._workers if worker.build_plate is not None]
+
+    def getBusyWorkers(self) -> List[EngineWorker]:
+        return [worker for worker in self._workers if worker.isBusy()]
+
+    def stopSlicing(self) -> List[int]:
+        """Abort all slices that are in progress, restarting the engines that were slicing.
+
+        :return: The build plates that were being sliced.
+        """
+
+        interrupted_build_plates = []  # type: List[int]
+        for worker in self._workers:
+            if worker.isBusy():
+                build_plate = worker.restart()
+                if build_plate is not None:
+                    interrupted_build_plates.append(build_plate)
+        return interrupted_build_plates
+
+    def close(self) -> None:
+        self.setSize(0)
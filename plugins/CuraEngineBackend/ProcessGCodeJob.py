@@ -1,9 +1,57 @@
 # Copyright (c) 2015 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+from typing import List
+
 from UM.Job import Job
 from UM.Application import Application
 
+# Tokens in the g-code that are replaced with the print information once slicing is finished.
+PRINT_INFORMATION_TOKENS = ["{print_time}", "{filament_amount}", "{filament_weight}", "{filament_cost}", "{jobname}"]
+
+
+class GCodeTokenLocations:
+    """Remembers which chunks of a g-code list contain print information tokens, while the chunks arrive.
+
+    This way the tokens can be replaced in just those chunks when slicing is finished, instead of searching all the
+    g-code for them. The tokens normally only occur in the start and end g-code.
+    """
+
+    def __init__(self, gcode_list: List[str]) -> None:
+        self._gcode_list = gcode_list
+        self._indices = []  # type: List[int]
+
+    def isTracking(self, gcode_list: List[str]) -> bool:
+        """Whether these are the locations in this g-code list, rather than in a list that has been replaced since."""
+
+        return gcode_list is self._gcode_list
+
+    def append(self, chunk: str) -> None:
+        """Add a chunk to the end of the g-code list."""
+
+        if self._hasTokens(chunk):
+            self._indices.append(len(self._gcode_list))
+        self._gcode_list.append(chunk)
+
+    def insertPrefix(self, chunk: str) -> None:
+        """Add a chunk to the start of the g-code list."""
+
+        self._indices = [index + 1 for index in self._indices]
+        if self._hasTokens(chunk):
+            self._indices.insert(0, 0)
+        self._gcode_list.insert(0, chunk)
+
+    def getIndices(self) -> List[int]:
+        """Get the indices of the chunks in the g-code list that contain print information tokens."""
+
+        return self._indices
+
+    @staticmethod
+    def _hasTokens(chunk: str) -> bool:
+        # Most chunks contain no braces at all, which is much quicker to find out than looking for each token.
+        return "{" in chunk and any(token in chunk for token in PRINT_INFORMATION_TOKENS)
+
+
 class ProcessGCodeLayerJob(Job):
     def __init__(self, message):
         super().__init__()
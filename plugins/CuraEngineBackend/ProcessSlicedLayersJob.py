@@ -24,7 +24,12 @@ from cura import LayerPolygon
 
 import numpy
 from time import time
+from typing import Tuple, TYPE_CHECKING
 from cura.Machines.Models.ExtrudersModel import ExtrudersModel
+
+if TYPE_CHECKING:
+    from cura.LayerData import LayerData
+
 catalog = i18nCatalog("cura")
 
 
@@ -45,9 +50,18 @@ def colorCodeToRGBA(color_code):
 
 
 class ProcessSlicedLayersJob(Job):
-    def __init__(self, layers):
+    def __init__(self, layers, streaming_chunk_size = 0):
+        """Creates a job to turn the optimized layer messages of the engine into layer data.
+
+        :param layers: The LayerOptimized messages received from the engine.
+        :param streaming_chunk_size: If positive, the layer mesh is built and shown in the scene once this many layers
+            have been processed, so the first layers can be viewed while the rest is still processed. After that it's
+            shown again every time that the number of processed layers doubled.
+        """
+
         super().__init__()
         self._layers = layers
+        self._streaming_chunk_size = streaming_chunk_size
         self._scene = Application.getInstance().getController().getScene()
         self._progress_message = Message(catalog.i18nc("@info:status", "Processing Layers"), 0, False, -1)
         self._abort_requested = False
@@ -96,9 +110,18 @@ class ProcessSlicedLayersJob(Job):
         gc.collect()
 
         mesh = MeshData()
+        new_node.setMeshData(mesh)
         layer_data = LayerDataBuilder.LayerDataBuilder()
         layer_count = len(self._layers)
 
+        # The colors are needed up front if the layer mesh gets built while the layers are being processed.
+        material_color_map = self._getMaterialColorMap()
+        # We have to scale the colors for compatibility mode
+        if OpenGLContext.isLegacyOpenGL() or bool(Application.getInstance().getPreferences().getValue("view/force_layer_view_compatibility_mode")):
+            line_type_brightness = 0.5  # for compatibility mode
+        else:
+            line_type_brightness = 1.0
+
         # Find the minimum layer number
         # When disabling the remove empty first layers setting, the minimum layer number will be a positive
         # value. In that case the first empty layers will be discarded and start processing layers from the
@@ -115,7 +138,15 @@ class ProcessSlicedLayersJob(Job):
                 if layer.id < 0:
                     negative_layers += 1
 
+        # When streaming, the layers are processed bottom to top so that each chunk can be appended to the mesh.
+        if self._streaming_chunk_size > 0:
+            self._layers = sorted(self._layers, key = lambda layer_message: layer_message.id)
+
         current_layer = 0
+        layers_since_last_chunk = 0
+        # Every shown mesh is uploaded as a whole, so each chunk is as large as the layers shown before it. That way the
+        # meshes that are shown along the way are at most as large as the final one all together.
+        next_chunk_size = self._streaming_chunk_size
 
         for layer in self._layers:
             # If the layer is below the minimum, it means that there is no data, so that we don't create a layer
@@ -135,65 +166,101 @@ class ProcessSlicedLayersJob(Job):
             layer_data.setLayerHeight(abs_layer_number, layer.height)
             layer_data.setLayerThickness(abs_layer_number, layer.thickness)
 
-            for p in range(layer.repeatedMessageCount("path_segment")):
-                polygon = layer.getRepeatedMessage("path_segment", p)
-
-                extruder = polygon.extruder
-
-                line_types = numpy.fromstring(polygon.line_type, dtype = "u1")  # Convert bytearray to numpy array
-
-                line_types = line_types.reshape((-1,1))
-
-                points = numpy.fromstring(polygon.points, dtype = "f4")  # Convert bytearray to numpy array
-                if polygon.point_type == 0: # Point2D
-                    points = points.reshape((-1,2))  # We get a linear list of pairs that make up the points, so make numpy interpret them correctly.
-                else:  # Point3D
-                    points = points.reshape((-1,3))
-
-                line_widths = numpy.fromstring(polygon.line_width, dtype = "f4")  # Convert bytearray to numpy array
-                line_widths = line_widths.reshape((-1,1))  # We get a linear list of pairs that make up the points, so make numpy interpret them correctly.
-
-                line_thicknesses = numpy.fromstring(polygon.line_thickness, dtype = "f4")  # Convert bytearray to numpy array
-                line_thicknesses = line_thicknesses.reshape((-1,1))  # We get a linear list of pairs that make up the points, so make numpy interpret them correctly.
-
-                line_feedrates = numpy.fromstring(polygon.line_feedrate, dtype = "f4")  # Convert bytearray to numpy array
-                line_feedrates = line_feedrates.reshape((-1,1))  # We get a linear list of pairs that make up the points, so make numpy interpret them correctly.
-
-                # Create a new 3D-array, copy the 2D points over and insert the right height.
-                # This uses manual array creation + copy rather than numpy.insert since this is
-                # faster.
-                new_points = numpy.empty((len(points), 3), numpy.float32)
-                if polygon.point_type == 0:  # Point2D
-                    new_points[:, 0] = points[:, 0]
-                    new_points[:, 1] = layer.height / 1000  # layer height value is in backend representation
-                    new_points[:, 2] = -points[:, 1]
-                else: # Point3D
-                    new_points[:, 0] = points[:, 0]
-                    new_points[:, 1] = points[:, 2]
-                    new_points[:, 2] = -points[:, 1]
-
-                this_poly = LayerPolygon.LayerPolygon(extruder, line_types, new_points, line_widths, line_thicknesses, line_feedrates)
-                this_poly.buildCache()
-
-                this_layer.polygons.append(this_poly)
-
-                Job.yieldThread()
+            this_layer.polygons.extend(LayerPolygon.LayerPolygon.fromArrays(*self._decodePathSegments(layer)))
             Job.yieldThread()
             current_layer += 1
             progress = (current_layer / layer_count) * 99
-            # TODO: Rebuild the layer data mesh once the layer has been processed.
-            # This needs some work in LayerData so we can add the new layers instead of recreating the entire mesh.
 
             if self._abort_requested:
+                self._removeNode(new_node)
                 if self._progress_message:
                     self._progress_message.hide()
                 return
             if self._progress_message:
                 self._progress_message.setProgress(progress)
 
+            layers_since_last_chunk += 1
+            if self._streaming_chunk_size > 0 and layers_since_last_chunk >= next_chunk_size:
+                # Append the layers of this chunk to the mesh, so they can be viewed already.
+                layers_since_last_chunk = 0
+                next_chunk_size = max(self._streaming_chunk_size, current_layer)
+                layer_mesh = layer_data.build(material_color_map, line_type_brightness, incremental = True)
+                self._showLayerMesh(new_node, layer_mesh)
+
         # We are done processing all the layers we got from the engine, now create a mesh out of the data
+        layer_mesh = layer_data.build(material_color_map, line_type_brightness, incremental = self._streaming_chunk_size > 0)
+
+        if self._abort_requested:
+            self._removeNode(new_node)
+            if self._progress_message:
+                self._progress_message.hide()
+            return
+
+        self._showLayerMesh(new_node, layer_mesh)  # Note: After this we can no longer abort!
+
+        if self._progress_message:
+            self._progress_message.setProgress(100)
+
+        if self._progress_message:
+            self._progress_message.hide()
+
+        # Clear the unparsed layers. This saves us a bunch of memory if the Job does not get destroyed.
+        self._layers = None
+
+        Logger.log("d", "Processing layers took %s seconds", time() - start_time)
+
+    @staticmethod
+    def _decodePathSegments(layer) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Decode all path segments of a layer message at once.
+
+        The data of the path segments is read through views on the bytes of the message and concatenated, so that
+        the 3D points of the entire layer are computed in one go.
+        :param layer: The LayerOptimized message to decode.
+        :return: The arguments for :py:meth:`cura.LayerPolygon.LayerPolygon.fromArrays`: the extruder per path
+            segment, the offset of the first line of each path segment (with the total line count appended), and the
+            line types, 3D points, line widths, line thicknesses and line feedrates of all path segments concatenated.
+        """
+
+        segments = [layer.getRepeatedMessage("path_segment", p) for p in range(layer.repeatedMessageCount("path_segment"))]
+        extruders = numpy.array([segment.extruder for segment in segments], dtype = numpy.int32)
+        line_offsets = numpy.zeros(len(segments) + 1, dtype = numpy.int64)
+        if not segments:
+            empty_lines = numpy.empty((0, 1), dtype = numpy.float32)
+            return extruders, line_offsets, numpy.empty((0, 1), dtype = numpy.uint8), numpy.empty((0, 3), dtype = numpy.float32), empty_lines, empty_lines, empty_lines
+
+        # numpy.frombuffer doesn't copy the message data. The only copy is made when concatenating the path segments.
+        line_types = numpy.concatenate([numpy.frombuffer(segment.line_type, dtype = "u1") for segment in segments]).reshape((-1, 1))
+        line_widths = numpy.concatenate([numpy.frombuffer(segment.line_width, dtype = "f4") for segment in segments]).reshape((-1, 1))
+        line_thicknesses = numpy.concatenate([numpy.frombuffer(segment.line_thickness, dtype = "f4") for segment in segments]).reshape((-1, 1))
+        line_feedrates = numpy.concatenate([numpy.frombuffer(segment.line_feedrate, dtype = "f4") for segment in segments]).reshape((-1, 1))
+        numpy.cumsum([len(segment.line_type) for segment in segments], out = line_offsets[1:])
+
+        # Create one 3D-array for the entire layer, copy the 2D points over and insert the right height.
+        if all(segment.point_type == 0 for segment in segments):  # Point2D
+            flat_points = numpy.concatenate([numpy.frombuffer(segment.points, dtype = "f4") for segment in segments]).reshape((-1, 2))
+            points = numpy.empty((len(flat_points), 3), numpy.float32)
+            points[:, 0] = flat_points[:, 0]
+            points[:, 1] = layer.height / 1000  # layer height value is in backend representation
+            points[:, 2] = -flat_points[:, 1]
+        else:  # Some path segments have Point3D, so handle each path segment with its own point type.
+            segment_points = [numpy.frombuffer(segment.points, dtype = "f4").reshape((-1, 2 if segment.point_type == 0 else 3)) for segment in segments]
+            points = numpy.empty((sum(len(p) for p in segment_points), 3), numpy.float32)
+            point_offset = 0
+            for segment, flat_points in zip(segments, segment_points):
+                this_points = points[point_offset:point_offset + len(flat_points)]
+                this_points[:, 0] = flat_points[:, 0]
+                this_points[:, 1] = layer.height / 1000 if segment.point_type == 0 else flat_points[:, 2]
+                this_points[:, 2] = -flat_points[:, 1]
+                point_offset += len(flat_points)
+
+        return extruders, line_offsets, line_types, points, line_widths, line_thicknesses, line_feedrates
+
+    def _getMaterialColorMap(self) -> numpy.ndarray:
+        """Find out the colors per extruder.
+
+        :return: An array with an [r, g, b, a] row for each extruder.
+        """
 
-        # Find out colors per extruder
         global_container_stack = Application.getInstance().getGlobalContainerStack()
         manager = ExtruderManager.getInstance()
         extruders = manager.getActiveExtruderStacks()
@@ -214,44 +281,42 @@ class ProcessSlicedLayersJob(Job):
             color_code = global_container_stack.material.getMetaDataEntry("color_code", default = "#e0e000")
             color = colorCodeToRGBA(color_code)
             material_color_map[0, :] = color
+        return material_color_map
 
-        # We have to scale the colors for compatibility mode
-        if OpenGLContext.isLegacyOpenGL() or bool(Application.getInstance().getPreferences().getValue("view/force_layer_view_compatibility_mode")):
-            line_type_brightness = 0.5  # for compatibility mode
-        else:
-            line_type_brightness = 1.0
-        layer_mesh = layer_data.build(material_color_map, line_type_brightness)
+    def _showLayerMesh(self, node: CuraSceneNode, layer_mesh: "LayerData") -> None:
+        """Show a (partial) layer mesh in the scene.
 
-        if self._abort_requested:
-            if self._progress_message:
-                self._progress_message.hide()
+        The first time this is called the node is added to the scene, after that only its layer data is replaced.
+        :param node: The scene node that holds the layer data.
+        :param layer_mesh: The layer data to show.
+        """
+
+        decorator = node.getDecorator(LayerDataDecorator.LayerDataDecorator)
+        if decorator is not None:
+            decorator.setLayerData(layer_mesh)
+            # Let the views know that there are more layers to show.
+            node.childrenChanged.emit(node)
             return
 
         # Add LayerDataDecorator to scene node to indicate that the node has layer data
         decorator = LayerDataDecorator.LayerDataDecorator()
         decorator.setLayerData(layer_mesh)
-        new_node.addDecorator(decorator)
-
-        new_node.setMeshData(mesh)
-        # Set build volume as parent, the build volume can move as a result of raft settings.
-        # It makes sense to set the build volume as parent: the print is actually printed on it.
-        new_node_parent = Application.getInstance().getBuildVolume()
-        new_node.setParent(new_node_parent)  # Note: After this we can no longer abort!
+        node.addDecorator(decorator)
 
         settings = Application.getInstance().getGlobalContainerStack()
         if not settings.getProperty("machine_center_is_zero", "value"):
-            new_node.setPosition(Vector(-settings.getProperty("machine_width", "value") / 2, 0.0, settings.getProperty("machine_depth", "value") / 2))
+            node.setPosition(Vector(-settings.getProperty("machine_width", "value") / 2, 0.0, settings.getProperty("machine_depth", "value") / 2))
 
-        if self._progress_message:
-            self._progress_message.setProgress(100)
-
-        if self._progress_message:
-            self._progress_message.hide()
+        # Set build volume as parent, the build volume can move as a result of raft settings.
+        # It makes sense to set the build volume as parent: the print is actually printed on it.
+        node.setParent(Application.getInstance().getBuildVolume())
 
-        # Clear the unparsed layers. This saves us a bunch of memory if the Job does not get destroyed.
-        self._layers = None
+    def _removeNode(self, node: CuraSceneNode) -> None:
+        """Remove a partially shown layer mesh from the scene again, after the job got aborted."""
 
-        Logger.log("d", "Processing layers took %s seconds", time() - start_time)
+        parent = node.getParent()
+        if parent is not None:
+            parent.removeChild(node)
 
     def _onActiveViewChanged(self):
         if self.isRunning():
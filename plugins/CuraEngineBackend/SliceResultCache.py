@@ -0,0 +1,210 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import OrderedDict
+import os
+import pickle
+from typing import Any, cast, Dict, List, Optional
+
+from UM.Job import Job
+from UM.Logger import Logger
+
+
+class SliceResult:
+    """Everything that is needed to show the result of slicing a build plate again, without slicing it."""
+
+    def __init__(self, gcode_list: List[str], layers: List[Any], print_times: Dict[str, float], material_amounts: List[float]) -> None:
+        """Creates a slice result.
+
+        :param gcode_list: The g-code chunks, before the print information tokens were replaced in them.
+        :param layers: The LayerOptimized messages, or a stand-in for them that was read from disk.
+        :param print_times: The estimated print time per feature.
+        :param material_amounts: The estimated material amount per extruder.
+        """
+
+        self.gcode_list = gcode_list
+        self.layers = layers
+        self.print_times = print_times
+        self.material_amounts = material_amounts
+
+
+class CachedPathSegment:
+    """Stand-in for a PathSegment message that can be stored on disk."""
+
+    def __init__(self, message: Any) -> None:
+        self.extruder = message.extruder
+        self.point_type = message.point_type
+        self.points = bytes(message.points)
+        self.line_type = bytes(message.line_type)
+        self.line_width = bytes(message.line_width)
+        self.line_thickness = bytes(message.line_thickness)
+        self.line_feedrate = bytes(message.line_feedrate)
+
+
+class CachedLayer:
+    """Stand-in for a LayerOptimized message that can be stored on disk.
+
+    It has the part of the message interface that ProcessSlicedLayersJob uses.
+    """
+
+    def __init__(self, message: Any) -> None:
+        self.id = message.id
+        self.height = message.height
+        self.thickness = message.thickness
+        self._path_segments = [CachedPathSegment(message.getRepeatedMessage("path_segment", index)) for index in range(message.repeatedMessageCount("path_segment"))]
+
+    def repeatedMessageCount(self, field_name: str) -> int:
+        return len(self._path_segments) if field_name == "path_segment" else 0
+
+    def getRepeatedMessage(self, field_name: str, index: int) -> CachedPathSegment:
+        if field_name != "path_segment":
+            raise KeyError(field_name)
+        return self._path_segments[index]
+
+
+class SliceResultCache:
+    """A least-recently-used cache of slice results, keyed by the fingerprint of the slice message.
+
+    The results are kept in memory, and optionally also in a directory on disk so that they survive a restart.
+    """
+
+    file_extension = ".slice"
+
+    def __init__(self, max_size: int, storage_path: Optional[str] = None) -> None:
+        """Creates a slice result cache.
+
+        :param max_size: The maximum number of results to keep in memory, and on disk. 0 disables the cache.
+        :param storage_path: Directory to keep the results in on disk, or None to only keep them in memory.
+        """
+
+        self._max_size = max_size
+        self._storage_path = storage_path
+        self._results = OrderedDict()  # type: OrderedDict[str, SliceResult]
+
+    def getMaxSize(self) -> int:
+        return self._max_size
+
+    def setMaxSize(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._evict()
+
+    def getStoragePath(self) -> Optional[str]:
+        return self._storage_path
+
+    def setStoragePath(self, storage_path: Optional[str]) -> None:
+        self._storage_path = storage_path
+        self._evict()
+
+    def get(self, fingerprint: str) -> Optional[SliceResult]:
+        """Get the result for a slice message fingerprint.
+
+        :return: The cached result, or None if there is no result for this fingerprint.
+        """
+
+        if self._max_size <= 0:
+            return None
+        result = self._results.get(fingerprint)
+        if result is not None:
+            self._results.move_to_end(fingerprint)
+            return result
+
+        if self._storage_path is None:
+            return None
+        file_path = self._getFilePath(fingerprint)
+        if not os.path.isfile(file_path):
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(file_path)  # Mark as recently used.
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            Logger.logException("w", "Unable to read cached slice result %s", file_path)
+            return None
+        self._results[fingerprint] = result
+        self._evict()
+        return result
+
+    def put(self, fingerprint: str, result: SliceResult) -> None:
+        """Store the result of slicing a slice message with the given fingerprint."""
+
+        if self._max_size <= 0:
+            return
+        self._results[fingerprint] = result
+        self._results.move_to_end(fingerprint)
+        self._evictFromMemory()
+
+        if self._storage_path is not None:
+            # The new file only counts for the maximum size once it's written.
+            job = WriteSliceResultJob(self._getFilePath(fingerprint), result)
+            job.finished.connect(self._onResultWritten)
+            job.start()
+
+    def clear(self) -> None:
+        """Remove all results, from memory as well as from disk."""
+
+        self._results.clear()
+        for file_path in self._getStoredFiles():
+            try:
+                os.remove(file_path)
+            except OSError:
+                Logger.log("w", "Unable to remove cached slice result %s", file_path)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self._results
+
+    def _getFilePath(self, fingerprint: str) -> str:
+        return os.path.join(cast(str, self._storage_path), fingerprint + self.file_extension)
+
+    def _getStoredFiles(self) -> List[str]:
+        """Get the files with results on disk, least recently used first."""
+
+        if self._storage_path is None or not os.path.isdir(self._storage_path):
+            return []
+        file_paths = [os.path.join(self._storage_path, file_name) for file_name in os.listdir(self._storage_path) if file_name.endswith(self.file_extension)]
+        return sorted(file_paths, key = os.path.getmtime)
+
+    def _onResultWritten(self, job: "WriteSliceResultJob") -> None:
+        self._pruneStorage()
+
+    def _evict(self) -> None:
+        """Remove the least recently used results until there are no more results than the maximum size."""
+
+        self._evictFromMemory()
+        self._pruneStorage()
+
+    def _evictFromMemory(self) -> None:
+        while len(self._results) > max(self._max_size, 0):
+            self._results.popitem(last = False)
+
+    def _pruneStorage(self) -> None:
+        file_paths = self._getStoredFiles()
+        for file_path in file_paths[:max(len(file_paths) - max(self._max_size, 0), 0)]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                Logger.log("w", "Unable to remove cached slice result %s", file_path)
+
+
+class WriteSliceResultJob(Job):
+    """Writes a slice result to disk, so that the UI doesn't wait for it."""
+
+    def __init__(self, file_path: str, result: SliceResult) -> None:
+        super().__init__()
+        self._file_path = file_path
+        self._result = result
+
+    def run(self) -> None:
+        # Messages of the engine can't be stored, so store a copy of their data instead.
+        layers = [layer if isinstance(layer, CachedLayer) else CachedLayer(layer) for layer in self._result.layers]
+        stored_result = SliceResult(list(self._result.gcode_list), layers, dict(self._result.print_times), list(self._result.material_amounts))
+        temp_file_path = self._file_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._file_path), exist_ok = True)
+            with open(temp_file_path, "wb") as f:
+                pickle.dump(stored_result, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_path, self._file_path)  # Only complete results can be found by the cache.
+        except OSError:
+            Logger.logException("w", "Unable to store slice result in %s", self._file_path)
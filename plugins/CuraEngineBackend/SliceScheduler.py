@@ -0,0 +1,151 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import deque
+from time import time
+from typing import Any, Deque, Dict, Optional
+
+
+class SliceScheduler:
+    """Decides how long to wait after a change before slicing again.
+
+    It measures how long slices take and how quickly changes follow each other. While changes keep coming in quick
+    succession, e.g. while scrolling through the values of a setting, it waits longer, so that the engine isn't
+    restarted for every single change. When slicing is quick and changes are rare, it slices sooner.
+    """
+
+    def __init__(self, base_delay: int = 500, minimum_delay: int = 250, maximum_delay: int = 2000, change_window: float = 5.0, burst_factor: float = 2.0, merge_interval: float = 0.05, history_size: int = 10) -> None:
+        """Creates a slice scheduler.
+
+        :param base_delay: The time to wait after a change in ms, when nothing is known about the slices and changes.
+        :param minimum_delay: The shortest time to wait after a change in ms.
+        :param maximum_delay: The longest time to wait after a change in ms.
+        :param change_window: How many seconds changes are remembered, to measure how quickly they follow each other.
+        :param burst_factor: How many times the average time between recent changes to wait for the next change.
+        :param merge_interval: Changes within this many seconds after a change are counted as part of that change. A
+            single edit of the user changes many settings at once, which would otherwise look like a quick burst.
+        :param history_size: How many slice durations are remembered.
+        """
+
+        self._base_delay = base_delay
+        self._minimum_delay = minimum_delay
+        self._maximum_delay = maximum_delay
+        self._change_window = change_window
+        self._burst_factor = burst_factor
+        self._merge_interval = merge_interval
+
+        self._change_times = deque()  # type: Deque[float]
+        self._slice_durations = deque(maxlen = history_size)  # type: Deque[float]
+        self._slice_start_time = None  # type: Optional[float]
+
+        self._change_count = 0
+        self._merged_change_count = 0
+        self._ignored_change_count = 0
+        self._slice_count = 0
+        self._interrupted_slice_count = 0
+
+    def getPolicy(self) -> Dict[str, float]:
+        """Get the parameters that the delay is determined with. See the constructor for their meaning."""
+
+        return {
+            "base_delay": self._base_delay,
+            "minimum_delay": self._minimum_delay,
+            "maximum_delay": self._maximum_delay,
+            "change_window": self._change_window,
+            "burst_factor": self._burst_factor,
+            "merge_interval": self._merge_interval
+        }
+
+    def setPolicy(self, **policy: float) -> None:
+        """Change some of the parameters that the delay is determined with.
+
+        :param policy: New values for the parameters, with the names that getPolicy() uses.
+        :raise KeyError: If one of the parameters doesn't exist.
+        """
+
+        for name, value in policy.items():
+            if name not in self.getPolicy():
+                raise KeyError("Unknown slice scheduling parameter: {name}".format(name = name))
+            setattr(self, "_" + name, value)
+
+    def registerChange(self, now: Optional[float] = None) -> None:
+        """Tell the scheduler that something changed that requires slicing again."""
+
+        now = time() if now is None else now
+        if self._change_times and 0 <= now - self._change_times[-1] < self._merge_interval:
+            self._merged_change_count += 1  # Part of the same edit as the previous change.
+            return
+        self._change_count += 1
+        self._change_times.append(now)
+        while self._change_times and self._change_times[0] < now - self._change_window:
+            self._change_times.popleft()
+
+    def registerIgnoredChange(self) -> None:
+        """Tell the scheduler that a change came in that doesn't influence the slice result."""
+
+        self._ignored_change_count += 1
+
+    def registerSliceStarted(self, now: Optional[float] = None) -> None:
+        self._slice_start_time = time() if now is None else now
+
+    def registerSliceFinished(self, now: Optional[float] = None) -> None:
+        if self._slice_start_time is None:
+            return
+        now = time() if now is None else now
+        self._slice_durations.append(now - self._slice_start_time)
+        self._slice_start_time = None
+        self._slice_count += 1
+
+    def registerSliceInterrupted(self) -> None:
+        """Tell the scheduler that a slice was stopped before it was finished, because something changed."""
+
+        self._slice_start_time = None
+        self._interrupted_slice_count += 1
+
+    def getAverageSliceDuration(self) -> Optional[float]:
+        """Get the average duration of the recent slices in seconds, or None if nothing was sliced yet."""
+
+        if not self._slice_durations:
+            return None
+        return sum(self._slice_durations) / len(self._slice_durations)
+
+    def getAverageChangeInterval(self, now: Optional[float] = None) -> Optional[float]:
+        """Get the average time between the recent changes in seconds, or None if there were not enough recent changes."""
+
+        now = time() if now is None else now
+        recent_change_times = [change_time for change_time in self._change_times if change_time >= now - self._change_window]
+        if len(recent_change_times) < 2:
+            return None
+        return (recent_change_times[-1] - recent_change_times[0]) / (len(recent_change_times) - 1)
+
+    def getDelay(self, now: Optional[float] = None) -> int:
+        """Get the time to wait in ms after the last change, before slicing."""
+
+        delay = float(self._base_delay)
+
+        # When slices are quick, there is little reason to wait long.
+        average_duration = self.getAverageSliceDuration()
+        if average_duration is not None:
+            delay = min(delay, average_duration * 1000)
+
+        # While the changes follow each other quickly, wait until they stop.
+        average_interval = self.getAverageChangeInterval(now)
+        if average_interval is not None and average_interval * 1000 < self._maximum_delay:
+            delay = max(delay, average_interval * 1000 * self._burst_factor)
+
+        return int(round(min(max(delay, self._minimum_delay), self._maximum_delay)))
+
+    def getStatistics(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Get the statistics that the delay is based on, and how often the scheduler could avoid slicing."""
+
+        return {
+            "change_count": self._change_count,
+            "merged_change_count": self._merged_change_count,
+            "ignored_change_count": self._ignored_change_count,
+            "slice_count": self._slice_count,
+            "interrupted_slice_count": self._interrupted_slice_count,
+            "average_slice_duration": self.getAverageSliceDuration(),
+            "last_slice_duration": self._slice_durations[-1] if self._slice_durations else None,
+            "average_change_interval": self.getAverageChangeInterval(now),
+            "delay": self.getDelay(now)
+        }
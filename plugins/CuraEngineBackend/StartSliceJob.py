@@ -1,37 +1,38 @@
 # Copyright (c) 2020 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+import hashlib
 import numpy
 from string import Formatter
 from enum import IntEnum
 import time
-from typing import Any, cast, Dict, List, Optional, Set
+from typing import Any, cast, Dict, List, Mapping, Optional, Set
 import re
 import Arcus #For typing.
-from PyQt5.QtCore import QCoreApplication
 
 from UM.Job import Job
 from UM.Logger import Logger
 from UM.Scene.SceneNode import SceneNode
 from UM.Settings.ContainerStack import ContainerStack #For typing.
-from UM.Settings.InstanceContainer import InstanceContainer
 from UM.Settings.Interfaces import ContainerInterface
-from UM.Settings.SettingDefinition import SettingDefinition
 from UM.Settings.SettingRelation import SettingRelation #For typing.
 
 from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Scene.Scene import Scene #For typing.
-from UM.Settings.Validator import ValidatorState
 from UM.Settings.SettingRelation import RelationType
 
 from cura.CuraApplication import CuraApplication
 from cura.Scene.CuraSceneNode import CuraSceneNode
 from cura.OneAtATimeIterator import OneAtATimeIterator
-from cura.Settings.ExtruderManager import ExtruderManager
+from cura.Settings.GlobalStack import GlobalStack #For typing.
 
 
 NON_PRINTING_MESH_SETTINGS = ["anti_overhang_mesh", "infill_mesh", "cutting_mesh"]
 
+# Extra replacement tokens that change all the time. They are left out of the fingerprint of the slice message, since
+# they only influence the result if they are used in the start/end g-code, in which case that g-code changes too.
+VOLATILE_REPLACEMENT_TOKENS = ["time", "date", "day"]
+
 
 class StartJobResult(IntEnum):
     Finished = 1
@@ -97,47 +98,46 @@ class StartSliceJob(Job):
         self._slice_message = slice_message #type: Arcus.PythonMessage
         self._is_cancelled = False #type: bool
         self._build_plate_number = None #type: Optional[int]
+        self._fingerprint = hashlib.sha1() # Hash of everything that is put in the slice message.
 
         self._all_extruders_settings = None #type: Optional[Dict[str, Any]] # cache for all setting values from all stacks (global & extruder) for the current machine
 
     def getSliceMessage(self) -> Arcus.PythonMessage:
         return self._slice_message
 
-    def setBuildPlate(self, build_plate_number: int) -> None:
-        self._build_plate_number = build_plate_number
+    def getSliceFingerprint(self) -> str:
+        """Get a fingerprint of the slice message.
 
-    def _checkStackForErrors(self, stack: ContainerStack) -> bool:
-        """Check if a stack has any errors."""
+        Slice messages with the same fingerprint give the same slice result, so this can be used to find the result
+        of an earlier slice.
+        """
 
-        """returns true if it has errors, false otherwise."""
+        return self._fingerprint.hexdigest()
 
-        top_of_stack = cast(InstanceContainer, stack.getTop())  # Cache for efficiency.
-        changed_setting_keys = top_of_stack.getAllKeys()
+    def _updateFingerprint(self, *parts: Any) -> None:
+        """Add data that is put in the slice message to its fingerprint."""
 
-        # Add all relations to changed settings as well.
-        for key in top_of_stack.getAllKeys():
-            instance = top_of_stack.getInstance(key)
-            if instance is None:
-                continue
-            self._addRelations(changed_setting_keys, instance.definition.relations)
-            Job.yieldThread()
+        for part in parts:
+            if isinstance(part, numpy.ndarray):
+                self._fingerprint.update(part.tobytes())
+            elif isinstance(part, bytes):
+                self._fingerprint.update(part)
+            else:
+                self._fingerprint.update(str(part).encode("utf-8"))
+            self._fingerprint.update(b"\0")  # Separate the parts, so that different parts can't give the same data.
 
-        for changed_setting_key in changed_setting_keys:
-            validation_state = stack.getProperty(changed_setting_key, "validationState")
-
-            if validation_state is None:
-                definition = cast(SettingDefinition, stack.getSettingDefinition(changed_setting_key))
-                validator_type = SettingDefinition.getValidatorForType(definition.type)
-                if validator_type:
-                    validator = validator_type(changed_setting_key)
-                    validation_state = validator(stack)
-            if validation_state in (
-            ValidatorState.Exception, ValidatorState.MaximumError, ValidatorState.MinimumError, ValidatorState.Invalid):
-                Logger.log("w", "Setting %s is not valid, but %s. Aborting slicing.", changed_setting_key, validation_state)
-                return True
-            Job.yieldThread()
+    def setBuildPlate(self, build_plate_number: int) -> None:
+        self._build_plate_number = build_plate_number
+
+    def _checkStackForErrors(self, stack: ContainerStack) -> bool:
+        """Check if a stack has any errors.
+
+        :return: True if it has errors, False otherwise.
+        """
 
-        return False
+        if stack is None:
+            return False
+        return CuraApplication.getInstance().getMachineErrorChecker().stackHasErrors(stack)
 
     def run(self) -> None:
         """Runs the job that initiates the slicing."""
@@ -161,8 +161,7 @@ class StartSliceJob(Job):
             return
 
         # Wait for error checker to be done.
-        while CuraApplication.getInstance().getMachineErrorChecker().needToWaitForResult:
-            time.sleep(0.1)
+        CuraApplication.getInstance().getMachineErrorChecker().waitForResult()
 
         if CuraApplication.getInstance().getMachineErrorChecker().hasError:
             self.setResult(StartJobResult.SettingError)
@@ -284,6 +283,9 @@ class StartSliceJob(Job):
             self.setResult(StartJobResult.NothingToSlice)
             return
 
+        # A different engine could give a different result for the same message.
+        self._updateFingerprint(CuraApplication.getInstance().getVersion(), CuraApplication.getInstance().getPreferences().getValue("backend/location"))
+
         self._buildGlobalSettingsMessage(stack)
         self._buildGlobalInheritsStackMessage(stack)
 
@@ -293,6 +295,7 @@ class StartSliceJob(Job):
 
         for group in filtered_object_groups:
             group_message = self._slice_message.addRepeatedMessage("object_lists")
+            self._updateFingerprint("object_lists")
             parent = group[0].getParent()
             if parent is not None and parent.callDecoration("isGroup"):
                 self._handlePerObjectSettings(cast(CuraSceneNode, parent), group_message)
@@ -323,6 +326,7 @@ class StartSliceJob(Job):
                     flat_verts = numpy.array(verts)
 
                 obj.vertices = flat_verts
+                self._updateFingerprint("objects", object.getName(), flat_verts)
 
                 self._handlePerObjectSettings(cast(CuraSceneNode, object), obj)
 
@@ -340,19 +344,15 @@ class StartSliceJob(Job):
     def setIsCancelled(self, value: bool):
         self._is_cancelled = value
 
-    def _buildReplacementTokens(self, stack: ContainerStack) -> Dict[str, Any]:
+    def _buildReplacementTokens(self, settings: Mapping[str, Any]) -> Dict[str, Any]:
         """Creates a dictionary of tokens to replace in g-code pieces.
 
         This indicates what should be replaced in the start and end g-codes.
-        :param stack: The stack to get the settings from to replace the tokens with.
+        :param settings: A snapshot of the settings of the stack to replace the tokens with.
         :return: A dictionary of replacement tokens to the values they should be replaced with.
         """
 
-        result = {}
-        for key in stack.getAllKeys():
-            result[key] = stack.getProperty(key, "value")
-            Job.yieldThread()
-
+        result = dict(settings)
         result["print_bed_temperature"] = result["material_bed_temperature"] # Renamed settings.
         result["print_temperature"] = result["material_print_temperature"]
         result["travel_speed"] = result["speed_travel"]
@@ -364,17 +364,12 @@ class StartSliceJob(Job):
         return result
 
     def _cacheAllExtruderSettings(self):
-        global_stack = cast(ContainerStack, CuraApplication.getInstance().getGlobalContainerStack())
+        global_stack = cast(GlobalStack, CuraApplication.getInstance().getGlobalContainerStack())
 
         # NB: keys must be strings for the string formatter
-        self._all_extruders_settings = {
-            "-1": self._buildReplacementTokens(global_stack)
-        }
-        QCoreApplication.processEvents()  # Ensure that the GUI does not freeze.
-        for extruder_stack in ExtruderManager.getInstance().getActiveExtruderStacks():
-            extruder_nr = extruder_stack.getProperty("extruder_nr", "value")
-            self._all_extruders_settings[str(extruder_nr)] = self._buildReplacementTokens(extruder_stack)
-            QCoreApplication.processEvents()  # Ensure that the GUI does not freeze.
+        self._all_extruders_settings = {}
+        for stack_nr, settings in global_stack.getSettingsSnapshots().items():
+            self._all_extruders_settings[stack_nr] = self._buildReplacementTokens(settings)
 
     def _expandGcodeTokens(self, value: str, default_extruder_nr: int = -1) -> str:
         """Replace setting tokens in a piece of g-code.
@@ -402,6 +397,7 @@ class StartSliceJob(Job):
 
         message = self._slice_message.addRepeatedMessage("extruders")
         message.id = int(stack.getMetaDataEntry("position"))
+        self._updateFingerprint("extruders", stack.getMetaDataEntry("position"))
         if not self._all_extruders_settings:
             self._cacheAllExtruderSettings()
 
@@ -431,6 +427,8 @@ class StartSliceJob(Job):
             setting = message.getMessage("settings").addRepeatedMessage("settings")
             setting.name = key
             setting.value = str(value).encode("utf-8")
+            if key not in VOLATILE_REPLACEMENT_TOKENS:
+                self._updateFingerprint(key, value)
             Job.yieldThread()
 
     def _buildGlobalSettingsMessage(self, stack: ContainerStack) -> None:
@@ -470,6 +468,8 @@ class StartSliceJob(Job):
             setting_message = self._slice_message.getMessage("global_settings").addRepeatedMessage("settings")
             setting_message.name = key
             setting_message.value = str(value).encode("utf-8")
+            if key not in VOLATILE_REPLACEMENT_TOKENS:
+                self._updateFingerprint(key, value)
             Job.yieldThread()
 
     def _buildGlobalInheritsStackMessage(self, stack: ContainerStack) -> None:
@@ -488,6 +488,7 @@ class StartSliceJob(Job):
                 setting_extruder = self._slice_message.addRepeatedMessage("limit_to_extruder")
                 setting_extruder.name = key
                 setting_extruder.extruder = extruder_position
+                self._updateFingerprint("limit_to_extruder", key, extruder_position)
             Job.yieldThread()
 
     def _handlePerObjectSettings(self, node: CuraSceneNode, message: Arcus.PythonMessage):
@@ -517,6 +518,7 @@ class StartSliceJob(Job):
         changed_setting_keys.add("extruder_nr")
 
         # Get values for all changed settings
+        setting_values = {}  # type: Dict[str, str]
         for key in changed_setting_keys:
             setting = message.addRepeatedMessage("settings")
             setting.name = key
@@ -528,10 +530,15 @@ class StartSliceJob(Job):
             else:
                 limited_stack = stack
 
-            setting.value = str(limited_stack.getProperty(key, "value")).encode("utf-8")
+            setting_values[key] = str(limited_stack.getProperty(key, "value"))
+            setting.value = setting_values[key].encode("utf-8")
 
             Job.yieldThread()
 
+        # The order of a set differs between runs, so sort the settings to get the same fingerprint every time.
+        for key in sorted(setting_values):
+            self._updateFingerprint(key, setting_values[key])
+
     def _addRelations(self, relations_set: Set[str], relations: List[SettingRelation]):
         """Recursive function to put all settings that require each other for value changes in a list
 
@@ -0,0 +1,42 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from unittest.mock import MagicMock, patch
+
+from ..EnginePool import EnginePool, EngineWorker
+
+
+def createPool(main_port):
+    return EnginePool("Cura.proto", 49774, MagicMock(), MagicMock(), MagicMock(), lambda: main_port)
+
+
+@patch.object(EngineWorker, "start")
+def test_consecutivePorts(start):
+    pool = createPool(main_port = 49674)
+    pool.setSize(3)
+
+    assert [worker.getPort() for worker in pool.getWorkers()] == [49774, 49775, 49776]
+
+
+@patch.object(EngineWorker, "start")
+def test_skipPortOfMainEngine(start):
+    pool = createPool(main_port = 49775)  # The main engine moved to this port because its own port was taken.
+    pool.setSize(3)
+
+    assert [worker.getPort() for worker in pool.getWorkers()] == [49774, 49776, 49777]
+
+
+@patch.object(EngineWorker, "start")
+@patch.object(EngineWorker, "restart")
+def test_bindFailureSkipsReservedPorts(restart, start):
+    pool = createPool(main_port = 49776)
+    pool.setSize(2)
+    error = MagicMock()
+    error.getErrorCode.return_value = "bind failed"
+
+    with patch("Arcus.ErrorCode") as error_code:
+        error_code.BindFailedError = "bind failed"
+        pool.getWorkers()[0]._onSocketError(error)
+
+    # Port 49775 is taken by the second engine and 49776 by the main engine.
+    assert pool.getWorkers()[0].getPort() == 49777
@@ -0,0 +1,25 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from ..ProcessGCodeJob import GCodeTokenLocations
+
+
+def test_tokenLocations():
+    gcode_list = []
+    token_locations = GCodeTokenLocations(gcode_list)
+    token_locations.append(";LAYER:0\nG1 X10 Y10\n")
+    token_locations.append(";END\n;PRINT.TIME:{print_time}\n")
+    token_locations.append("M104 S{material_print_temperature}\n")  # Not a print information token.
+    token_locations.insertPrefix(";FLAVOR:Marlin\n;Filament used: {filament_amount}\n")
+
+    assert gcode_list[0].startswith(";FLAVOR")
+    assert len(gcode_list) == 4
+    assert token_locations.getIndices() == [0, 2]
+
+
+def test_isTracking():
+    gcode_list = []
+    token_locations = GCodeTokenLocations(gcode_list)
+
+    assert token_locations.isTracking(gcode_list)
+    assert not token_locations.isTracking([])  # Another list, even if it has the same contents.
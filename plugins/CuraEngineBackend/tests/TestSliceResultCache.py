@@ -0,0 +1,102 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import os
+from unittest.mock import MagicMock, patch
+
+from ..SliceResultCache import CachedLayer, SliceResult, SliceResultCache, WriteSliceResultJob
+
+
+def createLayerMessage(layer_id):
+    path_segment = MagicMock(extruder = 0, point_type = 0, points = b"\x00" * 16, line_type = b"\x01", line_width = b"\x00" * 4, line_thickness = b"\x00" * 4, line_feedrate = b"\x00" * 4)
+    layer = MagicMock(id = layer_id, height = 200, thickness = 100)
+    layer.repeatedMessageCount = MagicMock(return_value = 1)
+    layer.getRepeatedMessage = MagicMock(return_value = path_segment)
+    return layer
+
+
+def createResult(gcode = ";FLAVOR:Marlin\n"):
+    return SliceResult([gcode], [createLayerMessage(0)], {"infill": 12.0}, [1.5])
+
+
+def test_getAndPut():
+    cache = SliceResultCache(2)
+    result = createResult()
+    assert cache.get("a") is None
+
+    cache.put("a", result)
+    assert cache.get("a") is result
+
+
+def test_leastRecentlyUsedIsEvicted():
+    cache = SliceResultCache(2)
+    cache.put("a", createResult())
+    cache.put("b", createResult())
+    cache.get("a")  # Now "b" is the least recently used.
+    cache.put("c", createResult())
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_disabled():
+    cache = SliceResultCache(0)
+    cache.put("a", createResult())
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_setMaxSize():
+    cache = SliceResultCache(3)
+    for fingerprint in "abc":
+        cache.put(fingerprint, createResult())
+
+    cache.setMaxSize(1)
+    assert len(cache) == 1
+    assert "c" in cache
+
+
+def test_cachedLayer():
+    layer = CachedLayer(createLayerMessage(3))
+    assert layer.id == 3
+    assert layer.repeatedMessageCount("path_segment") == 1
+    assert layer.getRepeatedMessage("path_segment", 0).points == b"\x00" * 16
+
+
+def writeSynchronously(job):
+    job.run()
+    job.finished.emit(job)
+
+
+@patch.object(WriteSliceResultJob, "start", writeSynchronously)
+def test_storedOnDisk(tmp_path):
+    cache = SliceResultCache(2, str(tmp_path))
+    cache.put("a", createResult(";stored\n"))
+
+    # A new cache, e.g. after a restart, finds the result on disk.
+    new_cache = SliceResultCache(2, str(tmp_path))
+    result = new_cache.get("a")
+    assert result is not None
+    assert result.gcode_list == [";stored\n"]
+    assert result.print_times == {"infill": 12.0}
+    assert result.material_amounts == [1.5]
+    assert result.layers[0].height == 200
+
+    new_cache.clear()
+    assert SliceResultCache(2, str(tmp_path)).get("a") is None
+
+
+def test_storageIsPrunedAfterWriting(tmp_path):
+    written = []
+    def writeInOrder(job):
+        writeSynchronously(job)
+        written.append(job)
+        os.utime(job._file_path, (len(written), len(written)))  # The order doesn't depend on the precision of the file system.
+
+    cache = SliceResultCache(2, str(tmp_path))
+    with patch.object(WriteSliceResultJob, "start", writeInOrder):
+        for fingerprint in "abc":
+            cache.put(fingerprint, createResult())
+
+    assert sorted(os.listdir(str(tmp_path))) == ["b.slice", "c.slice"]
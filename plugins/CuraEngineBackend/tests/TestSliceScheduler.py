@@ -0,0 +1,85 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import pytest
+
+from ..SliceScheduler import SliceScheduler
+
+
+def test_baseDelay():
+    scheduler = SliceScheduler(base_delay = 500)
+
+    assert scheduler.getDelay(now = 0) == 500  # Nothing known yet.
+
+
+def test_quickSlicesShortenDelay():
+    scheduler = SliceScheduler(base_delay = 500, minimum_delay = 100)
+    scheduler.registerSliceStarted(now = 10)
+    scheduler.registerSliceFinished(now = 10.2)
+
+    assert scheduler.getDelay(now = 20) == 200
+    assert scheduler.getStatistics(now = 20)["slice_count"] == 1
+
+
+def test_burstOfChangesLengthensDelay():
+    scheduler = SliceScheduler(base_delay = 500, maximum_delay = 2000, burst_factor = 2.0)
+    for change_time in (10.0, 10.4, 10.8, 11.2):
+        scheduler.registerChange(now = change_time)
+
+    assert scheduler.getDelay(now = 11.2) == 800
+
+    # Once the burst is over, the delay goes back to normal.
+    assert scheduler.getDelay(now = 30) == 500
+
+
+def test_cascadedSignalsAreOneChange():
+    scheduler = SliceScheduler(base_delay = 500, minimum_delay = 100, burst_factor = 2.0)
+    scheduler.registerSliceStarted(now = 0)
+    scheduler.registerSliceFinished(now = 0.1)  # Quick slices.
+
+    # Scrubbing through the values of a setting: every step fires dozens of value changes of dependent settings.
+    now = 10.0
+    for step in range(5):
+        for signal in range(40):
+            scheduler.registerChange(now = now + signal * 0.0005)
+        now += 0.4
+
+    assert scheduler.getAverageChangeInterval(now = now) == pytest.approx(0.4)
+    assert scheduler.getDelay(now = now) == 800
+    statistics = scheduler.getStatistics(now = now)
+    assert statistics["change_count"] == 5
+    assert statistics["merged_change_count"] == 5 * 39
+
+
+def test_delayIsLimited():
+    scheduler = SliceScheduler(base_delay = 500, maximum_delay = 1000, burst_factor = 4.0)
+    scheduler.registerChange(now = 10.0)
+    scheduler.registerChange(now = 10.9)
+
+    assert scheduler.getDelay(now = 10.9) == 1000
+
+
+def test_statistics():
+    scheduler = SliceScheduler()
+    scheduler.registerChange(now = 1)
+    scheduler.registerIgnoredChange()
+    scheduler.registerSliceStarted(now = 1)
+    scheduler.registerSliceInterrupted()
+    scheduler.registerSliceFinished(now = 2)  # Was interrupted, so not counted.
+
+    statistics = scheduler.getStatistics(now = 2)
+    assert statistics["change_count"] == 1
+    assert statistics["ignored_change_count"] == 1
+    assert statistics["interrupted_slice_count"] == 1
+    assert statistics["slice_count"] == 0
+    assert statistics["average_slice_duration"] is None
+
+
+def test_setPolicy():
+    scheduler = SliceScheduler()
+    scheduler.setPolicy(base_delay = 300, minimum_delay = 300)
+
+    assert scheduler.getPolicy()["base_delay"] == 300
+    assert scheduler.getDelay(now = 0) == 300
+    with pytest.raises(KeyError):
+        scheduler.setPolicy(nonexistent = 1)
@@ -1,15 +1,17 @@
 # Copyright (c) 2018 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
-import gzip
-from io import StringIO, BufferedIOBase #To write the g-code to a temporary buffer, and for typing.
+from io import BufferedIOBase #For typing.
 from typing import cast, List
 
+from UM.Application import Application
 from UM.Logger import Logger
 from UM.Mesh.MeshWriter import MeshWriter #The class we're extending/implementing.
 from UM.PluginRegistry import PluginRegistry
 from UM.Scene.SceneNode import SceneNode #For typing.
 
+from cura.Utils.GzipStream import GzipStream, TextEncodingStream #To compress the g-code while it's being written.
+
 from UM.i18n import i18nCatalog
 catalog = i18nCatalog("cura")
 
@@ -24,6 +26,9 @@ class GCodeGzWriter(MeshWriter):
     def __init__(self) -> None:
         super().__init__(add_to_recent_files = False)
 
+        # With more than one thread, blocks of the g-code are compressed at the same time.
+        Application.getInstance().getPreferences().addPreference("gcodegzwriter/compression_threads", 1)
+
     def write(self, stream: BufferedIOBase, nodes: List[SceneNode], mode = MeshWriter.OutputMode.BinaryMode) -> bool:
         """Writes the gzipped g-code to a stream.
 
@@ -43,14 +48,18 @@ class GCodeGzWriter(MeshWriter):
             self.setInformation(catalog.i18nc("@error:not supported", "GCodeGzWriter does not support text mode."))
             return False
 
-        #Get the g-code from the g-code writer.
-        gcode_textio = StringIO() #We have to convert the g-code into bytes.
+        #Let the g-code writer write the g-code through the compressor, so that the g-code is compressed layer by layer.
+        thread_count = int(Application.getInstance().getPreferences().getValue("gcodegzwriter/compression_threads"))
+        gzip_stream = GzipStream(stream, thread_count = thread_count)
         gcode_writer = cast(MeshWriter, PluginRegistry.getInstance().getPluginObject("GCodeWriter"))
-        success = gcode_writer.write(gcode_textio, None)
+        try:
+            success = gcode_writer.write(TextEncodingStream(gzip_stream), None)
+        except:
+            gzip_stream.abort() #Don't finish the archive, so that the incomplete g-code in it can't be taken for a complete file.
+            raise
         if not success: #Writing the g-code failed. Then I can also not write the gzipped g-code.
+            gzip_stream.abort()
             self.setInformation(gcode_writer.getInformation())
             return False
-
-        result = gzip.compress(gcode_textio.getvalue().encode("utf-8"))
-        stream.write(result)
+        gzip_stream.close()
         return True
@@ -3,7 +3,7 @@
 
 import math
 import re
-from typing import Dict, List, NamedTuple, Optional, Union, Set
+from typing import Callable, Dict, List, NamedTuple, Optional, Union, Set
 
 import numpy
 
@@ -22,15 +22,22 @@ from cura.Scene.CuraSceneNode import CuraSceneNode
 from cura.Scene.GCodeListDecorator import GCodeListDecorator
 from cura.Settings.ExtruderManager import ExtruderManager
 
+from . import GCodeTokenizer
+from .GCodeTokenizer import GCodePath
+
 catalog = i18nCatalog("cura")
 
 PositionOptional = NamedTuple("Position", [("x", Optional[float]), ("y", Optional[float]), ("z", Optional[float]), ("f", Optional[float]), ("e", Optional[float])])
 Position = NamedTuple("Position", [("x", float), ("y", float), ("z", float), ("f", float), ("e", List[float])])
 
+_value_end_pattern = re.compile("[;\\s]")
+
 
 class FlavorParser:
     """This parser is intended to interpret the common firmware codes among all the different flavors"""
 
+    _move_block_size = 10000  # The maximum number of consecutive moves that are processed at once.
+
     def __init__(self) -> None:
         CuraApplication.getInstance().hideMessageSignal.connect(self._onHideMessage)
         self._cancelled = False
@@ -48,6 +55,7 @@ class FlavorParser:
         self._current_layer_thickness = 0.2  # default
         self._filament_diameter = 2.85       # default
         self._previous_extrusion_value = 0.0  # keep track of the filament retractions
+        self._gcode_handlers = {}  # type: Dict[int, Optional[Callable[[Position, PositionOptional, GCodePath], Position]]]
 
         CuraApplication.getInstance().getPreferences().addPreference("gcodereader/show_caution", True)
 
@@ -67,8 +75,7 @@ class FlavorParser:
         if n < 0:
             return None
         n += len(code)
-        pattern = re.compile("[;\\s]")
-        match = pattern.search(line, n)
+        match = _value_end_pattern.search(line, n)
         m = match.start() if match is not None else -1
         try:
             if m < 0:
@@ -95,47 +102,39 @@ class FlavorParser:
         if message == self._message:
             self._cancelled = True
 
-    def _createPolygon(self, layer_thickness: float, path: List[List[Union[float, int]]], extruder_offsets: List[float]) -> bool:
-        countvalid = 0
-        for point in path:
-            if point[5] > 0:
-                countvalid += 1
-                if countvalid >= 2:
-                    # we know what to do now, no need to count further
-                    continue
-        if countvalid < 2:
+    def _createPolygon(self, layer_thickness: float, path: Union[GCodePath, List[List[Union[float, int]]]], extruder_offsets: List[float]) -> bool:
+        if len(path) < 2:
+            return False
+        path_array = numpy.asarray(path, dtype = numpy.float64)
+        if numpy.count_nonzero(path_array[:, GCodeTokenizer.LINE_TYPE] > 0) < 2:
             return False
         try:
             self._layer_data_builder.addLayer(self._layer_number)
-            self._layer_data_builder.setLayerHeight(self._layer_number, path[0][2])
+            self._layer_data_builder.setLayerHeight(self._layer_number, float(path_array[0, GCodeTokenizer.Z]))
             self._layer_data_builder.setLayerThickness(self._layer_number, layer_thickness)
             this_layer = self._layer_data_builder.getLayer(self._layer_number)
             if not this_layer:
                 return False
         except ValueError:
             return False
-        count = len(path)
+        count = len(path_array)
         line_types = numpy.empty((count - 1, 1), numpy.int32)
         line_widths = numpy.empty((count - 1, 1), numpy.float32)
         line_thicknesses = numpy.empty((count - 1, 1), numpy.float32)
         line_feedrates = numpy.empty((count - 1, 1), numpy.float32)
-        line_widths[:, 0] = 0.35  # Just a guess
         line_thicknesses[:, 0] = layer_thickness
         points = numpy.empty((count, 3), numpy.float32)
+        points[:, 0] = path_array[:, GCodeTokenizer.X] + extruder_offsets[0]
+        points[:, 1] = path_array[:, GCodeTokenizer.Z]
+        points[:, 2] = -path_array[:, GCodeTokenizer.Y] - extruder_offsets[1]
         extrusion_values = numpy.empty((count, 1), numpy.float32)
-        i = 0
-        for point in path:
-            points[i, :] = [point[0] + extruder_offsets[0], point[2], -point[1] - extruder_offsets[1]]
-            extrusion_values[i] = point[4]
-            if i > 0:
-                line_feedrates[i - 1] = point[3]
-                line_types[i - 1] = point[5]
-                if point[5] in [LayerPolygon.MoveCombingType, LayerPolygon.MoveRetractionType]:
-                    line_widths[i - 1] = 0.1
-                    line_thicknesses[i - 1] = 0.0 # Travels are set as zero thickness lines
-                else:
-                    line_widths[i - 1] = self._calculateLineWidth(points[i], points[i-1], extrusion_values[i], extrusion_values[i-1], layer_thickness)
-            i += 1
+        extrusion_values[:, 0] = path_array[:, GCodeTokenizer.E]
+        line_feedrates[:, 0] = path_array[1:, GCodeTokenizer.F]
+        line_types[:, 0] = path_array[1:, GCodeTokenizer.LINE_TYPE]
+
+        is_travel = numpy.isin(line_types[:, 0], [LayerPolygon.MoveCombingType, LayerPolygon.MoveRetractionType])
+        line_widths[:, 0] = numpy.where(is_travel, 0.1, self._calculateLineWidths(points, extrusion_values[:, 0], layer_thickness))
+        line_thicknesses[is_travel, 0] = 0.0  # Travels are set as zero thickness lines
 
         this_poly = LayerPolygon(self._extruder_number, line_types, points, line_widths, line_thicknesses, line_feedrates)
         this_poly.buildCache()
@@ -148,30 +147,36 @@ class FlavorParser:
         self._layer_data_builder.setLayerHeight(layer_number, 0)
         self._layer_data_builder.setLayerThickness(layer_number, 0)
 
-    def _calculateLineWidth(self, current_point: Position, previous_point: Position, current_extrusion: float, previous_extrusion: float, layer_thickness: float) -> float:
+    def _calculateLineWidths(self, points: numpy.ndarray, extrusion_values: numpy.ndarray, layer_thickness: float) -> numpy.ndarray:
+        """Calculate the widths of the lines between consecutive points of a path, from the filament extruded for them.
+
+        :param points: The points of the path, as the X, Z and Y coordinates of the scene.
+        :param extrusion_values: The extrusion value at each point.
+        :param layer_thickness: The thickness of the lines.
+        :return: The width of each line.
+        """
+
         # Area of the filament
         Af = (self._filament_diameter / 2) ** 2 * numpy.pi
         # Length of the extruded filament
-        de = current_extrusion - previous_extrusion
+        de = extrusion_values[1:] - extrusion_values[:-1]
         # Volumne of the extruded filament
         dVe = de * Af
         # Length of the printed line
-        dX = numpy.sqrt((current_point[0] - previous_point[0])**2 + (current_point[2] - previous_point[2])**2)
-        # When the extruder recovers from a retraction, we get zero distance
-        if dX == 0:
-            return 0.1
-        # Area of the printed line. This area is a rectangle
-        Ae = dVe / dX
-        # This area is a rectangle with area equal to layer_thickness * layer_width
-        line_width = Ae / layer_thickness
+        dX = numpy.sqrt((points[1:, 0] - points[:-1, 0]) ** 2 + (points[1:, 2] - points[:-1, 2]) ** 2)
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            # Area of the printed line. This area is a rectangle
+            Ae = dVe / dX
+            # This area is a rectangle with area equal to layer_thickness * layer_width
+            line_widths = Ae / layer_thickness
 
         # A threshold is set to avoid weird paths in the GCode
-        if line_width > 1.2:
-            return 0.35
+        line_widths[line_widths > 1.2] = 0.35
         # Prevent showing infinitely wide lines
-        if line_width < 0.0:
-            return 0.0
-        return line_width
+        line_widths[line_widths < 0.0] = 0.0
+        # When the extruder recovers from a retraction, we get zero distance
+        line_widths[dX == 0] = 0.1
+        return line_widths
 
     def _gCode0(self, position: Position, params: PositionOptional, path: List[List[Union[float, int]]]) -> Position:
         x, y, z, f, e = position
@@ -255,8 +260,68 @@ class FlavorParser:
             params.f if params.f is not None else position.f,
             position.e)
 
+    def _canProcessMoveBlocks(self) -> bool:
+        """Whether moves can be processed a block at a time, because this flavor handles G0 and G1 like all flavors."""
+
+        return type(self).processGCode is FlavorParser.processGCode \
+            and type(self)._gCode0 is FlavorParser._gCode0 \
+            and type(self)._gCode1 is FlavorParser._gCode1
+
+    def _processMoveBlock(self, lines: List[str], position: Position, path: GCodePath) -> Position:
+        """Process a block of consecutive G0 and G1 commands at once.
+
+        This has the same result as calling processGCode() for each of the lines, but the positions, extrusion values
+        and line types are calculated for the whole block at once.
+        """
+
+        values, present = GCodeTokenizer.tokenizeMoves(lines)
+        x, y, z, f, e = position
+
+        if self._is_absolute_positioning:
+            xs = GCodeTokenizer.forwardFill(values[:, GCodeTokenizer.X], present[:, GCodeTokenizer.X], x)
+            ys = GCodeTokenizer.forwardFill(values[:, GCodeTokenizer.Y], present[:, GCodeTokenizer.Y], y)
+            zs = GCodeTokenizer.forwardFill(values[:, GCodeTokenizer.Z], present[:, GCodeTokenizer.Z], z)
+        else:
+            xs = GCodeTokenizer.accumulate(values[:, GCodeTokenizer.X], present[:, GCodeTokenizer.X], x)
+            ys = GCodeTokenizer.accumulate(values[:, GCodeTokenizer.Y], present[:, GCodeTokenizer.Y], y)
+            zs = GCodeTokenizer.accumulate(values[:, GCodeTokenizer.Z], present[:, GCodeTokenizer.Z], z)
+        fs = GCodeTokenizer.forwardFill(values[:, GCodeTokenizer.F] / 60, present[:, GCodeTokenizer.F], f)
+
+        # The extrusion value after each move, and before it.
+        has_extrusion = present[:, GCodeTokenizer.E]
+        if self._is_absolute_extrusion:
+            extrusions = GCodeTokenizer.forwardFill(values[:, GCodeTokenizer.E], has_extrusion, e[self._extruder_number])
+        else:
+            extrusions = GCodeTokenizer.accumulate(values[:, GCodeTokenizer.E], has_extrusion, e[self._extruder_number])
+        previous_extrusions = numpy.concatenate(([e[self._extruder_number]], extrusions[:-1]))
+        is_extruding = has_extrusion & (extrusions > previous_extrusions)
+
+        # Moves without extrusion after a retraction are retracted moves, until filament is extruded again.
+        extrusion_values = GCodeTokenizer.forwardFill(extrusions, is_extruding, self._previous_extrusion_value)
+        previous_extrusion_values = numpy.concatenate(([self._previous_extrusion_value], extrusion_values[:-1]))
+        line_types = numpy.where(is_extruding, self._layer_type, numpy.where(has_extrusion | (previous_extrusion_values > extrusions), LayerPolygon.MoveRetractionType, LayerPolygon.MoveCombingType))
+
+        # Only when extruding we can determine the latest known "layer height" which is the difference in height between extrusions
+        # Also, 1.5 is a heuristic for any priming or whatsoever, we skip those.
+        # Only the first of consecutive extrusions at the same height can change it.
+        extrusion_heights = zs[has_extrusion]
+        if len(extrusion_heights) > 0:
+            is_new_height = numpy.concatenate(([True], extrusion_heights[1:] != extrusion_heights[:-1]))
+            for height in extrusion_heights[is_new_height].tolist():
+                if height > self._previous_z and (height - self._previous_z < 1.5):
+                    self._current_layer_thickness = height - self._previous_z
+                    self._previous_z = height
+
+        path.extend(numpy.column_stack((xs, ys, zs, fs, extrusions + self._extrusion_length_offset[self._extruder_number], line_types)))
+        e[self._extruder_number] = float(extrusions[-1])
+        self._previous_extrusion_value = float(extrusion_values[-1])
+        return self._position(float(xs[-1]), float(ys[-1]), float(zs[-1]), float(fs[-1]), e)
+
     def processGCode(self, G: int, line: str, position: Position, path: List[List[Union[float, int]]]) -> Position:
-        func = getattr(self, "_gCode%s" % G, None)
+        try:
+            func = self._gcode_handlers[G]
+        except KeyError:
+            func = self._gcode_handlers[G] = getattr(self, "_gCode%s" % G, None)
         line = line.split(";", 1)[0]  # Remove comments (if any)
         if func is not None:
             s = line.upper().split(" ")
@@ -325,20 +390,16 @@ class FlavorParser:
         scene_node = CuraSceneNode()
 
         gcode_list = []
-        self._is_layers_in_file = False
 
         self._extruder_offsets = self._extruderOffsets()  # dict with index the extruder number. can be empty
 
         ##############################################################################################
         ##  This part is where the action starts
         ##############################################################################################
-        file_lines = 0
+        lines = stream.split("\n")
+        file_lines = len(lines)
         current_line = 0
-        for line in stream.split("\n"):
-            file_lines += 1
-            gcode_list.append(line + "\n")
-            if not self._is_layers_in_file and line[:len(self._layer_keyword)] == self._layer_keyword:
-                self._is_layers_in_file = True
+        self._is_layers_in_file = stream.startswith(self._layer_keyword) or "\n" + self._layer_keyword in stream
 
         file_step = max(math.floor(file_lines / 100), 1)
 
@@ -355,17 +416,21 @@ class FlavorParser:
         Logger.log("d", "Parsing g-code...")
 
         current_position = Position(0, 0, 0, 0, [0])
-        current_path = [] #type: List[List[float]]
+        current_path = GCodePath()
+        # Consecutive moves are collected, to process them a block at a time.
+        process_move_blocks = self._canProcessMoveBlocks()
+        move_lines = []  # type: List[str]
         min_layer_number = 0
         negative_layers = 0
         previous_layer = 0
         self._previous_extrusion_value = 0.0
 
-        for line in stream.split("\n"):
+        for line in lines:
             if self._cancelled:
                 Logger.log("d", "Parsing g-code file cancelled.")
                 return None
             current_line += 1
+            gcode_list.append(line + "\n")
 
             if current_line % file_step == 0:
                 self._message.setProgress(math.floor(current_line / file_lines * 100))
@@ -373,6 +438,18 @@ class FlavorParser:
             if len(line) == 0:
                 continue
 
+            if process_move_blocks:
+                if GCodeTokenizer.isMoveLine(line):
+                    move_lines.append(line)
+                    if len(move_lines) >= self._move_block_size:
+                        current_position = self._processMoveBlock(move_lines, current_position, current_path)
+                        move_lines = []
+                    continue
+                # Other comments don't change the state, so the moves don't need to be processed for them yet.
+                if move_lines and (not line.startswith(";") or line.startswith(self._type_keyword) or line.startswith(self._layer_keyword)):
+                    current_position = self._processMoveBlock(move_lines, current_position, current_path)
+                    move_lines = []
+
             if line.find(self._type_keyword) == 0:
                 type = line[len(self._type_keyword):].strip()
                 if type == "WALL-INNER":
@@ -452,6 +529,9 @@ class FlavorParser:
                 if M is not None:
                     self.processMCode(M, line, current_position, current_path)
 
+        if move_lines:
+            current_position = self._processMoveBlock(move_lines, current_position, current_path)
+
         # "Flush" leftovers. Last layer paths are still stored
         if len(current_path) > 1:
             if self._createPolygon(self._current_layer_thickness, current_path, self._extruder_offsets.get(self._extruder_number, [0, 0])):
@@ -24,6 +24,7 @@ if TYPE_CHECKING:
 class GCodeReader(MeshReader):
     _flavor_default = "Marlin"
     _flavor_keyword = ";FLAVOR:"
+    _max_header_size = 64 * 1024  # Number of characters to look for the flavor in, if the layers don't start earlier.
     _flavor_readers_dict = {"RepRap" : RepRapFlavorParser.RepRapFlavorParser(),
                             "Marlin" : MarlinFlavorParser.MarlinFlavorParser()}
 
@@ -58,9 +59,16 @@ class GCodeReader(MeshReader):
 
     # PreRead is used to get the correct flavor. If not, Marlin is set by default
     def preRead(self, file_name, *args, **kwargs):
+        # The flavor is in the header, so only that is read. The file is read completely when it's loaded.
+        header = []  # type: List[str]
+        header_size = 0
         with open(file_name, "r", encoding = "utf-8") as file:
-            file_data = file.read()
-        return self.preReadFromStream(file_data, args, kwargs)
+            for line in file:
+                if line.startswith(";LAYER:") or header_size >= self._max_header_size:
+                    break
+                header.append(line)
+                header_size += len(line)
+        return self.preReadFromStream("".join(header), args, kwargs)
 
     def readFromStream(self, stream: str, filename: str) -> Optional["CuraSceneNode"]:
         if self._flavor_reader is None:
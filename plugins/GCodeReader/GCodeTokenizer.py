@@ -0,0 +1,144 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import itertools
+import re
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy
+
+# The columns of the parameters of a move and of the points of a path.
+X, Y, Z, F, E = range(5)
+LINE_TYPE = 5
+
+_parameter_letters = "XYZFE"
+_letter_columns = numpy.zeros(128, dtype = numpy.intp)
+_letter_columns[[ord(letter) for letter in _parameter_letters]] = numpy.arange(len(_parameter_letters))
+
+# The line of a G0 or G1 command. It mimics FlavorParser._getInt(line, "G"), which reads the number after the first G.
+_move_pattern = re.compile(r"(?!;)[^G]*G0*[01](?=[;\s]|$)")
+_comment_pattern = re.compile(r";[^\n]*")
+# A line break, or a parameter that is separated from the previous one by a space.
+_parameter_pattern = re.compile(r"(\n)|(?<= )([XYZFE])([^ \n]+)")
+
+
+def isMoveLine(line: str) -> bool:
+    """Whether a line of g-code is a G0 or G1 command that tokenizeMoves() can read the parameters of."""
+
+    return _move_pattern.match(line) is not None
+
+
+def tokenizeMoves(lines: Sequence[str]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Read the X, Y, Z, F and E parameters of a block of move commands into columns.
+
+    The parameters are read in the same way as FlavorParser.processGCode() does: comments are removed, letters are
+    case insensitive, the first word is the command itself and parameters that are no number are ignored. The whole
+    block is tokenized at once, instead of line by line.
+
+    :param lines: The lines of the move commands, without line breaks.
+    :return: An array with a row of parameter values per line, in the columns X, Y, Z, F and E, and an array of the
+        same shape that tells which parameters were present. The feedrate is as written in the g-code, in mm/min.
+    """
+
+    values = numpy.zeros((len(lines), len(_parameter_letters)), dtype = numpy.float64)
+    present = numpy.zeros((len(lines), len(_parameter_letters)), dtype = bool)
+
+    text = _comment_pattern.sub("", "\n".join(lines)).upper()
+    tokens = _parameter_pattern.findall(text)
+    if not tokens:
+        return values, present
+    line_breaks, letters, strings = zip(*tokens)
+    is_line_break = numpy.fromiter(map(len, line_breaks), dtype = bool, count = len(tokens))
+    rows = numpy.cumsum(is_line_break)[~is_line_break]
+    if len(rows) == 0:
+        return values, present
+    columns = _letter_columns[numpy.frombuffer("".join(letters).encode("ascii"), dtype = numpy.uint8)]
+    strings = list(itertools.compress(strings, letters))  # Only the parameters have a letter.
+
+    try:
+        parsed = numpy.fromiter(map(float, strings), dtype = numpy.float64, count = len(strings))
+        valid = numpy.ones(len(strings), dtype = bool)
+    except ValueError:  # Improperly formatted g-code. Only skip the parameters that are not numbers.
+        parsed = numpy.zeros(len(strings), dtype = numpy.float64)
+        valid = numpy.zeros(len(strings), dtype = bool)
+        for index, string in enumerate(strings):
+            try:
+                parsed[index] = float(string)
+                valid[index] = True
+            except ValueError:
+                continue
+
+    # When a parameter occurs twice on a line, the last one counts.
+    values[rows[valid], columns[valid]] = parsed[valid]
+    present[rows[valid], columns[valid]] = True
+    return values, present
+
+
+def forwardFill(values: numpy.ndarray, present: numpy.ndarray, initial: float) -> numpy.ndarray:
+    """Get for each row the last value that was present up to and including that row.
+
+    :param initial: The value before the first row.
+    """
+
+    filled = numpy.concatenate(([initial], values))
+    indices = numpy.where(numpy.concatenate(([True], present)), numpy.arange(len(filled)), 0)
+    numpy.maximum.accumulate(indices, out = indices)
+    return filled[indices][1:]
+
+
+def accumulate(values: numpy.ndarray, present: numpy.ndarray, initial: float) -> numpy.ndarray:
+    """Get for each row the sum of the initial value and the present values up to and including that row.
+
+    The values are added one by one, in the same order as they would be in a loop.
+    """
+
+    return numpy.cumsum(numpy.concatenate(([initial], numpy.where(present, values, 0))))[1:]
+
+
+class GCodePath:
+    """The points of a path, stored as blocks of rows with the columns X, Y, Z, F, E and line type.
+
+    Points can be added one by one, like to a list, or a block at a time, without converting them to lists.
+    """
+
+    def __init__(self) -> None:
+        self._blocks = []  # type: List[numpy.ndarray]
+        self._points = []  # type: List[List[Union[float, int]]]
+        self._length = 0
+
+    def append(self, point: List[Union[float, int]]) -> None:
+        self._points.append(point)
+        self._length += 1
+
+    def extend(self, points: numpy.ndarray) -> None:
+        self._flushPoints()
+        self._blocks.append(points)
+        self._length += len(points)
+
+    def clear(self) -> None:
+        self._blocks = []
+        self._points = []
+        self._length = 0
+
+    def toArray(self) -> numpy.ndarray:
+        self._flushPoints()
+        if not self._blocks:
+            return numpy.empty((0, LINE_TYPE + 1), dtype = numpy.float64)
+        if len(self._blocks) > 1:
+            self._blocks = [numpy.concatenate(self._blocks)]
+        return self._blocks[0]
+
+    def __array__(self, dtype: Optional[numpy.dtype] = None, copy: Optional[bool] = None) -> numpy.ndarray:
+        array = self.toArray()
+        return array.astype(dtype) if dtype is not None else array
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> numpy.ndarray:
+        return self.toArray()[index]
+
+    def _flushPoints(self) -> None:
+        if self._points:
+            self._blocks.append(numpy.array(self._points, dtype = numpy.float64).reshape((-1, LINE_TYPE + 1)))
+            self._points = []
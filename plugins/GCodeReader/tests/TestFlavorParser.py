@@ -0,0 +1,168 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from unittest.mock import MagicMock, patch
+
+import numpy
+import pytest
+
+from .. import FlavorParser
+from ..RepRapFlavorParser import RepRapFlavorParser
+
+
+@pytest.fixture
+def parser():
+    with patch("cura.CuraApplication.CuraApplication.getInstance", MagicMock()):
+        return FlavorParser.FlavorParser()
+
+
+def calculateLineWidth(filament_diameter, current_point, previous_point, current_extrusion, previous_extrusion, layer_thickness):
+    """The width of one line, as the parser calculated it for every point on its own before."""
+
+    # Area of the filament
+    Af = (filament_diameter / 2) ** 2 * numpy.pi
+    # Length of the extruded filament
+    de = current_extrusion - previous_extrusion
+    # Volumne of the extruded filament
+    dVe = de * Af
+    # Length of the printed line
+    dX = numpy.sqrt((current_point[0] - previous_point[0])**2 + (current_point[2] - previous_point[2])**2)
+    # When the extruder recovers from a retraction, we get zero distance
+    if dX == 0:
+        return 0.1
+    # Area of the printed line. This area is a rectangle
+    Ae = dVe / dX
+    # This area is a rectangle with area equal to layer_thickness * layer_width
+    line_width = Ae / layer_thickness
+
+    # A threshold is set to avoid weird paths in the GCode
+    if line_width > 1.2:
+        return 0.35
+    # Prevent showing infinitely wide lines
+    if line_width < 0.0:
+        return 0.0
+    return line_width
+
+
+def test_calculateLineWidths(parser):
+    # The points are the X, Z and Y coordinates of the scene, like the parser makes them.
+    points = numpy.array([
+        [0, 0.2, 0],
+        [10, 0.2, 0],     # A normal line.
+        [10, 0.2, -5],    # Far too much filament for the length: 0.35.
+        [10, 0.2, -10],   # Retracted: a negative width, so 0.
+        [10, 0.2, -10],   # Unretracted without moving: 0.1.
+        [10, 0.2, -10],   # Not moving at all: 0.1 as well.
+        [13, 0.5, -14],   # A normal line. Z doesn't count for the length.
+        [13.2, 0.5, -14]  # A short line, just within the threshold.
+    ], dtype = numpy.float32)
+    extrusions = numpy.array([0, 0.1254, 1.1254, 0.6254, 1.1254, 1.1254, 1.1754, 1.1828], dtype = numpy.float32)
+    parser._filament_diameter = 2.85
+
+    widths = parser._calculateLineWidths(points, extrusions, 0.2)
+
+    expected = [calculateLineWidth(2.85, points[i], points[i - 1], extrusions[i], extrusions[i - 1], 0.2) for i in range(1, len(points))]
+    assert widths == pytest.approx(expected, rel = 1e-4)
+    assert widths[[1, 2, 3, 4]].tolist() == pytest.approx([0.35, 0.0, 0.1, 0.1])
+    assert 0.1 < widths[0] < 1.2 and 0.1 < widths[5] < 1.2 and 0.1 < widths[6] < 1.2
+
+
+# Retractions, G92 offsets, relative positioning and extrusion, and changes in Z, with comments between the moves.
+gcode = """;FLAVOR:Marlin
+;LAYER_COUNT:2
+;LAYER:0
+M82
+G92 E0
+G1 F1500 E-6.5
+;TYPE:SKIRT
+G0 F3600 X10 Y10 Z0.3
+G1 F1500 E0
+G1 F1200 X20 Y10 E0.5
+G1 X20 Y20 E1.0 ;With a comment
+G1 E-5.5
+G0 X30 Y30
+;A comment that changes nothing
+G0 X31 Y31
+G1 E1.0
+G1 X40 Y30 E1.5
+G92 E0
+G1 X50 Y30 E0.5
+;TYPE:WALL-OUTER
+M83
+G1 X50 Y40 E0.5
+G1 X40 Y40 E0.5
+G1 E-2
+G0 X10 Y10
+G1 E2
+G1 X10 Y20 E0.5
+M82
+G92 E0
+;LAYER:1
+G0 Z0.5
+G1 X20 Y20 E0.5
+G1 X20 Y10 Z0.7 E1.0
+G91
+G1 X5 Y5 E0.2
+G1 X-5 E0.2
+G1 Z0.2
+G90
+M82
+G92 E0
+G1 X30 Y30 E2.0
+G1 X30 Y35 E1.5
+"""
+
+
+def parseGCode(parser_type, process_move_blocks):
+    """Parse the g-code, with or without processing consecutive moves a block at a time.
+
+    :return: The paths that the polygons were made from, and the layers of the layer data.
+    """
+
+    application = MagicMock()
+    extruder = MagicMock()
+    extruder.getProperty = MagicMock(return_value = 2.85)
+    application.getGlobalContainerStack.return_value.extruderList = [extruder]
+    with patch("cura.CuraApplication.CuraApplication.getInstance", MagicMock(return_value = application)):
+        parser = parser_type()
+    parser._move_block_size = 3  # Also process moves that follow each other in more than one block.
+
+    paths = []
+    original_create_polygon = parser._createPolygon
+    def createPolygon(layer_thickness, path, extruder_offsets):
+        paths.append((parser._layer_number, layer_thickness, numpy.array(path, dtype = numpy.float64)))
+        return original_create_polygon(layer_thickness, path, extruder_offsets)
+
+    with patch("cura.CuraApplication.CuraApplication.getInstance", MagicMock(return_value = application)), \
+            patch("cura.LayerPolygon.LayerPolygon.getColorMap", MagicMock(return_value = numpy.zeros((11, 4)))), \
+            patch.multiple(FlavorParser, Message = MagicMock(), CuraSceneNode = MagicMock(), LayerDataDecorator = MagicMock(), GCodeListDecorator = MagicMock()), \
+            patch.object(parser, "_canProcessMoveBlocks", MagicMock(return_value = process_move_blocks)), \
+            patch.object(parser, "_extruderOffsets", MagicMock(return_value = {})), \
+            patch.object(parser, "_createPolygon", createPolygon):
+        parser.processGCodeStream(gcode, "test.gcode")
+    return paths, parser._layer_data_builder.getLayers()
+
+
+@pytest.mark.parametrize("parser_type", [FlavorParser.FlavorParser, RepRapFlavorParser])
+def test_moveBlocksLikeSingleMoves(parser_type):
+    block_paths, block_layers = parseGCode(parser_type, process_move_blocks = True)
+    line_paths, line_layers = parseGCode(parser_type, process_move_blocks = False)
+
+    assert len(block_paths) == len(line_paths)
+    for (block_layer_number, block_thickness, block_path), (line_layer_number, line_thickness, line_path) in zip(block_paths, line_paths):
+        assert block_layer_number == line_layer_number
+        assert block_thickness == pytest.approx(line_thickness)
+        numpy.testing.assert_allclose(block_path, line_path)
+
+    assert sorted(block_layers) == sorted(line_layers) == [0, 1]
+    for layer_number, line_layer in line_layers.items():
+        block_layer = block_layers[layer_number]
+        assert block_layer.height == pytest.approx(line_layer.height)
+        assert block_layer.thickness == pytest.approx(line_layer.thickness)
+        assert len(block_layer.polygons) == len(line_layer.polygons)
+        for block_polygon, line_polygon in zip(block_layer.polygons, line_layer.polygons):
+            numpy.testing.assert_array_equal(block_polygon.types, line_polygon.types)
+            numpy.testing.assert_allclose(block_polygon.data, line_polygon.data)
+            numpy.testing.assert_allclose(block_polygon.lineWidths, line_polygon.lineWidths, rtol = 1e-5)
+            numpy.testing.assert_allclose(block_polygon.lineThicknesses, line_polygon.lineThicknesses)
+            numpy.testing.assert_allclose(block_polygon.lineFeedrates, line_polygon.lineFeedrates)
@@ -0,0 +1,42 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from UM.FileHandler.FileReader import FileReader
+
+from ..GCodeReader import GCodeReader
+from ..MarlinFlavorParser import MarlinFlavorParser
+from ..RepRapFlavorParser import RepRapFlavorParser
+
+
+@pytest.fixture
+def reader():
+    with patch("UM.Application.Application.getInstance", MagicMock()):
+        with patch("UM.MimeTypeDatabase.MimeTypeDatabase.addMimeType"):
+            return GCodeReader()
+
+
+@pytest.mark.parametrize("gcode, parser_type", [
+    (";FLAVOR:RepRap\n;LAYER_COUNT:1\n;LAYER:0\nG1 X1\n", RepRapFlavorParser),
+    (";Generated by hand\nG28\n;LAYER:0\nG1 X1\n", MarlinFlavorParser),  # No flavor.
+    (";FLAVOR:Sailfish\n;LAYER:0\nG1 X1\n", MarlinFlavorParser),  # Unknown flavor.
+    (";LAYER:0\nG1 X1\n;FLAVOR:RepRap\n", MarlinFlavorParser),  # Not in the header.
+])
+def test_preRead(reader, tmp_path, gcode, parser_type):
+    gcode_file = tmp_path / "test.gcode"
+    gcode_file.write_text(gcode)
+
+    assert reader.preRead(str(gcode_file)) == FileReader.PreReadResult.accepted
+    assert isinstance(reader._flavor_reader, parser_type)
+
+
+def test_preReadOnlyReadsHeader(reader, tmp_path):
+    gcode_file = tmp_path / "test.gcode"
+    gcode_file.write_text("G1 X1\n" * (GCodeReader._max_header_size // 6 + 1) + ";FLAVOR:RepRap\n")
+
+    reader.preRead(str(gcode_file))
+
+    assert isinstance(reader._flavor_reader, MarlinFlavorParser)
@@ -0,0 +1,63 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import numpy
+import pytest
+
+from ..GCodeTokenizer import accumulate, forwardFill, GCodePath, isMoveLine, tokenizeMoves, E, F, X, Y, Z
+
+
+@pytest.mark.parametrize("line, is_move", [
+    ("G0 X10", True),
+    ("G1 X10 E2", True),
+    ("G01 X10", True),
+    ("G1", True),
+    ("N5 G1 X10", True),
+    ("G10", False),
+    ("G92 E0", False),
+    (";G1 X10", False),
+    ("M104 S200", False),
+])
+def test_isMoveLine(line, is_move):
+    assert isMoveLine(line) == is_move
+
+
+def test_tokenizeMoves():
+    values, present = tokenizeMoves(["G1 X10 Y20.5 E1 ; Z30", "G0 F1800 z0.3", "G1", "G1 Xabc Y2", "G1 X1 X2"])
+
+    assert values[0, X] == 10 and values[0, Y] == 20.5 and values[0, E] == 1
+    assert not present[0, Z]  # Comments are ignored.
+    assert values[1, F] == 1800 and values[1, Z] == 0.3
+    assert not present[2].any()
+    assert not present[3, X] and values[3, Y] == 2  # Parameters that are no number are skipped.
+    assert values[4, X] == 2
+
+
+def test_forwardFill():
+    values = numpy.array([1.0, 0.0, 3.0, 0.0])
+    present = numpy.array([True, False, True, False])
+
+    assert forwardFill(values, present, 5.0).tolist() == [1.0, 1.0, 3.0, 3.0]
+    assert forwardFill(values, ~present, 5.0).tolist() == [5.0, 0.0, 0.0, 0.0]
+
+
+def test_accumulate():
+    values = numpy.array([1.0, 7.0, 3.0])
+    present = numpy.array([True, False, True])
+
+    assert accumulate(values, present, 5.0).tolist() == [6.0, 6.0, 9.0]
+
+
+def test_gcodePath():
+    path = GCodePath()
+    path.append([0, 0, 0, 0, 0, 8])
+    path.extend(numpy.array([[1, 2, 3, 4, 5, 1], [6, 7, 8, 9, 10, 1]], dtype = numpy.float64))
+    path.append([11, 12, 13, 14, 15, 9])
+
+    assert len(path) == 4
+    assert numpy.asarray(path)[:, X].tolist() == [0, 1, 6, 11]
+    assert path[3][5] == 9
+
+    path.clear()
+    assert len(path) == 0
+    assert numpy.asarray(path).shape == (0, 6)
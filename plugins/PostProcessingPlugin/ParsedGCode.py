@@ -0,0 +1,200 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import functools
+import re
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# A letter, with the number that directly follows it if there is one.
+_parameter_pattern = re.compile(r"([A-Za-z])(-?[0-9]+\.?[0-9]*)?")
+# A letter with everything up to the next letter or space, or something else that is not separated by spaces.
+_word_pattern = re.compile(r"[A-Za-z][^A-Za-z\s]*|[^A-Za-z\s]+")
+
+
+@functools.lru_cache(maxsize = 1024)
+def parseParameters(line: str) -> Dict[str, Union[int, float]]:
+    """Read the numbers after all letters in the part of a line of g-code before the comment.
+
+    Like Script.getValue(), only the first occurrence of each letter counts. Letters that are not directly followed by a
+    number, like those of words in an M117 message, are left out. The result is cached, since scripts usually ask for
+    several parameters of the same line.
+    """
+
+    comment_start = line.find(";")
+    if comment_start >= 0:
+        line = line[:comment_start]
+    parameters = {}  # type: Dict[str, Any]
+    for letter, number in _parameter_pattern.findall(line):
+        if letter not in parameters:
+            parameters[letter] = number
+    return {letter: float(number) if "." in number else int(number) for letter, number in parameters.items() if number}
+
+
+class GCodeLine:
+    """A line of g-code, of which the command and parameters are only read when they're asked for.
+
+    Changing a parameter changes the text of the line. Lines that are not changed keep their original text.
+    """
+
+    __slots__ = ("_text", "_words", "_comment")
+
+    def __init__(self, text: str) -> None:
+        self._text = text  # type: Optional[str]  # None when the text needs to be made again from the words.
+        self._words = None  # type: Optional[List[str]]
+        self._comment = ""
+
+    def getText(self) -> str:
+        if self._text is None:
+            words = self._getWords()
+            self._text = " ".join(words)
+            if self._comment:
+                self._text += (" " if words else "") + self._comment
+        return self._text
+
+    def setText(self, text: str) -> None:
+        self._text = text
+        self._words = None
+        self._comment = ""
+
+    def getComment(self) -> str:
+        """Get the comment at the end of the line, including the semicolon, or an empty string if there is none."""
+
+        self._getWords()
+        return self._comment
+
+    def isComment(self) -> bool:
+        """Whether the line is only a comment."""
+
+        return self.getText().lstrip().startswith(";")
+
+    def getCommand(self) -> Optional[str]:
+        """Get the command of the line, like "G1" or "M104", or None if the line has no command."""
+
+        words = self._getWords()
+        return words[0] if words else None
+
+    def getValue(self, key: str, default: Any = None) -> Any:
+        """Get the value of a parameter of the line.
+
+        This gives the same result as Script.getValue(). The parameters of a line are only read once for all keys.
+
+        :param key: The letter of the parameter, like "X".
+        :param default: What to return if the line has no such parameter, or it's not a number.
+        :return: The value as an int if it's a whole number, as a float otherwise.
+        """
+
+        return parseParameters(self.getText()).get(key, default)
+
+    def hasParameter(self, key: str) -> bool:
+        return any(word[0] == key for word in self._getWords())
+
+    def setValue(self, key: str, value: Any) -> None:
+        """Set the value of a parameter of the line, adding the parameter if the line doesn't have it yet."""
+
+        words = self._getWords()
+        for index, word in enumerate(words):
+            if word[0] == key:
+                words[index] = key + str(value)
+                break
+        else:
+            words.append(key + str(value))
+        self._text = None
+
+    def removeParameter(self, key: str) -> None:
+        words = self._getWords()
+        self._words = [word for word in words if word[0] != key]
+        if len(self._words) != len(words):
+            self._text = None
+
+    def startswith(self, prefix: str) -> bool:
+        return self.getText().startswith(prefix)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self.getText()
+
+    def __str__(self) -> str:
+        return self.getText()
+
+    def __repr__(self) -> str:
+        return "GCodeLine({text!r})".format(text = self.getText())
+
+    def _getWords(self) -> List[str]:
+        if self._words is None:
+            text = self.getText()
+            comment_start = text.find(";")
+            if comment_start >= 0:
+                self._comment = text[comment_start:]
+                text = text[:comment_start]
+            # Parameters don't need spaces between them, as in "G1X10Y5".
+            self._words = _word_pattern.findall(text)
+        return self._words
+
+
+class GCodeLayer:
+    """A piece of g-code from the g-code list, usually a layer, that is only split into lines when they're asked for."""
+
+    __slots__ = ("_text", "_lines")
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._lines = None  # type: Optional[List[GCodeLine]]
+
+    @property
+    def lines(self) -> List[GCodeLine]:
+        """The lines of the layer. The list can be changed to add, remove or replace lines."""
+
+        if self._lines is None:
+            self._lines = [GCodeLine(line) for line in self._text.split("\n")]
+        return self._lines
+
+    def getText(self) -> str:
+        if self._lines is not None:
+            return "\n".join(line.getText() for line in self._lines)
+        return self._text
+
+    def setText(self, text: str) -> None:
+        self._text = text
+        self._lines = None
+
+    def insertLine(self, index: int, line: Union[str, GCodeLine]) -> None:
+        self.lines.insert(index, line if isinstance(line, GCodeLine) else GCodeLine(line))
+
+    def appendText(self, text: str) -> None:
+        """Add g-code at the end of the layer, like adding it to the string of the layer."""
+
+        self.setText(self.getText() + text)
+
+    def prependText(self, text: str) -> None:
+        """Add g-code at the start of the layer, like adding it to the string of the layer."""
+
+        self.setText(text + self.getText())
+
+    def __contains__(self, text: str) -> bool:
+        return text in self.getText()
+
+    def __str__(self) -> str:
+        return self.getText()
+
+
+class ParsedGCode:
+    """The g-code list that the post-processing scripts work on, with the layers split into lines only when needed.
+
+    It is passed from one script to the next, so that g-code is not split and parsed again by every script.
+    """
+
+    def __init__(self, gcode_list: List[str]) -> None:
+        self.layers = [GCodeLayer(text) for text in gcode_list]
+
+    def toList(self) -> List[str]:
+        """Get the g-code as a list of strings, as it's stored in the scene."""
+
+        return [layer.getText() for layer in self.layers]
+
+    def __len__(self) -> int:
+        return len(self.layers)
+
+    def __getitem__(self, index: int) -> GCodeLayer:
+        return self.layers[index]
+
+    def __iter__(self) -> Iterator[GCodeLayer]:
+        return iter(self.layers)
@@ -21,6 +21,9 @@ from UM.i18n import i18nCatalog
 from cura import ApplicationMetadata
 from cura.CuraApplication import CuraApplication
 
+from .ParsedGCode import ParsedGCode
+from .ScriptExecutor import ScriptExecutor
+
 i18n_catalog = i18nCatalog("cura")
 
 if TYPE_CHECKING:
@@ -48,6 +51,11 @@ class PostProcessingPlugin(QObject, Extension):
         if self._global_container_stack:
             self._global_container_stack.metaDataChanged.connect(self._restoreScriptInforFromMetadata)
 
+        # The number of processes to execute layer-local scripts in. 0 executes all scripts in Cura itself.
+        Application.getInstance().getPreferences().addPreference("postprocessing/worker_count", 0)
+        self._script_executor = ScriptExecutor()
+        Application.getInstance().applicationShuttingDown.connect(self._script_executor.shutdown)
+
         Application.getInstance().getOutputDeviceManager().writeStarted.connect(self.execute)
         Application.getInstance().globalContainerStackChanged.connect(self._onGlobalContainerStackChanged)  # When the current printer changes, update the list of scripts.
         CuraApplication.getInstance().mainWindowChanged.connect(self._createView)  # When the main window is created, create the view so that we can display the post-processing icon if necessary.
@@ -86,11 +94,11 @@ class PostProcessingPlugin(QObject, Extension):
             return
 
         if ";POSTPROCESSED" not in gcode_list[0]:
-            for script in self._script_list:
-                try:
-                    gcode_list = script.execute(gcode_list)
-                except Exception:
-                    Logger.logException("e", "Exception in post-processing script.")
+            # The scripts pass the g-code on to each other, so lines are only parsed once.
+            worker_count = Application.getInstance().getPreferences().getValue("postprocessing/worker_count")
+            self._script_executor.setWorkerCount(int(worker_count))
+            parsed_gcode = self._script_executor.execute(self._script_list, ParsedGCode(gcode_list))
+            gcode_list = parsed_gcode.toList()
             if len(self._script_list):  # Add comment to g-code if any changes were made.
                 gcode_list[0] += ";POSTPROCESSED\n"
             gcode_dict[active_build_plate_id] = gcode_list
@@ -196,6 +204,7 @@ class PostProcessingPlugin(QObject, Extension):
                         continue
                     spec.loader.exec_module(loaded_script)  # type: ignore
                     sys.modules[script_name] = loaded_script #TODO: This could be a security risk. Overwrite any module with a user-provided name?
+                    sys.modules[spec.name] = loaded_script  # So that scripts can be sent to the processes that execute them.
 
                     loaded_class = getattr(loaded_script, script_name)
                     temp_object = loaded_class()
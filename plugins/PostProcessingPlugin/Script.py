@@ -1,7 +1,7 @@
 # Copyright (c) 2015 Jaime van Kessel
 # Copyright (c) 2018 Ultimaker B.V.
 # The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
-from typing import Optional, Any, Dict, TYPE_CHECKING, List
+from typing import Optional, Any, Dict, TYPE_CHECKING, Iterable, List, Union
 
 from UM.Signal import Signal, signalemitter
 from UM.i18n import i18nCatalog
@@ -17,8 +17,42 @@ from UM.Settings.ContainerRegistry import ContainerRegistry
 import re
 import json
 import collections
+
+from .ParsedGCode import ParsedGCode, parseParameters
+
 i18n_catalog = i18nCatalog("cura")
 
+_number_pattern = re.compile(r"^-?[0-9]+\.?[0-9]*")
+# The order in which putValue() writes parameters. Other parameters follow these.
+_parameter_order = ["G", "M", "T", "S", "F", "X", "Y", "Z", "E"]
+
+
+def _formatLine(parameters: Dict[str, str], line: str) -> str:
+    """Write a line of g-code, in the order that Script.putValue() promises.
+
+    :param parameters: The words of the parameters to write, like "X100", by their letter.
+    :param line: The original line. Its parameters are written too, unless they are in parameters already. Its comment
+        is put at the end.
+    """
+
+    comment_start = line.find(";")
+    if comment_start >= 0:
+        comment = line[comment_start:]
+        line = line[:comment_start]
+    else:
+        comment = ""
+    for word in line.split(" "):
+        if word and word[0] not in parameters:
+            parameters[word[0]] = word
+
+    line_parts = [parameters[parameter] for parameter in _parameter_order if parameter in parameters]
+    if len(line_parts) < len(parameters):
+        line_parts.extend(word for parameter, word in parameters.items() if parameter not in _parameter_order)
+    if comment:
+        line_parts.append(comment)
+    return " ".join(line_parts)
+
+
 if TYPE_CHECKING:
     from UM.Settings.Interfaces import DefinitionContainerInterface
 
@@ -32,6 +66,7 @@ class Script:
         self._stack = None  # type: Optional[ContainerStack]
         self._definition = None  # type: Optional[DefinitionContainerInterface]
         self._instance = None  # type: Optional[InstanceContainer]
+        self._setting_values = None  # type: Optional[Dict[str, Any]]  # Setting values of a copy of the script in another process.
 
     def initialize(self) -> None:
         setting_data = self.getSettingData()
@@ -112,17 +147,46 @@ class Script:
 
         if self._stack is not None:
             return self._stack.getProperty(key, "value")
+        if self._setting_values is not None:
+            return self._setting_values.get(key)
         return None
 
+    def isLayerLocal(self) -> bool:
+        """Whether the script changes each piece of the g-code list on its own, without looking at the other pieces.
+
+        Such scripts can be executed on parts of the g-code list at the same time. Scripts that keep track of anything
+        from one layer to the next, like a position or a layer count, are not layer-local.
+        """
+        return False
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Get what is needed to execute a copy of the script in another process.
+
+        The settings stack can't be copied, so the copy gets the current values of the settings instead.
+        """
+        state = {key: value for key, value in self.__dict__.items() if not isinstance(value, Signal)}
+        state["_stack"] = None
+        state["_definition"] = None
+        state["_instance"] = None
+        state["_setting_values"] = {key: self.getSettingValueByKey(key) for key in self.getSettingData().get("settings", {})}
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+
     def getValue(self, line: str, key: str, default = None) -> Any:
         """Convenience function that finds the value in a line of g-code.
 
         When requesting key = x from line "G1 X100" the value 100 is returned.
         """
+        if len(key) == 1 and ("A" <= key <= "Z" or "a" <= key <= "z"):
+            return parseParameters(line).get(key, default)
+
+        # Keys that are no letter can't be parameters, but they used to be looked up like one.
         if not key in line or (';' in line and line.find(key) > line.find(';')):
             return default
         sub_part = line[line.find(key) + 1:]
-        m = re.search('^-?[0-9]+\.?[0-9]*', sub_part)
+        m = _number_pattern.search(sub_part)
         if m is None:
             return default
         try:
@@ -133,6 +197,15 @@ class Script:
             except ValueError: #Not a number at all.
                 return default
 
+    def getValues(self, line: str) -> Dict[str, Union[int, float]]:
+        """Finds the values of all parameters in a line of g-code at once.
+
+        When requesting the values of line "G1 X100 E1.5" you get ``{"G": 1, "X": 100, "E": 1.5}``. A parameter has the
+        value that getValue() would return for it.
+        """
+
+        return dict(parseParameters(line))
+
     def putValue(self, line: str = "", **kwargs) -> str:
         """Convenience function to produce a line of g-code.
 
@@ -148,43 +221,35 @@ class Script:
             provided, an entirely new g-code line will be produced.
         :return: A line of g-code with the desired parameters filled in.
         """
-        # Strip the comment.
-        if ";" in line:
-            comment = line[line.find(";"):]
-            line = line[:line.find(";")]
-        else:
-            comment = ""
-
-        # Parse the original g-code line and add them to kwargs.
-        for part in line.split(" "):
-            if part == "":
-                continue
-            parameter = part[0]
-            if parameter not in kwargs:
-                value = part[1:]
-                kwargs[parameter] = value
-
-        # Start writing the new g-code line.
-        line_parts = list()
-        # First add these parameters in order
-        for parameter in ["G", "M", "T", "S", "F", "X", "Y", "Z", "E"]:
-            if parameter in kwargs:
-                value = kwargs.pop(parameter)  # get the corresponding value and remove the parameter from kwargs
-                line_parts.append(parameter + str(value))
-        # Then add the rest of the parameters
-        for parameter, value in kwargs.items():
-            line_parts.append(parameter + str(value))
-
-        # If there was a comment, put it at the end.
-        if comment != "":
-            line_parts.append(comment)
-
-        # Add spaces and return the new line
-        return " ".join(line_parts)
+        return _formatLine({parameter: parameter + str(value) for parameter, value in kwargs.items()}, line)
+
+    def putValues(self, lines: Iterable[str], **kwargs) -> List[str]:
+        """Convenience function to change the same parameters in many lines of g-code.
+
+        This gives the same result as calling putValue() with the same parameters for each line.
+
+        :param lines: The original g-code lines that must be modified.
+        :return: The lines of g-code with the desired parameters filled in.
+        """
+
+        words = {parameter: parameter + str(value) for parameter, value in kwargs.items()}  # Formatted only once.
+        return [_formatLine(dict(words), line) for line in lines]
 
     def execute(self, data: List[str]) -> List[str]:
         """This is called when the script is executed. 
 
         It gets a list of g-code strings and needs to return a (modified) list.
+        Scripts that implement executeParsed() instead don't need to implement this.
         """
-        raise NotImplementedError()
+        if type(self).executeParsed is Script.executeParsed:
+            raise NotImplementedError()
+        return self.executeParsed(ParsedGCode(data)).toList()
+
+    def executeParsed(self, gcode: ParsedGCode) -> ParsedGCode:
+        """This is called when the script is executed on the g-code that the previous scripts worked on.
+
+        Scripts can implement this instead of execute(), to work on g-code lines of which the parameters are already
+        read, so that every script doesn't need to split and parse the g-code again. By default, it executes the
+        script on the g-code as a list of strings.
+        """
+        return ParsedGCode(self.execute(gcode.toList()))
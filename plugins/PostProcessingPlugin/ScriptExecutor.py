@@ -0,0 +1,233 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import multiprocessing
+import multiprocessing.context
+import os
+import sys
+import traceback
+import types
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from UM.Logger import Logger
+
+from .ParsedGCode import ParsedGCode
+
+if TYPE_CHECKING:
+    from .Script import Script
+
+# Executed in every worker process before it receives the scripts. The scripts are loaded from files and this plugin from
+# the plugin folders, so a worker can only import them by name once this code has put them in sys.modules. It runs
+# before this module can be imported, so it can only use the standard library.
+_LOAD_MODULES_SOURCE = """
+import importlib.util
+import os
+import sys
+
+for name, location in modules:
+    if name in sys.modules:
+        continue
+    if os.path.isdir(location):  # Only make the package known, so that its modules can be imported. Don't load it.
+        spec = importlib.util.spec_from_file_location(name, os.path.join(location, "__init__.py"), submodule_search_locations = [location])
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+    else:
+        spec = importlib.util.spec_from_file_location(name, location)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+"""
+
+
+def _executeLayerLocalScripts(scripts: List["Script"], layers: List[str]) -> Tuple[List[str], List[str]]:
+    """Execute layer-local scripts one after another on a part of the g-code list, in a worker process.
+
+    :return: The changed part of the g-code list, and the errors of the scripts that failed.
+    """
+
+    errors = []  # type: List[str]
+    for script in scripts:
+        try:
+            layers = script.executeParsed(ParsedGCode(layers)).toList()
+        except Exception:
+            errors.append(traceback.format_exc())
+    return layers, errors
+
+
+class ScriptExecutor:
+    """Executes a list of post-processing scripts on g-code.
+
+    Scripts are executed in order. When worker processes are used, the parts of the g-code list go through consecutive
+    layer-local scripts in the workers at the same time, so that one part can be in the second script while the next
+    part is in the first. Scripts that are not layer-local wait until all parts went through the scripts before them,
+    and are executed on the whole g-code list in this process.
+    """
+
+    def __init__(self, worker_count: int = 0, chunks_per_worker: int = 4) -> None:
+        """Creates a script executor.
+
+        :param worker_count: The number of processes to execute layer-local scripts in. With less than 2, all scripts
+            are executed in this process, one after another.
+        :param chunks_per_worker: Into how many parts per worker the g-code list is divided.
+        """
+
+        self._worker_count = worker_count
+        self._chunks_per_worker = chunks_per_worker
+
+        # The worker processes are kept for the next time that scripts are executed, until shutdown() is called.
+        self._pool = None  # type: Optional[ProcessPoolExecutor]
+        # The modules that the workers of the pool loaded, with the modification times of their files at the time.
+        self._pool_modules = {}  # type: Dict[Tuple[str, str], Optional[float]]
+
+    def setWorkerCount(self, worker_count: int) -> None:
+        if worker_count != self._worker_count:
+            self.shutdown()
+            self._worker_count = worker_count
+
+    def shutdown(self) -> None:
+        """Stop the worker processes. They're started again when they're needed."""
+
+        if self._pool is not None:
+            self._pool.shutdown(wait = False)
+            self._pool = None
+            self._pool_modules = {}
+
+    def execute(self, scripts: List["Script"], gcode: ParsedGCode) -> ParsedGCode:
+        """Execute scripts on g-code. When a script fails, the g-code is passed on to the next script as it was before.
+
+        :return: The g-code after all scripts.
+        """
+
+        pool = self._getPool(scripts)
+        for layer_local, stage in self._getStages(scripts, pool is not None):
+            if layer_local and pool is not None:
+                gcode = self._executeInPool(pool, stage, gcode)
+            else:
+                gcode = self._executeHere(stage, gcode)
+        return gcode
+
+    @staticmethod
+    def _executeHere(scripts: List["Script"], gcode: ParsedGCode) -> ParsedGCode:
+        for script in scripts:
+            try:
+                gcode = script.executeParsed(gcode)
+            except Exception:
+                Logger.logException("e", "Exception in post-processing script.")
+        return gcode
+
+    @staticmethod
+    def _getStages(scripts: List["Script"], split_layer_local: bool) -> List[Tuple[bool, List["Script"]]]:
+        """Group consecutive layer-local scripts together. Every other script is a stage of its own."""
+
+        stages = []  # type: List[Tuple[bool, List[Script]]]
+        for script in scripts:
+            layer_local = split_layer_local and script.isLayerLocal()
+            if layer_local and stages and stages[-1][0]:
+                stages[-1][1].append(script)
+            else:
+                stages.append((layer_local, [script]))
+        return stages
+
+    def _getPool(self, scripts: List["Script"]) -> Optional[ProcessPoolExecutor]:
+        """Get the worker processes to execute the layer-local scripts in, if there are any.
+
+        The pool of the previous time is used again, unless its workers didn't load all modules of the scripts, or some
+        of these modules changed since.
+        """
+
+        if self._worker_count < 2 or not any(script.isLayerLocal() for script in scripts):
+            return None
+        modules = self._getModules(scripts)
+        if self._pool is not None and all(self._pool_modules.get(module, -1) == self._getModificationTime(module[1]) for module in modules):
+            return self._pool
+
+        # The new workers load the modules of the previous scripts as well, so that going back to those scripts doesn't
+        # start the workers again.
+        modules += [module for module in self._pool_modules if module not in modules and os.path.exists(module[1])]
+        self.shutdown()
+        try:
+            self._pool = ProcessPoolExecutor(max_workers = self._worker_count, mp_context = self._getContext(),
+                                             initializer = exec, initargs = (_LOAD_MODULES_SOURCE, {"modules": modules}))
+        except (OSError, ValueError):
+            Logger.logException("w", "Unable to start processes for post-processing scripts.")
+            return None
+        self._pool_modules = {module: self._getModificationTime(module[1]) for module in modules}
+        return self._pool
+
+    @staticmethod
+    def _getContext() -> multiprocessing.context.BaseContext:
+        # Forking this process would copy the state of its other threads (Qt, the back-end) into the workers, so they
+        # are forked from a server process instead. Where that's not possible, the workers are new processes. A frozen
+        # build starts its own executable for them, and cura_app.py makes that executable run the worker.
+        if "forkserver" in multiprocessing.get_all_start_methods() and not getattr(sys, "frozen", False):
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([])  # The server doesn't need anything. The workers load what they need.
+            return context
+        return multiprocessing.get_context("spawn")
+
+    @staticmethod
+    @contextmanager
+    def _emptyMainModule() -> Iterator[None]:
+        """Replace the main module of this process by an empty one while worker processes are started.
+
+        A new process runs the main module of the process that starts it. For Cura, that's cura_app.py, which imports
+        Qt, Arcus and everything else of Cura. The workers don't need any of it.
+        """
+
+        main_module = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main_module
+
+    @staticmethod
+    def _getModificationTime(location: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(location)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _getModules(scripts: List["Script"]) -> List[Tuple[str, str]]:
+        """Get the modules that the workers need to know to receive the scripts, and where to load them from.
+
+        :return: Pairs of module names and files, or folders for packages. Base classes come before the classes that
+            derive from them.
+        """
+
+        modules = [(__package__, os.path.dirname(os.path.abspath(__file__)))]
+        for script in scripts:
+            for script_class in reversed(type(script).__mro__):
+                module = sys.modules.get(script_class.__module__)
+                location = getattr(module, "__file__", None)
+                if location is not None and (script_class.__module__, location) not in modules:
+                    modules.append((script_class.__module__, location))
+        return modules
+
+    def _executeInPool(self, pool: ProcessPoolExecutor, scripts: List["Script"], gcode: ParsedGCode) -> ParsedGCode:
+        layers = gcode.toList()
+        if not layers:
+            return gcode
+        chunk_count = max(1, min(len(layers), self._worker_count * self._chunks_per_worker))
+        chunk_size = -(-len(layers) // chunk_count)  # Rounded up.
+        chunks = [layers[start:start + chunk_size] for start in range(0, len(layers), chunk_size)]
+
+        try:
+            with self._emptyMainModule():  # The workers are started when the first parts are submitted.
+                futures = [pool.submit(_executeLayerLocalScripts, scripts, chunk) for chunk in chunks]
+            results = [future.result() for future in futures]
+        except Exception:  # The scripts can't be sent to the workers, or a worker stopped.
+            Logger.logException("w", "Unable to execute post-processing scripts in other processes. Executing them here.")
+            self.shutdown()  # Start new workers the next time.
+            return self._executeHere(scripts, gcode)
+
+        errors = [error for _, chunk_errors in results for error in chunk_errors]
+        if errors:
+            # A script that failed on some parts changed the others, and the scripts after it got a mix of both. Execute
+            # the scripts again on the whole g-code instead, so a failing script doesn't change anything.
+            for error in errors:
+                Logger.log("w", "Exception in post-processing script in another process: %s", error)
+            return self._executeHere(scripts, gcode)
+        return ParsedGCode([layer for chunk_layers, _ in results for layer in chunk_layers])
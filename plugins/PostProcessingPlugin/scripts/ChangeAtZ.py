@@ -701,7 +701,7 @@ class ChangeAtZProcessor:
         for active_layer in data:
 
             # will hold our updated gcode
-            modified_gcode = ""
+            modified_gcode = []
 
             # mark all the defaults for deletion
             active_layer = self.markChangesForDeletion(active_layer)
@@ -719,6 +719,11 @@ class ChangeAtZProcessor:
                 if len(line) == 0:
                     continue
 
+                # outside of our target most lines are passed on as they are, without looking at them any further
+                if self.canSkipLine(line):
+                    modified_gcode.append(line + "\n")
+                    continue
+
                 # update our layer number if applicable
                 self.processLayerNumber(line)
 
@@ -729,10 +734,10 @@ class ChangeAtZProcessor:
                 self.processTargetLayer()
 
                 # process any changes to the gcode
-                modified_gcode += self.processLine(line)
+                modified_gcode.append(self.processLine(line))
 
             # remove any marked defaults
-            modified_gcode = self.removeMarkedChanges(modified_gcode)
+            modified_gcode = self.removeMarkedChanges("".join(modified_gcode))
 
             # append our modified line
             data[index] = modified_gcode
@@ -742,6 +747,25 @@ class ChangeAtZProcessor:
         # return our modified gcode
         return data
 
+    # Determines if the given line can be passed on unchanged, without affecting our state. This is the case for most
+    # lines before and after our target, which saves parsing them
+    def canSkipLine(self, line: str) -> bool:
+
+        # inside our target lines are changed, and right after it the last values still need to be restored
+        if self.insideTargetLayer or (self.wasInsideTargetLayer and not self.lastValuesRestored):
+            return False
+
+        # before the first layer we read the settings from the linear moves
+        if self.currentLayer is None:
+            return False
+
+        # commands that change values we track, and layer or height changes
+        if line[0] == "M" or "Z" in line or ";LAYER:" in line:
+            return False
+
+        # defaults or values of previous ChangeAtZ edits
+        return "[CAZD:" not in line and ";PRINTSPEED" not in line and ";RETRACT" not in line
+
     # Builds the restored layer settings based on the previous settings and returns the relevant GCODE lines
     def getChangedLastValues(self) -> Dict[str, any]:
 
@@ -1002,6 +1026,10 @@ class ChangeAtZProcessor:
         if self.currentLayer is None:
             return
 
+        # only linear moves with a Z value can change the height, no need to parse any other command
+        if not line.startswith(("G0", "G1")) or "Z" not in line:
+            return
+
         # get our gcode command
         command = GCodeCommand.getFromLine(line)
 
@@ -1291,6 +1319,8 @@ class ChangeAtZProcessor:
     # Removes all the ChangeZ layer defaults from the given layer
     @staticmethod
     def removeMarkedChanges(layer: str) -> str:
+        if ";[CAZD:DELETE:" not in layer:
+            return layer
         return re.sub(r";\[CAZD:DELETE:[\s\S]+?:CAZD\](\n|$)", "", layer)
 
     # Resets the class contents to defaults
@@ -1333,6 +1363,10 @@ class ChangeAtZProcessor:
         if ";RETRACTLENGTH" in line:
             line = line.replace(";RETRACTLENGTH ", "M207 S")
 
+        # all the values we track are set by M commands, no need to parse any other command
+        if not line.startswith("M"):
+            return
+
         # get our gcode command
         command = GCodeCommand.getFromLine(line)
 
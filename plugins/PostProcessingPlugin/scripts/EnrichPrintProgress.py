@@ -7,6 +7,7 @@
 from ..Script import Script
 from UM.Application import Application
 from UM.Logger import Logger
+from collections import deque
 from math import ceil
 import time
 
@@ -122,31 +123,66 @@ class EnrichPrintProgress(Script):
             state[self.LAYER_ENDING_TIME] = currentLayerEndingTime
 
             layerCommandLines = layerData.split("\n")
-            currentLayerOverallEmovement = self.getOverallEmovement(state, layerCommandLines)
+
+            # Go through the commands once, to know how much filament the layer uses in total. Remember the state after
+            # each command, to divide the time of the layer over the commands by how much filament they use.
+            beginEposition = state.get(self.E_POSITION, 0)
+            beginLayerNumber = state.get(self.LAYER_NUMBER, 0)
+            beginFirstLayerFound = state.get(self.FIRST_LAYER_ALREADY_FOUND, False)
+            ePositions = []
+            layerNumbers = []
+            firstLayerFound = []
+            for command in layerCommandLines:
+                if command.startswith(";") and not command.startswith(";LAYER:"):  # Comments don't change the state.
+                    pass
+                elif command:
+                    self.processSingleCommand(command, state)
+                ePositions.append(state.get(self.E_POSITION, 0))
+                layerNumbers.append(state.get(self.LAYER_NUMBER, 0))
+                firstLayerFound.append(state.get(self.FIRST_LAYER_ALREADY_FOUND, False))
+            currentLayerOverallEmovement = state.get(self.E_POSITION, 0) - beginEposition
             state[self.LAYER_OVERALL_E_MOVEMENT] = currentLayerOverallEmovement
 
-            new_state = state
-            for index, command in enumerate(layerCommandLines):
-                after_command_state = dict(new_state)
-                self.processSingleCommand(command, after_command_state)
+            # The injected commands are processed as commands too, right after the command they were injected for.
+            # They don't move the filament, but they count for which commands get injections.
+            outputLines = []
+            injectedCommands = deque()
+            commandIndex = 0
+            previousEposition = beginEposition
+            previousLayerNumber = beginLayerNumber
+            previousFirstLayerFound = beginFirstLayerFound
+            currentTime = state.get(self.TIME, 0)
+            index = 0
+            while injectedCommands or commandIndex < len(layerCommandLines):
+                if injectedCommands:
+                    command = injectedCommands.popleft()
+                    ePosition, layerNumber, isFirstLayerFound = previousEposition, previousLayerNumber, previousFirstLayerFound
+                else:
+                    command = layerCommandLines[commandIndex]
+                    ePosition, layerNumber, isFirstLayerFound = ePositions[commandIndex], layerNumbers[commandIndex], firstLayerFound[commandIndex]
+                    commandIndex += 1
+                outputLines.append(command)
 
                 if currentLayerEndingTime and currentLayerOverallEmovement:
-                    commandDifficultyContribution = (after_command_state.get(self.E_POSITION, 0) - new_state.get(self.E_POSITION, 0)) / currentLayerOverallEmovement
+                    commandDifficultyContribution = (ePosition - previousEposition) / currentLayerOverallEmovement
                     commandTimeCost = commandDifficultyContribution * currentLayerTimeCost
-                    new_time = new_state.get(self.TIME, 0) + commandTimeCost
-                    after_command_state[self.TIME] = new_time
+                    currentTime = currentTime + commandTimeCost
 
                 if index < 5 or index % 5 == 0:
-                    command_to_inject = self.getInjectionCommands(new_state, after_command_state)
-                    for ins_index, injection_command in enumerate(command_to_inject, index + 1):
-                        layerCommandLines.insert(ins_index, injection_command)
-                    
-                new_state = after_command_state
+                    previous_state = {"NEXT_PERCENT_CHANGE_TIME": state.get("NEXT_PERCENT_CHANGE_TIME", 0), self.LAYER_NUMBER: previousLayerNumber}
+                    state[self.TIME] = currentTime
+                    state[self.LAYER_NUMBER] = layerNumber
+                    state[self.FIRST_LAYER_ALREADY_FOUND] = isFirstLayerFound
+                    injectedCommands.extendleft(reversed(self.getInjectionCommands(previous_state, state)))
 
-            state.update(new_state)
+                previousEposition, previousLayerNumber, previousFirstLayerFound = ePosition, layerNumber, isFirstLayerFound
+                index += 1
+
+            state[self.LAYER_NUMBER] = previousLayerNumber
+            state[self.FIRST_LAYER_ALREADY_FOUND] = previousFirstLayerFound
             state[self.TIME] = currentLayerEndingTime
 
-            return "\n".join(layerCommandLines)
+            return "\n".join(outputLines)
         else:
             new_state = dict(state)
             layer_num = self.getLayerNum(layerData)
@@ -248,13 +284,6 @@ class EnrichPrintProgress(Script):
             return int(index_str)
         return None
 
-    def getOverallEmovement(self, begin_state: dict, commandLines) -> float:
-        state = dict(begin_state)
-        for commandLine in commandLines:
-            self.processSingleCommand(commandLine, state)
-        
-        return state.get(self.E_POSITION, 0) - begin_state.get(self.E_POSITION, 0)
-
     def getInjectionCommands(self, previous: dict, current: dict) -> list:
         if not current.get(self.FIRST_LAYER_ALREADY_FOUND, False):
             return []
@@ -34,6 +34,9 @@ class InsertAtLayerChange(Script):
             }
         }"""
 
+    def isLayerLocal(self) -> bool:
+        return True
+
     def execute(self, data):
         gcode_to_add = self.getSettingValueByKey("gcode_to_add") + "\n"
         for layer in data:
@@ -4,13 +4,65 @@
 
 # Licence: AGPLv3 or higher
 
+import itertools
+from typing import Dict, List, Optional, Tuple
+
 from ..Script import Script
 from UM.Application import Application
 from UM.Logger import Logger
 
+
+class ObjectsIndex:
+    """Where the objects (meshes) start in each layer of the g-code, found in one pass over the g-code.
+
+    After the g-code is marked, it also has the byte ranges of the objects in the marked g-code, so that the parts of an
+    object can be found without searching through the g-code again, e.g. to cancel an object. The ranges are offsets in
+    the g-code list as this script returns it, joined together. Anything that changes the g-code afterwards, like the
+    ";POSTPROCESSED" line that the PostProcessingPlugin adds to the first item or the scripts that run after this one,
+    shifts them. Whoever uses the ranges has to account for that.
+    """
+
+    def __init__(self) -> None:
+        self.object_names = []  # type: List[str]  # The names of the objects, in the order of their M486 numbers.
+        # Per layer, the line numbers of the markers with the number of the object they start, or -1 for parts that are
+        # not an object, like the skirt.
+        self.layer_markers = []  # type: List[List[Tuple[int, int]]]
+        self.object_ranges = {}  # type: Dict[str, List[Tuple[int, int]]]
+
+    @classmethod
+    def build(cls, data: List[str]) -> "ObjectsIndex":
+        index = cls()
+        object_numbers = {}  # type: Dict[str, int]
+        for layer in data:
+            markers = []  # type: List[Tuple[int, int]]
+            if ";TYPE:SKIRT" in layer or ";MESH:" in layer:
+                for line_number, line in enumerate(layer.split("\n")):
+                    if line.startswith(";TYPE:SKIRT") or line.startswith(";MESH:NONMESH"):
+                        markers.append((line_number, -1))
+                    elif line.startswith(";MESH:"):
+                        object_name = line.split(":")[1]
+                        if object_name not in object_numbers:
+                            object_numbers[object_name] = len(index.object_names)
+                            index.object_names.append(object_name)
+                        markers.append((line_number, object_numbers[object_name]))
+            index.layer_markers.append(markers)
+        index.object_ranges = {object_name: [] for object_name in index.object_names}
+        return index
+
+    def getObjectRanges(self, object_name: str) -> List[Tuple[int, int]]:
+        """Get where an object is in the marked g-code.
+
+        :return: The start and end byte offsets of the parts of the object, in the joined g-code list that this script
+        returned.
+        """
+
+        return self.object_ranges.get(object_name, [])
+
+
 class MarlinObjectsMarking(Script):
     def __init__(self):
         super().__init__()
+        self._objects_index = None  # type: Optional[ObjectsIndex]
 
     def getSettingDataString(self):
         return """{
@@ -21,26 +73,50 @@ class MarlinObjectsMarking(Script):
             "settings": {}
         }"""
 
+    def getObjectsIndex(self) -> Optional[ObjectsIndex]:
+        """The index of the objects in the g-code that was marked last."""
+
+        return self._objects_index
+
     def execute(self, data):
-        obj_dict = {}
-        for layer in data:
-            lay_idx = data.index(layer)
-            layerCommandLines = layer.split("\n")
-            for commandLine in layerCommandLines:
-                if not commandLine.startswith(";"):
-                    continue
-
-                command_idx = layerCommandLines.index(commandLine)
-
-                if commandLine.startswith(";TYPE:SKIRT") or \
-                   commandLine.startswith(";MESH:NONMESH"):
-                    layerCommandLines.insert(command_idx + 1, self.putValue("", M=486, S=-1))
-                    continue
-
-                if commandLine.startswith(";MESH:"):
-                    obj_name = commandLine.split(":")[1]
-                    obj_index = obj_dict.setdefault(obj_name, len(obj_dict.keys()))
-                    layerCommandLines.insert(command_idx + 1, self.putValue("", M=486, S=obj_index))
-
-            data[lay_idx] = "\n".join(layerCommandLines)
-        return data
\ No newline at end of file
+        index = ObjectsIndex.build(data)
+        layer_offset = 0
+        current_range = None  # type: Optional[Tuple[str, int]]  # The object that is being marked, and where it starts.
+        for lay_idx, layer in enumerate(data):
+            markers = index.layer_markers[lay_idx]
+            if markers:
+                layerCommandLines = layer.split("\n")
+                marked_lines = []  # type: List[str]
+                marker_positions = []  # type: List[Tuple[int, int]]  # Where the markers are in the marked lines.
+                previous_line_number = 0
+                for line_number, object_number in markers:
+                    marked_lines.extend(layerCommandLines[previous_line_number:line_number])
+                    marker_positions.append((len(marked_lines), object_number))
+                    marked_lines.append(layerCommandLines[line_number])
+                    marked_lines.append(self.putValue("", M = 486, S = object_number))
+                    previous_line_number = line_number + 1
+                marked_lines.extend(layerCommandLines[previous_line_number:])
+                layer = "\n".join(marked_lines)
+                data[lay_idx] = layer
+
+                if len(layer) == len(layer.encode("utf-8")):
+                    line_lengths = map(len, marked_lines)
+                else:
+                    line_lengths = (len(line.encode("utf-8")) for line in marked_lines)
+                line_offsets = list(itertools.accumulate(itertools.chain([layer_offset], (length + 1 for length in line_lengths))))
+                for position, object_number in marker_positions:
+                    if current_range is not None:
+                        index.object_ranges[current_range[0]].append((current_range[1], line_offsets[position]))
+                    current_range = (index.object_names[object_number], line_offsets[position]) if object_number >= 0 else None
+                layer_size = line_offsets[-1] - 1 - layer_offset
+            else:
+                layer_size = len(layer.encode("utf-8"))
+
+            # Objects end with the layer, also when the next layer starts with the same object.
+            layer_offset += layer_size
+            if current_range is not None:
+                index.object_ranges[current_range[0]].append((current_range[1], layer_offset))
+                current_range = None
+
+        self._objects_index = index
+        return data
@@ -45,6 +45,9 @@ class SearchAndReplace(Script):
             }
         }"""
 
+    def isLayerLocal(self) -> bool:
+        return True
+
     def execute(self, data):
         search_string = self.getSettingValueByKey("search")
         if not self.getSettingValueByKey("is_regex"):
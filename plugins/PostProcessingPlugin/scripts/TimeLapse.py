@@ -70,7 +70,7 @@ class TimeLapse(Script):
             }
         }"""
 
-    def execute(self, data):
+    def executeParsed(self, gcode):
         feed_rate = self.getSettingValueByKey("park_feed_rate")
         park_print_head = self.getSettingValueByKey("park_print_head")
         x_park = self.getSettingValueByKey("head_park_x")
@@ -88,19 +88,12 @@ class TimeLapse(Script):
         gcode_to_append += trigger_command + " ;Snap Photo\n"
         gcode_to_append += self.putValue(G=4, P=pause_length) + " ;Wait for camera\n"
 
-        for idx, layer in enumerate(data):
-            for line in layer.split("\n"):
-                if self.getValue(line, "G") in {0, 1}:  # Track X,Y location.
-                    last_x = self.getValue(line, "X", last_x)
-                    last_y = self.getValue(line, "Y", last_y)
+        for layer in gcode:
+            for line in layer.lines:
+                if line.getValue("G") in {0, 1}:  # Track X,Y location.
+                    last_x = line.getValue("X", last_x)
+                    last_y = line.getValue("Y", last_y)
             # Check that a layer is being printed
-            lines = layer.split("\n")
-            for line in lines:
-                if ";LAYER:" in line:
-                    layer += gcode_to_append
-
-                    layer += "G0 X%s Y%s\n" % (last_x, last_y)
-
-                    data[idx] = layer
-                    break
-        return data
+            if ";LAYER:" in layer:
+                layer.appendText(gcode_to_append + "G0 X%s Y%s\n" % (last_x, last_y))
+        return gcode
@@ -0,0 +1,84 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import itertools
+
+import pytest
+
+from ..scripts.ChangeAtZ import ChangeAtZProcessor
+
+
+class FullChangeAtZProcessor(ChangeAtZProcessor):
+    """Processor that looks at every line, also outside of the target."""
+
+    def canSkipLine(self, line):
+        return False
+
+
+def createGCode(layer_count = 10):
+    data = [";FLAVOR:Marlin\n", "M140 S60\nM104 S200\nG28\nG92 E0\nG1 F2700 E-5\nM221 S100\n"]
+    e = 0.0
+    for layer_number in range(layer_count):
+        z = 0.3 + layer_number * 0.2
+        lines = [";LAYER:%d" % layer_number, "M106 S%d" % (layer_number * 20), "G0 F9000 X10 Y10 Z%.1f" % z, ";TYPE:WALL-OUTER"]
+        for move in range(10):
+            e += 0.5
+            lines.append("G1 F1500 X%d Y%d E%.5f" % (move * 10, move * 5, e))
+        lines.extend(["G1 F2700 E%.5f" % (e - 5), "G0 F9000 X1 Y1 Z%.1f" % (z + 0.5), "G0 X2 Y2 Z%.1f" % z, "G1 F2700 E%.5f" % e])
+        lines.append("M104 S%d T0" % (200 + layer_number))
+        lines.append(";TIME_ELAPSED:%d" % layer_number)
+        data.append("\n".join(lines) + "\n")
+    data.append("M104 S0\nM140 S0\n")
+    return data
+
+
+def configure(processor, by_layer, single_layer, values, linear_retraction = True):
+    processor.targetValues = dict(values)
+    processor.targetByLayer = by_layer
+    processor.applyToSingleLayer = single_layer
+    processor.targetLayer = 4
+    processor.targetZ = 1.1
+    processor.displayChangesToLcd = True
+    processor.linearRetraction = linear_retraction
+    return processor
+
+
+value_sets = [
+    {"speed": 80},
+    {"printspeed": 150, "flowrate": 95, "bedTemp": 70.0},
+    {"retractlength": 3.0, "retractfeedrate": 30.0, "fanSpeed": 50, "extruderOne": 210.0}
+]
+
+
+@pytest.mark.parametrize("by_layer, single_layer, values, linear_retraction", list(itertools.product([True, False], [True, False], value_sets, [True, False])))
+def test_sameAsFullProcessing(by_layer, single_layer, values, linear_retraction):
+    expected = configure(FullChangeAtZProcessor(), by_layer, single_layer, values, linear_retraction).execute(createGCode())
+    result = configure(ChangeAtZProcessor(), by_layer, single_layer, values, linear_retraction).execute(createGCode())
+    assert result == expected
+
+    # Another run on the result replaces the changes of the previous run.
+    expected = configure(FullChangeAtZProcessor(), not by_layer, single_layer, value_sets[1], linear_retraction).execute(expected)
+    result = configure(ChangeAtZProcessor(), not by_layer, single_layer, value_sets[1], linear_retraction).execute(result)
+    assert result == expected
+
+
+def test_changeSingleLayer():
+    result = configure(ChangeAtZProcessor(), True, True, {"extruderOne": 210.0}).execute(createGCode())
+
+    assert result[6].startswith(";LAYER:4\n;[CAZD:\nM104 S210.0 T0\n;:CAZD]\n")
+    assert result[7].startswith(";LAYER:5\n;[CAZD:\nM104 S204.0 T0\n;:CAZD]\n")  # Restored to the last temperature.
+    assert "CAZD" not in "".join(result[:6] + result[8:])
+
+
+def test_skipLinesOutsideTarget():
+    processor = configure(ChangeAtZProcessor(), True, True, {"speed": 80})
+    processor.currentLayer = 2
+
+    assert processor.canSkipLine("G1 F1500 X10 Y10 E1")
+    assert processor.canSkipLine(";TYPE:WALL-OUTER")
+    assert not processor.canSkipLine("G0 X1 Y1 Z2")  # Could be the target height.
+    assert not processor.canSkipLine(";LAYER:3")
+    assert not processor.canSkipLine("M220 S90")  # Changes a value to restore.
+
+    processor.insideTargetLayer = True
+    assert not processor.canSkipLine("G1 F1500 X10 Y10 E1")
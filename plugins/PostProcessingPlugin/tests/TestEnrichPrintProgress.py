@@ -0,0 +1,134 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import itertools
+import random
+
+import pytest
+
+from ..scripts.EnrichPrintProgress import EnrichPrintProgress
+
+setting_keys = ["interpolateByE", "useM73", "useM117", "showProgress", "showCurrentLayer", "showElapsedTime", "showLeftTime"]
+
+
+class LegacyEnrichPrintProgress(EnrichPrintProgress):
+    """The implementation that inserted the progress commands into the list of commands while going through it.
+
+    It is kept as the reference that the output of the script is compared with.
+    """
+
+    def processSingleLayer(self, layerData, state: dict) -> str:
+        previousLayerEndingTime = state.get(self.LAYER_ENDING_TIME, 0)
+        currentLayerEndingTime_str = self.getFirstSubstringBetween(layerData, ";TIME_ELAPSED:", "\n")
+        currentLayerEndingTime = float(currentLayerEndingTime_str) if currentLayerEndingTime_str else previousLayerEndingTime
+
+        if self.interpolateByE:
+            currentLayerTimeCost = currentLayerEndingTime - previousLayerEndingTime
+            state[self.LAYER_OVERALL_TIME] = currentLayerTimeCost
+            state[self.LAYER_ENDING_TIME] = currentLayerEndingTime
+
+            layerCommandLines = layerData.split("\n")
+            currentLayerOverallEmovement = self.getOverallEmovement(state, layerCommandLines)
+            state[self.LAYER_OVERALL_E_MOVEMENT] = currentLayerOverallEmovement
+
+            new_state = state
+            for index, command in enumerate(layerCommandLines):
+                after_command_state = dict(new_state)
+                self.processSingleCommand(command, after_command_state)
+
+                if currentLayerEndingTime and currentLayerOverallEmovement:
+                    commandDifficultyContribution = (after_command_state.get(self.E_POSITION, 0) - new_state.get(self.E_POSITION, 0)) / currentLayerOverallEmovement
+                    commandTimeCost = commandDifficultyContribution * currentLayerTimeCost
+                    after_command_state[self.TIME] = new_state.get(self.TIME, 0) + commandTimeCost
+
+                if index < 5 or index % 5 == 0:
+                    injection_commands = self.getInjectionCommands(new_state, after_command_state)
+                    for i, injection_command in enumerate(injection_commands):
+                        layerCommandLines.insert(index + i + 1, injection_command)
+
+                new_state = after_command_state
+
+            state.update(new_state)
+            state[self.TIME] = currentLayerEndingTime
+            return "\n".join(layerCommandLines)
+        else:
+            new_state = dict(state)
+            layer_num = self.getLayerNum(layerData)
+            if layer_num is not None:
+                new_state[self.LAYER_NUMBER] = layer_num
+                new_state[self.FIRST_LAYER_ALREADY_FOUND] = True
+            new_state[self.LAYER_ENDING_TIME] = currentLayerEndingTime
+
+            injection_commands = self.getInjectionCommands(state, new_state)
+
+            new_state[self.TIME] = currentLayerEndingTime
+            state.update(new_state)
+
+            return "\n".join(injection_commands + [layerData])
+
+    def getOverallEmovement(self, begin_state: dict, commandLines) -> float:
+        state = dict(begin_state)
+        for commandLine in commandLines:
+            self.processSingleCommand(commandLine, state)
+        return state.get(self.E_POSITION, 0) - begin_state.get(self.E_POSITION, 0)
+
+
+def createScript(script_class, settings):
+    script = script_class()
+    script._setting_values = dict(zip(setting_keys, settings))
+    return script
+
+
+def createGCode(seed, layer_count = 12):
+    """Make g-code like CuraEngine writes, with some relative extrusion, retractions and progress messages in it."""
+
+    generator = random.Random(seed)
+    data = [";FLAVOR:Marlin\n;TIME:1234\n", "M82 ;absolute extrusion mode\nG28\nG92 E0\nG1 F1500 E-6.5\n;LAYER_COUNT:%d\n" % layer_count]
+    elapsed = 0.0
+    e = 0.0
+    for layer_number in range(layer_count):
+        lines = [";LAYER:%d" % layer_number, "M117 Layer %d" % layer_number]
+        for _ in range(generator.randint(0, 60)):
+            choice = generator.random()
+            if choice < 0.6:
+                e += generator.uniform(0, 2)
+                lines.append("G1 X%.3f Y%.3f E%.5f" % (generator.uniform(0, 200), generator.uniform(0, 200), e))
+            elif choice < 0.75:
+                lines.append("G0 F9000 X%.3f Y%.3f" % (generator.uniform(0, 200), generator.uniform(0, 200)))
+            elif choice < 0.8:
+                lines.append("G92 E0")
+                e = 0.0
+            elif choice < 0.85:
+                lines.extend(["M83", "G1 E-1.5", "G1 E1.5 ;unretract", "M82"])
+            elif choice < 0.9:
+                lines.append(";TYPE:WALL-OUTER")
+            else:
+                lines.append("M73 P%d" % generator.randint(0, 100))
+        elapsed += generator.uniform(0, 600)
+        if generator.random() < 0.9:  # Some layers have no time.
+            lines.append(";TIME_ELAPSED:%f" % elapsed)
+        data.append("\n".join(lines) + "\n")
+    data.append("M140 S0\nM107\nM82 ;absolute extrusion mode\nM104 S0\n;End of Gcode\n")
+    return data
+
+
+@pytest.mark.parametrize("settings", list(itertools.product([True, False], repeat = len(setting_keys))))
+def test_sameAsLegacy(settings):
+    for seed in range(3):
+        expected = createScript(LegacyEnrichPrintProgress, settings).execute(createGCode(seed))
+        result = createScript(EnrichPrintProgress, settings).execute(createGCode(seed))
+        assert result == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sameAsLegacyDefaultSettings(seed):
+    settings = [True, True, True, False, True, False, True]
+    expected = createScript(LegacyEnrichPrintProgress, settings).execute(createGCode(seed, layer_count = 40))
+    result = createScript(EnrichPrintProgress, settings).execute(createGCode(seed, layer_count = 40))
+    assert result == expected
+    assert any("M73 P" in layer for layer in result[2:])
+
+
+def test_emptyData():
+    settings = [True] * len(setting_keys)
+    assert createScript(EnrichPrintProgress, settings).execute([]) == []
@@ -0,0 +1,64 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+from ..scripts.MarlinObjectsMarking import MarlinObjectsMarking, ObjectsIndex
+
+gcode = [
+    ";FLAVOR:Marlin\n",
+    ";LAYER:0\n;TYPE:SKIRT\nG1 X1 E1\n;MESH:cube.stl\n;TYPE:WALL-OUTER\nG1 X2 E2\n;MESH:sphere.stl\nG1 X3 E3\n;TIME_ELAPSED:10\n",
+    ";LAYER:1\n;MESH:NONMESH\nG0 X0\n;MESH:sphere.stl\nG1 X4 E4\n;MESH:NONMESH\nG0 X1\n;MESH:cube.stl\nG1 X5 E5\n",
+    "M104 S0\n"
+]
+
+
+def test_buildIndex():
+    index = ObjectsIndex.build(gcode)
+
+    assert index.object_names == ["cube.stl", "sphere.stl"]
+    assert index.layer_markers == [[], [(1, -1), (3, 0), (6, 1)], [(1, -1), (3, 1), (5, -1), (7, 0)], []]
+
+
+def test_markObjects():
+    script = MarlinObjectsMarking()
+    result = script.execute(list(gcode))
+
+    assert result[0] == gcode[0]
+    assert result[1] == ";LAYER:0\n;TYPE:SKIRT\nM486 S-1\nG1 X1 E1\n;MESH:cube.stl\nM486 S0\n;TYPE:WALL-OUTER\nG1 X2 E2\n;MESH:sphere.stl\nM486 S1\nG1 X3 E3\n;TIME_ELAPSED:10\n"
+    # Every marker is marked, also when the same marker is in the layer twice.
+    assert result[2] == ";LAYER:1\n;MESH:NONMESH\nM486 S-1\nG0 X0\n;MESH:sphere.stl\nM486 S1\nG1 X4 E4\n;MESH:NONMESH\nM486 S-1\nG0 X1\n;MESH:cube.stl\nM486 S0\nG1 X5 E5\n"
+    assert result[3] == gcode[3]
+
+
+def test_objectRanges():
+    script = MarlinObjectsMarking()
+    result = script.execute(list(gcode))
+    written = "".join(result).encode("utf-8")
+    index = script.getObjectsIndex()
+
+    cube_parts = [written[start:end] for start, end in index.getObjectRanges("cube.stl")]
+    assert cube_parts == [b";MESH:cube.stl\nM486 S0\n;TYPE:WALL-OUTER\nG1 X2 E2\n", b";MESH:cube.stl\nM486 S0\nG1 X5 E5\n"]
+    sphere_parts = [written[start:end] for start, end in index.getObjectRanges("sphere.stl")]
+    assert sphere_parts == [b";MESH:sphere.stl\nM486 S1\nG1 X3 E3\n;TIME_ELAPSED:10\n", b";MESH:sphere.stl\nM486 S1\nG1 X4 E4\n"]
+    assert index.getObjectRanges("cylinder.stl") == []
+
+
+def test_objectRangesNonAscii():
+    script = MarlinObjectsMarking()
+    result = script.execute([";LAYER:0\n;MESH:würfel.stl\nG1 X1 E1\n", ";LAYER:1\n;MESH:würfel.stl\nG1 X2 E2"])
+    written = "".join(result).encode("utf-8")
+
+    parts = [written[start:end] for start, end in script.getObjectsIndex().getObjectRanges("würfel.stl")]
+    assert parts == [";MESH:würfel.stl\nM486 S0\nG1 X1 E1\n".encode("utf-8"), ";MESH:würfel.stl\nM486 S0\nG1 X2 E2".encode("utf-8")]
+
+
+def test_objectRangesRelativeToScriptOutput():
+    script = MarlinObjectsMarking()
+    result = script.execute(list(gcode))
+    start, end = script.getObjectsIndex().getObjectRanges("cube.stl")[0]
+    assert start == len(gcode[0]) + len(";LAYER:0\n;TYPE:SKIRT\nM486 S-1\nG1 X1 E1\n")
+
+    # The PostProcessingPlugin marks the g-code after all scripts ran, which moves everything after it.
+    result[0] += ";POSTPROCESSED\n"
+    written = "".join(result).encode("utf-8")
+    shift = len(";POSTPROCESSED\n")
+    assert written[start + shift:end + shift] == b";MESH:cube.stl\nM486 S0\n;TYPE:WALL-OUTER\nG1 X2 E2\n"
@@ -0,0 +1,82 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import pytest
+
+from ..ParsedGCode import GCodeLine, ParsedGCode
+from ..Script import Script
+
+
+@pytest.mark.parametrize("line, key", [
+    ("G1 X10 Y20.5 E-1", "X"),
+    ("G1 X10 Y20.5 E-1", "Y"),
+    ("G1 X10 Y20.5 E-1", "E"),
+    ("G1 X10 Y20.5 E-1", "Z"),
+    ("G0 F3000 X5 ;Z10", "Z"),
+    ("G1 Xabc", "X"),
+    ("M104 S210.", "S"),
+    ("G1X10Y5", "X"),
+    ("G1X10Y5", "Y"),
+    ("G1 X10X20", "X"),
+    ("M117 Layer 5", "L"),
+    (";LAYER:5", "L"),
+    ("", "G"),
+])
+def test_getValueLikeScript(line, key):
+    assert GCodeLine(line).getValue(key, "default") == Script.getValue(None, line, key, "default")
+
+
+def test_setValue():
+    line = GCodeLine("G1 X10 Y20 ;move")
+    line.setValue("X", 15)
+    line.setValue("E", 1.5)
+    line.removeParameter("Y")
+
+    assert line.getText() == "G1 X15 E1.5 ;move"
+    assert line.getValue("X") == 15
+
+
+def test_setValueWithoutSpaces():
+    line = GCodeLine("G1X10Y5")
+    assert line.getCommand() == "G1"
+
+    line.setValue("X", 15)
+
+    assert line.getText() == "G1 X15 Y5"
+
+
+def test_unchangedLinesKeepTheirText():
+    gcode = ParsedGCode([";FLAVOR:Marlin\n", ";LAYER:0\nG1  X10   Y10\n"])
+
+    assert gcode[1].lines[1].getValue("X") == 10
+    assert gcode.toList() == [";FLAVOR:Marlin\n", ";LAYER:0\nG1  X10   Y10\n"]
+
+
+def test_changeLines():
+    gcode = ParsedGCode([";LAYER:0\nG1 X10\n"])
+    gcode[0].insertLine(1, "M117 Layer 0")
+    gcode[0].lines[2].setValue("X", 20)
+    gcode[0].appendText("G4 P0\n")
+
+    assert gcode.toList() == [";LAYER:0\nM117 Layer 0\nG1 X20\nG4 P0\n"]
+
+
+class LegacyScript(Script):
+    def execute(self, data):
+        return [layer.replace("X10", "X11") for layer in data]
+
+
+class ParsedScript(Script):
+    def executeParsed(self, gcode):
+        for layer in gcode:
+            for line in layer.lines:
+                if line.getValue("G") == 1:
+                    line.setValue("F", 1200)
+        return gcode
+
+
+def test_legacyScriptAdapter():
+    gcode = ParsedScript().executeParsed(LegacyScript().executeParsed(ParsedGCode([";LAYER:0\nG1 X10\n"])))
+
+    assert gcode.toList() == [";LAYER:0\nG1 X11 F1200\n"]
+    assert ParsedScript().execute([";LAYER:0\nG1 X10\n"]) == [";LAYER:0\nG1 X10 F1200\n"]
@@ -0,0 +1,121 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import random
+import re
+
+import pytest
+
+from ..Script import Script
+
+
+class EmptyScript(Script):
+    def getSettingDataString(self):
+        return """{"name": "Empty", "key": "Empty", "metadata": {}, "version": 2, "settings": {}}"""
+
+    def execute(self, data):
+        return data
+
+
+def legacyGetValue(line, key, default = None):
+    """How Script.getValue() searched through the line for every parameter."""
+
+    if not key in line or (";" in line and line.find(key) > line.find(";")):
+        return default
+    sub_part = line[line.find(key) + 1:]
+    m = re.search(r"^-?[0-9]+\.?[0-9]*", sub_part)
+    if m is None:
+        return default
+    try:
+        return int(m.group(0))
+    except ValueError:
+        try:
+            return float(m.group(0))
+        except ValueError:
+            return default
+
+
+def legacyPutValue(line = "", **kwargs):
+    """How Script.putValue() built the line."""
+
+    if ";" in line:
+        comment = line[line.find(";"):]
+        line = line[:line.find(";")]
+    else:
+        comment = ""
+    for part in line.split(" "):
+        if part == "":
+            continue
+        parameter = part[0]
+        if parameter not in kwargs:
+            kwargs[parameter] = part[1:]
+    line_parts = list()
+    for parameter in ["G", "M", "T", "S", "F", "X", "Y", "Z", "E"]:
+        if parameter in kwargs:
+            line_parts.append(parameter + str(kwargs.pop(parameter)))
+    for parameter, value in kwargs.items():
+        line_parts.append(parameter + str(value))
+    if comment != "":
+        line_parts.append(comment)
+    return " ".join(line_parts)
+
+
+lines = [
+    "",
+    "G1 X100 Y-20.5 E1.",
+    "G0 F9000 X10.0 Y10 Z0.3 ;Move to start",
+    "M117 HELLO E5",
+    ";LAYER:0",
+    "G1X10Y20E-.5",
+    "M104 S200 T1 ; X10",
+    "G1 X10 X20",
+    "M486 S-1",
+    "G1  F1500   E-6.5;retract",
+    "T0",
+    "M73 P12.34"
+]
+
+
+@pytest.mark.parametrize("line", lines)
+def test_getValue(line):
+    script = EmptyScript()
+    for key in "GMTSFXYZEPHeL;.-1":
+        assert script.getValue(line, key) == legacyGetValue(line, key)
+        assert script.getValue(line, key, default = "none") == legacyGetValue(line, key, default = "none")
+
+
+def test_getValueRandomLines():
+    script = EmptyScript()
+    generator = random.Random(0)
+    for _ in range(2000):
+        line = "".join(generator.choice("GMXYZEFe0123456789.-; ") for _ in range(generator.randint(0, 20)))
+        for key in "GMXYZEFe;":
+            assert script.getValue(line, key) == legacyGetValue(line, key), line
+
+
+def test_getValues():
+    script = EmptyScript()
+
+    assert script.getValues("G1 X100 Y-20.5 E1.5 ;Z10") == {"G": 1, "X": 100, "Y": -20.5, "E": 1.5}
+    assert script.getValues("M117 HELLO E5") == {"M": 117}
+    assert script.getValues(";LAYER:0") == {}
+
+    values = script.getValues("G1 X10")
+    values["X"] = 20  # Changing the result doesn't change what is cached.
+    assert script.getValue("G1 X10", "X") == 10
+
+
+@pytest.mark.parametrize("line", lines)
+def test_putValue(line):
+    script = EmptyScript()
+
+    assert script.putValue(line) == legacyPutValue(line)
+    assert script.putValue(line, X = 5, M = 104) == legacyPutValue(line, X = 5, M = 104)
+    assert script.putValue(line, Q = 1, E = 2.5, G = 0) == legacyPutValue(line, Q = 1, E = 2.5, G = 0)
+
+
+def test_putValues():
+    script = EmptyScript()
+
+    assert script.putValues(lines, F = 1200, P = 2) == [legacyPutValue(line, F = 1200, P = 2) for line in lines]
+    assert script.putValues([]) == []
@@ -0,0 +1,117 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# The PostProcessingPlugin is released under the terms of the AGPLv3 or higher.
+
+import multiprocessing.spawn
+
+import pytest
+
+from ..ParsedGCode import ParsedGCode
+from ..Script import Script
+from ..ScriptExecutor import ScriptExecutor
+
+
+class ReplaceScript(Script):
+    """Layer-local script that replaces text in every layer."""
+
+    def __init__(self, old, new):
+        super().__init__()
+        self._old = old
+        self._new = new
+
+    def getSettingDataString(self):
+        return """{"name": "Replace", "key": "Replace", "metadata": {}, "version": 2, "settings": {}}"""
+
+    def isLayerLocal(self):
+        return True
+
+    def execute(self, data):
+        return [layer.replace(self._old, self._new) for layer in data]
+
+
+class NumberLayersScript(Script):
+    """Global script that counts the layers."""
+
+    def getSettingDataString(self):
+        return """{"name": "Number", "key": "Number", "metadata": {}, "version": 2, "settings": {}}"""
+
+    def execute(self, data):
+        return [layer + ";NUMBER:%d\n" % number for number, layer in enumerate(data)]
+
+
+class FailingScript(ReplaceScript):
+    def execute(self, data):
+        raise ValueError("Failing on purpose.")
+
+
+class FailingOnLayerScript(ReplaceScript):
+    """Layer-local script that fails when it gets a certain layer, and replaces text in the other layers."""
+
+    def execute(self, data):
+        if any(layer.startswith(";LAYER:30\n") for layer in data):
+            raise ValueError("Failing on purpose.")
+        return super().execute(data)
+
+
+def _scripts():
+    return [ReplaceScript("G1", "G0"), FailingScript("", ""), ReplaceScript("X", "Y"), NumberLayersScript(), ReplaceScript(";NUMBER:1", ";ONE")]
+
+
+def _gcode():
+    return ParsedGCode([";LAYER:%d\nG1 X%d\n" % (layer, layer) for layer in range(50)])
+
+
+def test_getStages():
+    stages = ScriptExecutor._getStages(_scripts(), split_layer_local = True)
+
+    assert [(layer_local, len(stage)) for layer_local, stage in stages] == [(True, 3), (False, 1), (True, 1)]
+    assert [(layer_local, len(stage)) for layer_local, stage in ScriptExecutor._getStages(_scripts(), split_layer_local = False)] == [(False, 1)] * 5
+
+
+def test_executeSequentially():
+    result = ScriptExecutor(worker_count = 0).execute(_scripts(), _gcode()).toList()
+
+    assert result[1] == ";LAYER:1\nG0 Y1\n;ONE\n"
+    assert result[49] == ";LAYER:49\nG0 Y49\n;NUMBER:49\n"
+
+
+@pytest.fixture
+def executor():
+    executor = ScriptExecutor(worker_count = 3)
+    yield executor
+    executor.shutdown()
+
+
+def test_executeInWorkers(executor):
+    expected = ScriptExecutor(worker_count = 0).execute(_scripts(), _gcode()).toList()
+
+    assert executor.execute(_scripts(), _gcode()).toList() == expected
+
+
+def test_failingInSomeWorkersChangesNothing(executor):
+    scripts = [ReplaceScript("G1", "G0"), FailingOnLayerScript("X", "Y"), ReplaceScript("G0", "G2")]
+
+    result = executor.execute(scripts, _gcode()).toList()
+
+    # The script failed on the whole g-code, so none of the layers got Y.
+    assert result == ScriptExecutor(worker_count = 0).execute(scripts, _gcode()).toList()
+    assert result[1] == ";LAYER:1\nG2 X1\n"
+
+
+def test_workersAreKept(executor):
+    executor.execute(_scripts(), _gcode())
+    pool = executor._pool
+    assert pool is not None
+
+    executor.execute([ReplaceScript("G1", "G0")], _gcode())
+    assert executor._pool is pool  # The workers already know all modules of these scripts.
+
+    executor.setWorkerCount(2)
+    assert executor._pool is None
+
+
+def test_workersDontRunMainModule():
+    with ScriptExecutor._emptyMainModule():
+        preparation_data = multiprocessing.spawn.get_preparation_data("worker")
+
+    assert "init_main_from_name" not in preparation_data
+    assert "init_main_from_path" not in preparation_data
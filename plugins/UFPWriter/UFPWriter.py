@@ -5,7 +5,6 @@ from typing import cast, List, Dict
 
 from Charon.VirtualFile import VirtualFile  # To open UFP files.
 from Charon.OpenMode import OpenMode  # To indicate that we want to write to UFP files.
-from io import StringIO  # For converting g-code to bytes.
 
 from UM.Logger import Logger
 from UM.Mesh.MeshWriter import MeshWriter  # The writer we need to implement.
@@ -17,6 +16,7 @@ from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Scene.SceneNode import SceneNode
 from cura.CuraApplication import CuraApplication
 from cura.Snapshot import Snapshot
+from cura.Utils.GzipStream import TextEncodingStream  # For converting g-code to bytes while it's written.
 from cura.Utils.Threading import call_on_qt_thread
 
 from UM.i18n import i18nCatalog
@@ -62,14 +62,13 @@ class UFPWriter(MeshWriter):
 
         # Store the g-code from the scene.
         archive.addContentType(extension = "gcode", mime_type = "text/x-gcode")
-        gcode_textio = StringIO()  # We have to convert the g-code into bytes.
+        gcode = archive.getStream("/3D/model.gcode")
+        # The g-code is written into the archive layer by layer, without keeping a copy of all of it.
         gcode_writer = cast(MeshWriter, PluginRegistry.getInstance().getPluginObject("GCodeWriter"))
-        success = gcode_writer.write(gcode_textio, None)
+        success = gcode_writer.write(TextEncodingStream(gcode), None)
         if not success:  # Writing the g-code failed. Then I can also not write the gzipped g-code.
             self.setInformation(gcode_writer.getInformation())
             return False
-        gcode = archive.getStream("/3D/model.gcode")
-        gcode.write(gcode_textio.getvalue().encode("UTF-8"))
         archive.addRelation(virtual_path = "/3D/model.gcode", relation_type = "http://schemas.ultimaker.org/package/2018/relationships/gcode")
 
         self._createSnapshot()
@@ -3,7 +3,7 @@
 import json
 from json import JSONDecodeError
 from time import time
-from typing import Callable, List, Type, TypeVar, Union, Optional, Tuple, Dict, Any, cast
+from typing import Callable, List, NamedTuple, Type, TypeVar, Union, Optional, Tuple, Dict, Any, cast
 
 from PyQt5.QtCore import QUrl
 from PyQt5.QtNetwork import QNetworkRequest, QNetworkReply
@@ -27,6 +27,9 @@ from ..Models.Http.CloudPrintResponse import CloudPrintResponse
 CloudApiClientModel = TypeVar("CloudApiClientModel", bound=BaseModel)
 """The generic type variable used to document the methods below."""
 
+CachedResponse = NamedTuple("CachedResponse", [("etag", Optional[str]), ("data", bytes), ("result", Any)])
+"""The last successful response of a URL that is polled, with the models that were parsed from it."""
+
 
 class CloudApiClient:
     """The cloud API client is responsible for handling the requests and responses from the cloud.
@@ -41,6 +44,9 @@ class CloudApiClient:
 
     DEFAULT_REQUEST_TIMEOUT = 10  # seconds
 
+    UPLOAD_CHUNK_SIZE_PREFERENCE_KEY = "um3networkprinting/cloud_upload_chunk_size"
+    UPLOAD_PARALLEL_REQUESTS_PREFERENCE_KEY = "um3networkprinting/cloud_upload_parallel_requests"
+
     # In order to avoid garbage collection we keep the callbacks in this list.
     _anti_gc_callbacks = []  # type: List[Callable[[Any], None]]
 
@@ -58,6 +64,12 @@ class CloudApiClient:
         self._http = HttpRequestManager.getInstance()
         self._on_error = on_error
         self._upload = None  # type: Optional[ToolPathUploader]
+        # The last responses of the URLs that are polled, to only parse them again if they changed.
+        self._cached_responses = {}  # type: Dict[str, CachedResponse]
+
+        preferences = app.getPreferences()
+        preferences.addPreference(self.UPLOAD_CHUNK_SIZE_PREFERENCE_KEY, ToolPathUploader.DEFAULT_CHUNK_SIZE)
+        preferences.addPreference(self.UPLOAD_PARALLEL_REQUESTS_PREFERENCE_KEY, ToolPathUploader.DEFAULT_PARALLEL_REQUESTS)
 
     @property
     def account(self) -> Account:
@@ -65,32 +77,47 @@ class CloudApiClient:
 
         return self._account
 
-    def getClusters(self, on_finished: Callable[[List[CloudClusterResponse]], Any], failed: Callable) -> None:
+    def getClusters(self, on_finished: Callable[[List[CloudClusterResponse]], Any], failed: Callable,
+                    on_not_modified: Optional[Callable[[], Any]] = None) -> None:
         """Retrieves all the clusters for the user that is currently logged in.
 
         :param on_finished: The function to be called after the result is parsed.
+        :param on_not_modified: The function to be called instead if the clusters didn't change since the last time
+            that they were retrieved. If not given, on_finished is called with the clusters of the last time.
         """
 
         url = "{}/clusters?status=active".format(self.CLUSTER_API_ROOT)
         self._http.get(url,
+                       headers_dict = self._getConditionalHeaders(url),
                        scope = self._scope,
-                       callback = self._parseCallback(on_finished, CloudClusterResponse, failed),
+                       callback = self._parseCallback(on_finished, CloudClusterResponse, failed,
+                                                      cache_url = url, on_not_modified = on_not_modified),
                        error_callback = failed,
                        timeout = self.DEFAULT_REQUEST_TIMEOUT)
 
-    def getClusterStatus(self, cluster_id: str, on_finished: Callable[[CloudClusterStatus], Any]) -> None:
+    def getClusterStatus(self, cluster_id: str, on_finished: Callable[[CloudClusterStatus], Any],
+                         on_not_modified: Optional[Callable[[], Any]] = None) -> None:
         """Retrieves the status of the given cluster.
 
         :param cluster_id: The ID of the cluster.
         :param on_finished: The function to be called after the result is parsed.
+        :param on_not_modified: The function to be called instead if the status didn't change since the last time
+            that it was retrieved. If not given, on_finished is called with the status of the last time.
         """
 
         url = "{}/clusters/{}/status".format(self.CLUSTER_API_ROOT, cluster_id)
         self._http.get(url,
+                       headers_dict = self._getConditionalHeaders(url),
                        scope = self._scope,
-                       callback = self._parseCallback(on_finished, CloudClusterStatus),
+                       callback = self._parseCallback(on_finished, CloudClusterStatus,
+                                                      cache_url = url, on_not_modified = on_not_modified),
                        timeout = self.DEFAULT_REQUEST_TIMEOUT)
 
+    def clearCachedResponses(self) -> None:
+        """Forget the responses of the polled URLs, so that the next responses are parsed again."""
+
+        self._cached_responses.clear()
+
     def requestUpload(self, request: CloudPrintJobUploadRequest,
                       on_finished: Callable[[CloudPrintJobResponse], Any]) -> None:
 
@@ -120,9 +147,19 @@ class CloudApiClient:
         :param on_error: A function to be called if the upload fails.
         """
 
-        self._upload = ToolPathUploader(self._http, print_job, mesh, on_finished, on_progress, on_error)
+        preferences = self._app.getPreferences()
+        self._upload = ToolPathUploader(self._http, print_job, mesh, on_finished, on_progress, on_error,
+                                        chunk_size = int(preferences.getValue(self.UPLOAD_CHUNK_SIZE_PREFERENCE_KEY)),
+                                        parallel_requests = int(preferences.getValue(self.UPLOAD_PARALLEL_REQUESTS_PREFERENCE_KEY)))
         self._upload.start()
 
+    def getUploadStatistics(self) -> Optional[Dict[str, Any]]:
+        """Gets the throughput and latency of the last tool path upload, or None if nothing was uploaded yet."""
+
+        if self._upload is None:
+            return None
+        return self._upload.getStatistics()
+
     # Requests a cluster to print the given print job.
     #  \param cluster_id: The ID of the cluster.
     #  \param job_id: The ID of the print job.
@@ -171,17 +208,28 @@ class CloudApiClient:
             request.setRawHeader(b"Authorization", "Bearer {}".format(access_token).encode())
         return request
 
+    def _getConditionalHeaders(self, url: str) -> Optional[Dict[str, str]]:
+        """Gets the headers to only receive the response of a URL again if it changed since the last response."""
+
+        cached_response = self._cached_responses.get(url)
+        if cached_response is None or cached_response.etag is None:
+            return None
+        return {"If-None-Match": cached_response.etag}
+
     @staticmethod
-    def _parseReply(reply: QNetworkReply) -> Tuple[int, Dict[str, Any]]:
+    def _parseReply(reply: QNetworkReply, data: Optional[bytes] = None) -> Tuple[int, Dict[str, Any]]:
         """Parses the given JSON network reply into a status code and a dictionary, handling unexpected errors as well.
 
         :param reply: The reply from the server.
+        :param data: The body of the reply, if it was read from the reply already.
         :return: A tuple with a status code and a dictionary.
         """
 
         status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
         try:
-            response = bytes(reply.readAll()).decode()
+            if data is None:
+                data = bytes(reply.readAll())
+            response = data.decode()
             return status_code, json.loads(response)
         except (UnicodeDecodeError, JSONDecodeError, ValueError) as err:
             error = CloudError(code=type(err).__name__, title=str(err), http_code=str(status_code),
@@ -190,12 +238,13 @@ class CloudApiClient:
             return status_code, {"errors": [error.toDict()]}
 
     def _parseModels(self, response: Dict[str, Any], on_finished: Union[Callable[[CloudApiClientModel], Any],
-                     Callable[[List[CloudApiClientModel]], Any]], model_class: Type[CloudApiClientModel]) -> None:
+                     Callable[[List[CloudApiClientModel]], Any]], model_class: Type[CloudApiClientModel]) -> Any:
         """Parses the given models and calls the correct callback depending on the result.
 
         :param response: The response from the server, after being converted to a dict.
         :param on_finished: The callback in case the response is successful.
         :param model_class: The type of the model to convert the response to. It may either be a single record or a list.
+        :return: The parsed model or list of models, or None if the response contained errors.
         """
 
         if "data" in response:
@@ -204,20 +253,25 @@ class CloudApiClient:
                 results = [model_class(**c) for c in data]  # type: List[CloudApiClientModel]
                 on_finished_list = cast(Callable[[List[CloudApiClientModel]], Any], on_finished)
                 on_finished_list(results)
+                return results
             else:
                 result = model_class(**data)  # type: CloudApiClientModel
                 on_finished_item = cast(Callable[[CloudApiClientModel], Any], on_finished)
                 on_finished_item(result)
+                return result
         elif "errors" in response:
             self._on_error([CloudError(**error) for error in response["errors"]])
         else:
             Logger.log("e", "Cannot find data or errors in the cloud response: %s", response)
+        return None
 
     def _parseCallback(self,
                        on_finished: Union[Callable[[CloudApiClientModel], Any],
                                           Callable[[List[CloudApiClientModel]], Any]],
                        model: Type[CloudApiClientModel],
-                       on_error: Optional[Callable] = None) -> Callable[[QNetworkReply], None]:
+                       on_error: Optional[Callable] = None,
+                       cache_url: Optional[str] = None,
+                       on_not_modified: Optional[Callable[[], Any]] = None) -> Callable[[QNetworkReply], None]:
 
         """Creates a callback function so that it includes the parsing of the response into the correct model.
 
@@ -226,6 +280,10 @@ class CloudApiClient:
         :param on_finished: The callback in case the response is successful. Depending on the endpoint it will be either
         a list or a single item.
         :param model: The type of the model to convert the response to.
+        :param cache_url: The URL that was requested, if it's polled. The response is then only parsed if it's
+        different from the last response of the URL, either according to its ETag or to its body.
+        :param on_not_modified: The callback in case the response is the same as the last one. If not given, the models
+        of the last response are passed to on_finished again.
         """
 
         def parse(reply: QNetworkReply) -> None:
@@ -238,11 +296,41 @@ class CloudApiClient:
                     on_error()
                 return
 
-            status_code, response = self._parseReply(reply)
+            if cache_url is None:
+                status_code, response = self._parseReply(reply)
+                if status_code >= 300 and on_error is not None:
+                    on_error()
+                else:
+                    self._parseModels(response, on_finished, model)
+                return
+
+            cached_response = self._cached_responses.get(cache_url)
+            status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+            data = b"" if status_code == 304 else bytes(reply.readAll())
+            etag = bytes(reply.rawHeader(b"ETag")).decode() or None
+            if cached_response is not None and (status_code == 304 or (status_code < 300 and data == cached_response.data)):
+                if etag is not None and etag != cached_response.etag:
+                    self._cached_responses[cache_url] = cached_response._replace(etag = etag)
+                if on_not_modified is not None:
+                    on_not_modified()
+                else:
+                    on_finished(cached_response.result)
+                return
+            if status_code == 304:
+                # The cached responses were cleared while this request was underway, so there is nothing to parse.
+                # The next request doesn't ask whether the response changed, and gets all of it again.
+                Logger.log("d", "Response of %s was not modified, but it's no longer cached.", cache_url)
+                if on_not_modified is not None:
+                    on_not_modified()
+                return
+
+            status_code, response = self._parseReply(reply, data)
             if status_code >= 300 and on_error is not None:
                 on_error()
-            else:
-                self._parseModels(response, on_finished, model)
+                return
+            result = self._parseModels(response, on_finished, model)
+            if status_code < 300 and result is not None:
+                self._cached_responses[cache_url] = CachedResponse(etag, data, result)
 
         self._anti_gc_callbacks.append(parse)
         return parse
@@ -3,7 +3,7 @@
 
 from time import time
 import os
-from typing import cast, List, Optional, TYPE_CHECKING
+from typing import cast, Any, Dict, List, Optional, TYPE_CHECKING
 
 from PyQt5.QtCore import QObject, QUrl, pyqtProperty, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QDesktopServices
@@ -50,6 +50,13 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
     # We can do this relatively often as this API call is quite fast.
     CHECK_CLUSTER_INTERVAL = 10.0  # seconds
 
+    # While a print job is active or being uploaded, the remote cluster is checked more often to show its progress.
+    ACTIVE_CHECK_CLUSTER_INTERVAL = 5.0  # seconds
+
+    # Every time that the status of the remote cluster didn't change, the interval is increased up to this maximum.
+    MAX_CHECK_CLUSTER_INTERVAL = 60.0  # seconds
+    CHECK_CLUSTER_INTERVAL_BACKOFF = 1.5
+
     # Override the network response timeout in seconds after which we consider the device offline.
     # For cloud this needs to be higher because the interval at which we check the status is higher as well.
     NETWORK_RESPONSE_CONSIDER_OFFLINE = 15.0  # seconds
@@ -106,6 +113,10 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
         self._tool_path = None  # type: Optional[bytes]
         self._uploaded_print_job = None  # type: Optional[CloudPrintJobResponse]
 
+        # The current interval with which the remote cluster is checked, which depends on how often its status changes.
+        self._check_cluster_interval = self.CHECK_CLUSTER_INTERVAL
+        self._default_timeout_time = self._timeout_time
+
     def connect(self) -> None:
         """Connects this device."""
 
@@ -157,13 +168,15 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
         """Called when the network data should be updated."""
 
         super()._update()
-        if time() - self._time_of_last_request < self.CHECK_CLUSTER_INTERVAL:
+        if time() - self._time_of_last_request < self._check_cluster_interval:
             return  # avoid calling the cloud too often
         self._time_of_last_request = time()
         if self._account.isLoggedIn:
             self.setAuthenticationState(AuthState.Authenticated)
             self._last_request_time = time()
-            self._api.getClusterStatus(self.key, self._onStatusCallFinished)
+            # The API client is shared with other devices, so it may have received the status before this device did.
+            on_not_modified = self._onStatusNotModified if self._received_printers is not None else None
+            self._api.getClusterStatus(self.key, self._onStatusCallFinished, on_not_modified)
         else:
             self.setAuthenticationState(AuthState.NotAuthenticated)
 
@@ -173,12 +186,41 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
         Contains both printers and print jobs statuses in a single response.
         """
         self._responseReceived()
+        changed = False
         if status.printers != self._received_printers:
             self._received_printers = status.printers
             self._updatePrinters(status.printers)
+            changed = True
         if status.print_jobs != self._received_print_jobs:
             self._received_print_jobs = status.print_jobs
             self._updatePrintJobs(status.print_jobs)
+            changed = True
+        self._updateCheckClusterInterval(changed = changed)
+
+    def _onStatusNotModified(self) -> None:
+        """Method called when the status of the cluster didn't change since the last time that it was received."""
+
+        self._responseReceived()
+        self._updateCheckClusterInterval(changed = False)
+
+    def _updateCheckClusterInterval(self, changed: bool) -> None:
+        """Adapts the interval with which the remote cluster is checked to how much is going on.
+
+        While a print job is active or being uploaded, the cluster is checked often. Otherwise the interval is increased
+        for every time that the status didn't change, and reset once it changes again.
+        :param changed: Whether the status changed since the last time that it was received.
+        """
+
+        if self.activePrintJobs or self._progress.visible:
+            self._check_cluster_interval = self.ACTIVE_CHECK_CLUSTER_INTERVAL
+        elif changed:
+            self._check_cluster_interval = self.CHECK_CLUSTER_INTERVAL
+        else:
+            self._check_cluster_interval = min(self._check_cluster_interval * self.CHECK_CLUSTER_INTERVAL_BACKOFF,
+                                               self.MAX_CHECK_CLUSTER_INTERVAL)
+        # Don't consider the cluster to be offline while we're simply not checking it.
+        self._timeout_time = max(self._default_timeout_time,
+                                 self._check_cluster_interval + self.NETWORK_RESPONSE_CONSIDER_OFFLINE)
 
     def requestWrite(self, nodes: List[SceneNode], file_name: Optional[str] = None, limit_mimetypes: bool = False,
                      file_handler: Optional[FileHandler] = None, filter_by_machine: bool = False, **kwargs) -> None:
@@ -227,6 +269,7 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
         if not self._tool_path:
             return self._onUploadError()
         self._progress.show()
+        self._updateCheckClusterInterval(changed = True)
         self._uploaded_print_job = job_response  # store the last uploaded job to prevent re-upload of the same file
         self._api.uploadToolPath(job_response, self._tool_path, self._onPrintJobUploaded, self._progress.update,
                                  self._onUploadError)
@@ -249,6 +292,7 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
 
         :param response: The response from the cloud API.
         """
+        self._updateCheckClusterInterval(changed = True)  # Show the new print job soon.
         self._progress.hide()
         PrintJobUploadSuccessMessage().show()
         self.writeFinished.emit()
@@ -267,6 +311,11 @@ class CloudOutputDevice(UltimakerNetworkedPrinterOutputDevice):
         self._uploaded_print_job = None
         self.writeError.emit()
 
+    def getUploadStatistics(self) -> Optional[Dict[str, Any]]:
+        """Gets the throughput and latency of the last print job upload, or None if no print job was uploaded yet."""
+
+        return self._api.getUploadStatistics()
+
     def _onUploadError(self, message: str = None) -> None:
         """
         Displays the given message if uploading the mesh has failed due to a generic error (i.e. lost connection).
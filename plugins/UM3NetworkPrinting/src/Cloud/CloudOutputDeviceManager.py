@@ -81,6 +81,7 @@ class CloudOutputDeviceManager:
             return
         self._running = False
         self._onGetRemoteClustersFinished([])  # Make sure we remove all cloud output devices.
+        self._api.clearCachedResponses()  # Add them again when starting, even if the clusters didn't change.
 
     def refreshConnections(self) -> None:
         """Force refreshing connections."""
@@ -103,7 +104,8 @@ class CloudOutputDeviceManager:
 
         self._syncing = True
         self._account.setSyncState(self.SYNC_SERVICE_NAME, SyncState.SYNCING)
-        self._api.getClusters(self._onGetRemoteClustersFinished, self._onGetRemoteClusterFailed)
+        self._api.getClusters(self._onGetRemoteClustersFinished, self._onGetRemoteClusterFailed,
+                              self._onGetRemoteClustersNotModified)
 
     def _onGetRemoteClustersFinished(self, clusters: List[CloudClusterResponse]) -> None:
         """Callback for when the request for getting the clusters is successful and finished."""
@@ -154,6 +156,12 @@ class CloudOutputDeviceManager:
         self._syncing = False
         self._account.setSyncState(self.SYNC_SERVICE_NAME, SyncState.SUCCESS)
 
+    def _onGetRemoteClustersNotModified(self) -> None:
+        """Callback for when the clusters didn't change since the last time, so there is nothing to update."""
+
+        self._syncing = False
+        self._account.setSyncState(self.SYNC_SERVICE_NAME, SyncState.SUCCESS)
+
     def _onGetRemoteClusterFailed(self, reply: QNetworkReply, error: QNetworkReply.NetworkError) -> None:
         self._syncing = False
         self._account.setSyncState(self.SYNC_SERVICE_NAME, SyncState.ERROR)
@@ -448,6 +456,7 @@ class CloudOutputDeviceManager:
             container_cluster_id = container.getMetaDataEntry(self.META_CLUSTER_ID, None)
             if container_cluster_id in self._remote_clusters.keys():
                 del self._remote_clusters[container_cluster_id]
+                self._api.clearCachedResponses()  # Discover the cluster again with the next sync.
 
     def _onRemovedPrintersMessageActionTriggered(self, removed_printers_message: Message, action: str) -> None:
         if action == "keep_printer_configurations_action":
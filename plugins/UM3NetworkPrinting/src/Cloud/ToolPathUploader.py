@@ -1,17 +1,30 @@
 # Copyright (c) 2019 Ultimaker B.V.
 # !/usr/bin/env python
 # -*- coding: utf-8 -*-
+from collections import deque
+import re
+from time import time
 from PyQt5.QtNetwork import QNetworkRequest, QNetworkReply
-from typing import Callable, Any, Tuple, cast, Dict, Optional
+from typing import Callable, Any, Deque, Tuple, cast, Dict, List, Optional
 
 from UM.Logger import Logger
 from UM.TaskManagement.HttpRequestManager import HttpRequestManager
 
 from ..Models.Http.CloudPrintJobResponse import CloudPrintJobResponse
 
+# The bytes that the server stored so far, as reported in the Range header of a "308 Resume Incomplete" response.
+_range_pattern = re.compile(r"bytes=0-(\d+)")
+
 
 class ToolPathUploader:
-    """Class responsible for uploading meshes to the cloud in separate requests."""
+    """Class responsible for uploading meshes to the cloud in separate requests.
+
+    Large meshes are uploaded in chunks, with a Content-Range header for each chunk. The server responds to every chunk
+    with a "308 Resume Incomplete" and the bytes that it stored so far, until it has received all of them. If a chunk
+    fails, the upload is resumed from the bytes that the server confirmed instead of starting over. Chunks can be
+    uploaded in several requests at the same time. If the server doesn't support ranges, the whole mesh is uploaded in
+    a single request instead.
+    """
 
 
     # The maximum amount of times to retry if the server returns one of the RETRY_HTTP_CODES
@@ -20,8 +33,18 @@ class ToolPathUploader:
     # The HTTP codes that should trigger a retry.
     RETRY_HTTP_CODES = {500, 502, 503, 504}
 
+    # The HTTP code with which the server confirms a chunk of an upload that isn't complete yet.
+    RESUME_INCOMPLETE_HTTP_CODE = 308
+
+    # The HTTP codes with which a server that doesn't support ranges may reject the first chunk.
+    RANGE_REJECTED_HTTP_CODES = {400, 411, 416}
+
+    DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # bytes
+    DEFAULT_PARALLEL_REQUESTS = 1
+
     def __init__(self, http: HttpRequestManager, print_job: CloudPrintJobResponse, data: bytes,
-                 on_finished: Callable[[], Any], on_progress: Callable[[int], Any], on_error: Callable[[], Any]
+                 on_finished: Callable[[], Any], on_progress: Callable[[int], Any], on_error: Callable[[], Any],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, parallel_requests: int = DEFAULT_PARALLEL_REQUESTS
                  ) -> None:
         """Creates a mesh upload object.
 
@@ -31,6 +54,9 @@ class ToolPathUploader:
         :param on_finished: The method to be called when done.
         :param on_progress: The method to be called when the progress changes (receives a percentage 0-100).
         :param on_error: The method to be called when an error occurs.
+        :param chunk_size: The number of bytes to upload per request. Meshes up to this size are uploaded at once.
+        :param parallel_requests: How many chunks may be uploaded at the same time. Only use more than one if the server
+            accepts chunks out of order. If it doesn't, the chunks that it dropped are uploaded again.
         """
 
         self._http = http
@@ -41,9 +67,23 @@ class ToolPathUploader:
         self._on_progress = on_progress
         self._on_error = on_error
 
+        self._chunk_size = max(1, chunk_size)
+        self._parallel_requests = max(1, parallel_requests)
+
         self._retries = 0
         self._finished = False
 
+        self._supports_ranges = None  # type: Optional[bool]  # Unknown until the server responded to the first chunk.
+        self._confirmed_bytes = 0  # The bytes at the start of the mesh that the server confirmed to have stored.
+        self._pending_chunks = deque()  # type: Deque[Tuple[int, int]]  # The start and end of each chunk to upload.
+        self._chunks_in_flight = {}  # type: Dict[int, Tuple[int, float, int]]  # The end, start time and bytes sent, per start.
+        self._acknowledged_chunks = []  # type: List[Tuple[int, int]]  # Chunks that the server responded to.
+        self._querying_status = False
+
+        self._start_time = 0.0
+        self._end_time = None  # type: Optional[float]
+        self._statistics = {}  # type: Dict[str, Any]
+
     @property
     def printJob(self):
         """Returns the print job for which this object was created."""
@@ -57,6 +97,25 @@ class ToolPathUploader:
             # reset state.
             self._retries = 0
             self._finished = False
+        self._supports_ranges = None
+        self._confirmed_bytes = 0
+        self._chunks_in_flight.clear()
+        self._acknowledged_chunks = []
+        self._querying_status = False
+        self._start_time = time()
+        self._end_time = None
+        self._statistics = {
+            "requests": 0,
+            "bytes_sent": 0,
+            "retries": 0,
+            "resumes": 0,
+            "latencies": []
+        }
+
+        self._pending_chunks = deque((start, min(start + self._chunk_size, len(self._data)))
+                                     for start in range(0, len(self._data), self._chunk_size))
+        if len(self._pending_chunks) <= 1:
+            self._supports_ranges = False  # Small enough to upload at once.
         self._upload()
 
     def stop(self):
@@ -64,8 +123,38 @@ class ToolPathUploader:
 
         Logger.log("i", "Finished uploading")
         self._finished = True  # Signal to any ongoing retries that we should stop retrying.
+        self._end_time = time()
+        Logger.log("d", "Cloud upload statistics: %s", self.getStatistics())
         self._on_finished()
 
+    def getConfirmedBytes(self) -> int:
+        """Get the number of bytes at the start of the mesh that the server confirmed to have stored."""
+
+        return self._confirmed_bytes
+
+    def getStatistics(self) -> Dict[str, Any]:
+        """Get statistics about the throughput and latency of the upload."""
+
+        end_time = self._end_time if self._end_time is not None else time()
+        duration = max(end_time - self._start_time, 0.0) if self._start_time else 0.0
+        latencies = self._statistics.get("latencies", [])
+        return {
+            "total_bytes": len(self._data),
+            "confirmed_bytes": self._confirmed_bytes,
+            "bytes_sent": self._statistics.get("bytes_sent", 0),
+            "requests": self._statistics.get("requests", 0),
+            "retries": self._statistics.get("retries", 0),
+            "resumes": self._statistics.get("resumes", 0),
+            "chunk_size": self._chunk_size,
+            "parallel_requests": self._parallel_requests,
+            "supports_ranges": self._supports_ranges,
+            "finished": self._finished,
+            "duration": duration,
+            "throughput": self._confirmed_bytes / duration if duration > 0 else 0.0,  # bytes per second
+            "mean_latency": sum(latencies) / len(latencies) if latencies else None,  # seconds per request
+            "max_latency": max(latencies) if latencies else None
+        }
+
     def _upload(self) -> None:
         """
         Uploads the print job to the cloud printer.
@@ -73,51 +162,135 @@ class ToolPathUploader:
         if self._finished:
             raise ValueError("The upload is already finished")
 
-        Logger.log("i", "Uploading print to {upload_url}".format(upload_url = self._print_job.upload_url))
+        if self._supports_ranges is False:
+            if not self._chunks_in_flight:
+                Logger.log("i", "Uploading print to {upload_url}".format(upload_url = self._print_job.upload_url))
+                self._uploadChunk(0, len(self._data), ranged = False)
+            return
+
+        # Only upload one chunk until we know that the server supports ranges.
+        max_requests = self._parallel_requests if self._supports_ranges else 1
+        while self._pending_chunks and len(self._chunks_in_flight) < max_requests and not self._querying_status:
+            start, end = self._pending_chunks.popleft()
+            if end <= self._confirmed_bytes:
+                continue  # The server already stored this chunk.
+            start = max(start, self._confirmed_bytes)
+            if start == 0:
+                Logger.log("i", "Uploading print to {upload_url}".format(upload_url = self._print_job.upload_url))
+            self._uploadChunk(start, end, ranged = True)
+
+        if not self._pending_chunks and not self._chunks_in_flight and not self._querying_status:
+            # Every chunk got a response, but the server doesn't have all of them. It may have dropped chunks that
+            # arrived out of order, so resume from what it confirmed.
+            self._retry("Server is missing bytes after {}".format(self._confirmed_bytes))
+
+    def _uploadChunk(self, start: int, end: int, ranged: bool) -> None:
+        """Uploads the bytes of the mesh from start until end.
+
+        :param ranged: Whether to tell the server which range the bytes are, or whether they're the whole mesh.
+        """
+
+        headers = {"Content-Type": cast(str, self._print_job.content_type)}
+        if ranged:
+            headers["Content-Range"] = "bytes {}-{}/{}".format(start, end - 1, len(self._data))
+        self._chunks_in_flight[start] = (end, time(), 0)
+        self._statistics["requests"] += 1
+        self._statistics["bytes_sent"] += end - start
         self._http.put(
             url = cast(str, self._print_job.upload_url),
-            headers_dict = {"Content-Type": cast(str, self._print_job.content_type)},
-            data = self._data,
-            callback = self._finishedCallback,
-            error_callback = self._errorCallback,
-            upload_progress_callback = self._progressCallback
+            headers_dict = headers,
+            data = self._data[start:end],
+            callback = lambda reply: self._finishedCallback(reply, start),
+            error_callback = lambda reply, error: self._errorCallback(reply, error, start),
+            upload_progress_callback = lambda bytes_sent, bytes_total: self._progressCallback(bytes_sent, bytes_total, start)
         )
 
-    def _progressCallback(self, bytes_sent: int, bytes_total: int) -> None:
+    def _queryStatus(self) -> None:
+        """Asks the server how many bytes it stored, so that an interrupted upload is resumed from there."""
+
+        self._querying_status = True
+        self._statistics["resumes"] += 1
+        self._statistics["requests"] += 1
+        self._http.put(
+            url = cast(str, self._print_job.upload_url),
+            headers_dict = {"Content-Range": "bytes */{}".format(len(self._data))},
+            data = b"",
+            callback = self._statusCallback,
+            error_callback = self._statusErrorCallback
+        )
+
+    def _progressCallback(self, bytes_sent: int, bytes_total: int, start: int = 0) -> None:
         """Handles an update to the upload progress
 
         :param bytes_sent: The amount of bytes sent in the current request.
         :param bytes_total: The amount of bytes to send in the current request.
+        :param start: The position in the mesh of the first byte of the current request.
         """
         Logger.debug("Cloud upload progress %s / %s", bytes_sent, bytes_total)
-        if bytes_total:
-            self._on_progress(int(bytes_sent / len(self._data) * 100))
+        if start in self._chunks_in_flight:
+            end, start_time, _ = self._chunks_in_flight[start]
+            self._chunks_in_flight[start] = (end, start_time, bytes_sent)
+        self._updateProgress()
+
+    def _updateProgress(self) -> None:
+        if not self._data:
+            return
+        acknowledged_bytes = sum(end - start for start, end in self._acknowledged_chunks if start >= self._confirmed_bytes)
+        bytes_in_flight = sum(bytes_sent for _, _, bytes_sent in self._chunks_in_flight.values())
+        uploaded_bytes = min(self._confirmed_bytes + acknowledged_bytes + bytes_in_flight, len(self._data))
+        self._on_progress(int(uploaded_bytes / len(self._data) * 100))
 
     ## Handles an error uploading.
-    def _errorCallback(self, reply: QNetworkReply, error: QNetworkReply.NetworkError) -> None:
+    def _errorCallback(self, reply: QNetworkReply, error: QNetworkReply.NetworkError, start: Optional[int] = None) -> None:
         """Handles an error uploading."""
 
+        if self._finished:
+            return
+        chunk = self._chunkReplied(start)
+        status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)  # type: Optional[int]
+        if chunk is not None and (not status_code or status_code in self.RETRY_HTTP_CODES):
+            # The connection was lost or the server had a temporary problem, so upload the chunk again.
+            self._pending_chunks.appendleft(chunk)
+            self._retry("Error {} while uploading bytes {}-{}".format(status_code or error, chunk[0], chunk[1]))
+            return
+        if chunk is not None and self._uploadWithoutRanges(status_code):
+            return
+
         body = bytes(reply.readAll()).decode()
         Logger.log("e", "Received error while uploading: %s", body)
         self.stop()
         self._on_error()
 
-    def _finishedCallback(self, reply: QNetworkReply) -> None:
+    def _finishedCallback(self, reply: QNetworkReply, start: Optional[int] = None) -> None:
         """Checks whether a chunk of data was uploaded successfully, starting the next chunk if needed."""
 
         Logger.log("i", "Finished callback %s %s",
                    reply.attribute(QNetworkRequest.HttpStatusCodeAttribute), reply.url().toString())
 
+        if self._finished:
+            return
+        if start not in self._chunks_in_flight:
+            return  # Already handled, e.g. because the upload was restarted.
+
         status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)  # type: Optional[int]
         if not status_code:
             Logger.log("e", "Reply contained no status code.")
-            self._errorCallback(reply, None)
+            self._errorCallback(reply, None, start)
             return
 
         # check if we should retry the last chunk
-        if self._retries < self.MAX_RETRIES and status_code in self.RETRY_HTTP_CODES:
-            self._retries += 1
-            Logger.log("i", "Retrying %s/%s request %s", self._retries, self.MAX_RETRIES, reply.url().toString())
+        if status_code in self.RETRY_HTTP_CODES:
+            self._errorCallback(reply, None, start)
+            return
+
+        chunk = self._chunkReplied(start)
+
+        if status_code == self.RESUME_INCOMPLETE_HTTP_CODE:
+            self._supports_ranges = True
+            if chunk is not None:
+                self._acknowledged_chunks.append(chunk)
+            self._updateConfirmedBytes(reply)
+            self._updateProgress()
             try:
                 self._upload()
             except ValueError:  # Asynchronously it could have completed in the meanwhile.
@@ -126,10 +299,107 @@ class ToolPathUploader:
 
         # Http codes that are not to be retried are assumed to be errors.
         if status_code > 308:
+            if chunk is not None and self._uploadWithoutRanges(status_code):
+                return
             self._errorCallback(reply, None)
             return
 
         Logger.log("d", "status_code: %s, Headers: %s, body: %s", status_code,
                    [bytes(header).decode() for header in reply.rawHeaderList()], bytes(reply.readAll()).decode())
 
+        if self._supports_ranges is None and chunk is not None and chunk[1] < len(self._data):
+            # The server took the first chunk for the whole mesh, so it doesn't support ranges.
+            Logger.log("w", "Cloud upload doesn't support ranges, uploading the whole print job at once.")
+            self._supports_ranges = False
+            self._upload()
+            return
+
+        self._confirmed_bytes = len(self._data)
+        self._on_progress(100)
         self.stop()
+
+    def _uploadWithoutRanges(self, status_code: Optional[int]) -> bool:
+        """Uploads the whole mesh at once if the server rejected the first chunk, because it doesn't support ranges.
+
+        :return: Whether the mesh is uploaded again.
+        """
+
+        if self._supports_ranges is not None or status_code not in self.RANGE_REJECTED_HTTP_CODES:
+            return False
+        Logger.log("w", "Cloud upload rejected the first chunk with %s, uploading the whole print job at once.", status_code)
+        self._supports_ranges = False
+        self._pending_chunks.clear()
+        self._upload()
+        return True
+
+    def _statusCallback(self, reply: QNetworkReply) -> None:
+        """Resumes the upload from the bytes that the server reported to have stored."""
+
+        self._querying_status = False
+        if self._finished:
+            return
+        status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)  # type: Optional[int]
+        if status_code is not None and 200 <= status_code < 300:
+            self._confirmed_bytes = len(self._data)  # The server had received everything already.
+            self._on_progress(100)
+            self.stop()
+            return
+        if status_code == self.RESUME_INCOMPLETE_HTTP_CODE:
+            self._updateConfirmedBytes(reply)
+            if not self._pending_chunks and not self._chunks_in_flight:
+                self._acknowledged_chunks = []  # The server dropped them, so they're uploaded again.
+                self._pending_chunks.extend((start, min(start + self._chunk_size, len(self._data)))
+                                            for start in range(self._confirmed_bytes, len(self._data), self._chunk_size))
+            Logger.log("i", "Resuming cloud upload from byte %s", self._confirmed_bytes)
+        self._upload()
+
+    def _statusErrorCallback(self, reply: QNetworkReply, error: QNetworkReply.NetworkError) -> None:
+        self._querying_status = False
+        if self._finished:
+            return
+        if self._retries >= self.MAX_RETRIES:
+            self._errorCallback(reply, error)
+            return
+        self._retry("Error {} while asking for the status of the upload".format(error))
+
+    def _retry(self, reason: str) -> None:
+        """Uploads the pending chunks again after a failure, resuming from the bytes that the server confirmed."""
+
+        if self._retries >= self.MAX_RETRIES:
+            Logger.log("e", "Giving up on the cloud upload after %s retries: %s", self._retries, reason)
+            self.stop()
+            self._on_error()
+            return
+
+        self._retries += 1
+        self._statistics["retries"] += 1
+        Logger.log("i", "Retrying %s/%s: %s", self._retries, self.MAX_RETRIES, reason)
+        if self._supports_ranges:
+            if not self._querying_status:
+                self._queryStatus()
+            return
+        if not self._pending_chunks and not self._chunks_in_flight:
+            self._pending_chunks.append((0, len(self._data)))
+        try:
+            self._upload()
+        except ValueError:  # Asynchronously it could have completed in the meanwhile.
+            pass
+
+    def _chunkReplied(self, start: Optional[int]) -> Optional[Tuple[int, int]]:
+        """Registers the response to the chunk that starts at the given position.
+
+        :return: The start and end of the chunk, or None if it wasn't in flight anymore.
+        """
+
+        if start not in self._chunks_in_flight:
+            return None
+        end, start_time, _ = self._chunks_in_flight.pop(start)
+        self._statistics["latencies"].append(time() - start_time)
+        return start, end
+
+    def _updateConfirmedBytes(self, reply: QNetworkReply) -> None:
+        """Updates the bytes that the server confirmed to have stored, from the Range header of its response."""
+
+        match = _range_pattern.match(bytes(reply.rawHeader(b"Range")).decode())
+        if match is not None:
+            self._confirmed_bytes = max(self._confirmed_bytes, int(match.group(1)) + 1)
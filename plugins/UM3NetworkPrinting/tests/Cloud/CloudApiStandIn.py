@@ -0,0 +1,313 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import http.client
+import json
+import re
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from PyQt5.QtNetwork import QNetworkReply, QNetworkRequest
+
+
+class StandInServer:
+    """A local HTTP server on a free port, running on a thread of its own."""
+
+    def __init__(self) -> None:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                stand_in._handleGet(self)
+
+            def do_PUT(self) -> None:
+                stand_in._handlePut(self)
+
+            def log_message(self, *args: Any) -> None:
+                pass  # Keep the output of the tests clean.
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target = self._server.serve_forever, kwargs = {"poll_interval": 0.05}, daemon = True)
+
+    def getUrl(self, path: str) -> str:
+        return "http://127.0.0.1:{}{}".format(self._server.server_address[1], path)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def _handleGet(self, handler: BaseHTTPRequestHandler) -> None:
+        handler.send_error(405)
+
+    def _handlePut(self, handler: BaseHTTPRequestHandler) -> None:
+        handler.send_error(405)
+
+
+class CloudApiStandIn(StandInServer):
+    """A local HTTP server that stands in for the cluster endpoints of the cloud API.
+
+    It serves the clusters of the account and the status of each cluster, with an ETag for every response. Requests with
+    the ETag of the current response in If-None-Match get a "304 Not Modified" without a body.
+    """
+
+    def __init__(self, use_etags: bool = True) -> None:
+        """Creates the stand-in, without starting it yet.
+
+        :param use_etags: Whether to send ETags, to test servers or proxies that don't.
+        """
+
+        super().__init__()
+        self.use_etags = use_etags
+        self.clusters = []  # type: List[Dict[str, Any]]
+        self.statuses = {}  # type: Dict[str, Dict[str, Any]]
+        self.requests = []  # type: List[Dict[str, Any]]  # The path, If-None-Match header and status code per request.
+
+    def getRootUrl(self) -> str:
+        """Get the URL to use as the cluster API root of the client."""
+
+        return self.getUrl("/connect/v1")
+
+    def _handleGet(self, handler: BaseHTTPRequestHandler) -> None:
+        path = handler.path.split("?")[0]
+        status_match = re.fullmatch(r"/connect/v1/clusters/([^/]+)/status", path)
+        if path == "/connect/v1/clusters":
+            data = self.clusters  # type: Any
+        elif status_match and status_match.group(1) in self.statuses:
+            data = self.statuses[status_match.group(1)]
+        else:
+            self._respond(handler, path, 404, json.dumps({"errors": [{"id": "1", "code": "notFound", "title": "Not found", "http_status": "404"}]}).encode())
+            return
+
+        body = json.dumps({"data": data}, sort_keys = True).encode()
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest()) if self.use_etags else None
+        if etag is not None and handler.headers.get("If-None-Match") == etag:
+            self._respond(handler, path, 304, b"", etag)
+        else:
+            self._respond(handler, path, 200, body, etag)
+
+    def _respond(self, handler: BaseHTTPRequestHandler, path: str, status_code: int, body: bytes, etag: Optional[str] = None) -> None:
+        self.requests.append({"path": path, "if_none_match": handler.headers.get("If-None-Match"), "status_code": status_code})
+        handler.send_response(status_code)
+        if etag is not None:
+            handler.send_header("ETag", etag)
+        if status_code != 304:
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+class UploadStandIn(StandInServer):
+    """A local HTTP server that stands in for the upload URL of a print job.
+
+    Like a resumable upload session, it accepts the print job in chunks with a Content-Range header. It responds with
+    "308 Resume Incomplete" and the bytes that it stored from the start on, until it has stored all of them. A PUT with
+    "Content-Range: bytes */<size>" and no body asks for the bytes that it stored.
+    """
+
+    def __init__(self, supports_ranges: bool = True, in_order_only: bool = False) -> None:
+        """Creates the stand-in, without starting it yet.
+
+        :param supports_ranges: Whether to accept chunks. If not, the body of every request is taken as the whole print
+            job, like a plain upload URL.
+        :param in_order_only: Whether to drop chunks that don't continue from the stored bytes, like servers that only
+            accept chunks in order.
+        """
+
+        super().__init__()
+        self.supports_ranges = supports_ranges
+        self.in_order_only = in_order_only
+        self.data = bytearray()
+        self.completed = False
+        # The responses to give instead of the normal ones, by the index of the request. Either a status code, or the
+        # number of bytes of the chunk to store before dropping the connection without a response.
+        self.failures = {}  # type: Dict[int, Union[int, Tuple[str, int]]]
+        self.requests = []  # type: List[Dict[str, Any]]  # The Content-Range header, size and status code per request.
+
+        self._lock = threading.Lock()
+        self._stored = bytearray()  # Whether each byte was stored.
+
+    def getUploadUrl(self) -> str:
+        return self.getUrl("/upload/print_job.ufp")
+
+    def getStoredBytes(self) -> int:
+        """Get the number of bytes that are stored from the start on, without gaps."""
+
+        position = self._stored.find(0)
+        return len(self._stored) if position < 0 else position
+
+    def _handlePut(self, handler: BaseHTTPRequestHandler) -> None:
+        body = handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        content_range = handler.headers.get("Content-Range")
+        with self._lock:
+            request = {"content_range": content_range, "size": len(body), "status_code": None}
+            failure = self.failures.pop(len(self.requests), None)
+            self.requests.append(request)
+
+            if isinstance(failure, int):
+                request["status_code"] = failure
+                self._respond(handler, failure)
+                return
+
+            if not self.supports_ranges or content_range is None:
+                self.data = bytearray(body)
+                self._stored = bytearray(b"\x01" * len(body))
+                self.completed = True
+                request["status_code"] = 200
+                self._respond(handler, 200)
+                return
+
+            match = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+)", content_range)
+            if match is None:
+                request["status_code"] = 400
+                self._respond(handler, 400)
+                return
+            total = int(match.group(3))
+            if len(self._stored) != total:
+                self.data = bytearray(total)
+                self._stored = bytearray(total)
+            if match.group(1) is not None:
+                if isinstance(failure, tuple):
+                    body = body[:failure[1]]  # Only part of the chunk arrived before the connection dropped.
+                self._store(int(match.group(1)), body)
+
+            if isinstance(failure, tuple):
+                handler.close_connection = True
+                return  # Drop the connection without a response.
+
+            stored_bytes = self.getStoredBytes()
+            if stored_bytes == total:
+                self.completed = True
+                request["status_code"] = 200
+                self._respond(handler, 200)
+            else:
+                request["status_code"] = 308
+                self._respond(handler, 308, {"Range": "bytes=0-{}".format(stored_bytes - 1)} if stored_bytes else {})
+
+    def _store(self, start: int, body: bytes) -> None:
+        if self.in_order_only and start > self.getStoredBytes():
+            return
+        self.data[start:start + len(body)] = body
+        self._stored[start:start + len(body)] = b"\x01" * len(body)
+
+    @staticmethod
+    def _respond(handler: BaseHTTPRequestHandler, status_code: int, headers: Optional[Dict[str, str]] = None) -> None:
+        handler.send_response(status_code)
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+
+
+class StandInReply:
+    """Just enough of a QNetworkReply for the callbacks of the API client."""
+
+    def __init__(self, url: str, status_code: Optional[int], headers: Dict[str, str], body: bytes) -> None:
+        self._url = url
+        self._status_code = status_code
+        self._headers = {key.lower(): value for key, value in headers.items()}
+        self._body = body
+        self.upload_size = 0  # The size of the body of the request, to report the progress of the upload.
+
+    def url(self) -> "StandInReply":
+        return self
+
+    def toString(self) -> str:  # Of the URL.
+        return self._url
+
+    def attribute(self, attribute: int) -> Any:
+        if attribute == QNetworkRequest.HttpStatusCodeAttribute:
+            return self._status_code
+        return None
+
+    def rawHeader(self, name: bytes) -> bytes:
+        return self._headers.get(name.decode().lower(), "").encode()
+
+    def rawHeaderList(self) -> List[bytes]:
+        return [key.encode() for key in self._headers]
+
+    def readAll(self) -> bytes:
+        body, self._body = self._body, b""
+        return body
+
+
+class StandInHttpRequestManager:
+    """Performs the requests of the API client without Qt, calling the callbacks like the HttpRequestManager does.
+
+    By default every request is performed right away. With deferred requests, they are queued until
+    processRequests() performs all of them at the same time, which is how several requests are in flight at once.
+    """
+
+    def __init__(self, defer_requests: bool = False) -> None:
+        self._defer_requests = defer_requests
+        self._queued_requests = []  # type: List[Tuple[urllib.request.Request, Dict[str, Any]]]
+
+    def get(self, url: str, headers_dict: Optional[Dict[str, str]] = None, **kwargs: Any) -> None:
+        self._request(urllib.request.Request(url, headers = headers_dict or {}), kwargs)
+
+    def put(self, url: str, headers_dict: Optional[Dict[str, str]] = None, data: Optional[bytes] = None, **kwargs: Any) -> None:
+        self._request(urllib.request.Request(url, data = data or b"", headers = headers_dict or {}, method = "PUT"), kwargs)
+
+    def processRequests(self, reverse: bool = False) -> None:
+        """Performs the queued requests, also the ones that the callbacks queue, until none are left.
+
+        :param reverse: Whether to call the callbacks of the requests that were queued together in reverse order, as if
+            the later requests finished first.
+        """
+
+        while self._queued_requests:
+            queued_requests, self._queued_requests = self._queued_requests, []
+            with ThreadPoolExecutor(max_workers = len(queued_requests)) as executor:
+                replies = list(executor.map(lambda queued: self._perform(queued[0], queued[1]), queued_requests))
+            finished = list(zip(replies, queued_requests))
+            for reply, (_, callbacks) in reversed(finished) if reverse else finished:
+                self._callBack(reply, callbacks)
+
+    def _request(self, request: urllib.request.Request, callbacks: Dict[str, Any]) -> None:
+        if self._defer_requests:
+            self._queued_requests.append((request, callbacks))
+        else:
+            self._callBack(self._perform(request, callbacks), callbacks)
+
+    @staticmethod
+    def _perform(request: urllib.request.Request, callbacks: Dict[str, Any]) -> StandInReply:
+        url = request.full_url
+        try:
+            with urllib.request.urlopen(request, timeout = callbacks.get("timeout") or 10) as response:
+                reply = StandInReply(url, response.status, dict(response.headers), response.read())
+        except urllib.error.HTTPError as error:  # Also "304 Not Modified" and "308 Resume Incomplete".
+            reply = StandInReply(url, error.code, dict(error.headers), error.read())
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError):
+            return StandInReply(url, None, {}, b"")  # The connection dropped.
+        reply.upload_size = len(request.data or b"")
+        return reply
+
+    @staticmethod
+    def _callBack(reply: StandInReply, callbacks: Dict[str, Any]) -> None:
+        if callbacks.get("upload_progress_callback") is not None and reply.upload_size:
+            callbacks["upload_progress_callback"](reply.upload_size, reply.upload_size)
+        status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        if status_code is None or status_code >= 400:
+            if callbacks.get("error_callback") is not None:
+                error = QNetworkReply.RemoteHostClosedError if status_code is None else QNetworkReply.UnknownServerError
+                callbacks["error_callback"](reply, error)
+        elif callbacks.get("callback") is not None:
+            callbacks["callback"](reply)
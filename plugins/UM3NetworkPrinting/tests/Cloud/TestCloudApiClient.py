@@ -0,0 +1,139 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ...src.Cloud import CloudApiClient as CloudApiClientModule
+from ...src.Cloud.CloudApiClient import CloudApiClient
+from .CloudApiStandIn import CloudApiStandIn, StandInHttpRequestManager
+
+CLUSTER = {
+    "cluster_id": "RIZ6cZbWA_Ua7RZVJhrdVfVpf0z-MqaSHQE4v8aRTtYq",
+    "host_guid": "e90ae0ac-1257-4403-91ee-a44c9b7e8050",
+    "host_name": "ultimakersystem-ccbdd30044ec",
+    "host_version": "5.1.2.20180807",
+    "is_online": True,
+    "status": "active"
+}
+
+
+def createStatus(print_job_count: int = 0):
+    return {
+        "generated_time": "2018-12-10T08:23:55.110Z",
+        "printers": [],
+        "print_jobs": [],
+        "queued_jobs": print_job_count
+    }
+
+
+@pytest.fixture
+def stand_in():
+    with CloudApiStandIn() as stand_in:
+        stand_in.clusters = [CLUSTER]
+        stand_in.statuses[CLUSTER["cluster_id"]] = createStatus()
+        yield stand_in
+
+
+def createClient(stand_in, http_request_manager = None):
+    http = MagicMock()
+    http.getInstance.return_value = http_request_manager or StandInHttpRequestManager()
+    with patch.object(CloudApiClientModule, "HttpRequestManager", http), \
+            patch.object(CloudApiClientModule, "UltimakerCloudScope"), \
+            patch.object(CloudApiClientModule, "JsonDecoratorScope"):
+        client = CloudApiClient(MagicMock(), on_error = MagicMock())
+    client.CLUSTER_API_ROOT = stand_in.getRootUrl()
+    return client
+
+
+def test_getClusterStatusNotModified(stand_in):
+    client = createClient(stand_in)
+    on_finished = MagicMock()
+    on_not_modified = MagicMock()
+
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+
+    assert on_finished.call_count == 1
+    assert on_not_modified.call_count == 1
+    assert [request["status_code"] for request in stand_in.requests] == [200, 304]
+    assert stand_in.requests[0]["if_none_match"] is None
+    assert stand_in.requests[1]["if_none_match"] is not None
+
+
+def test_getClusterStatusChanged(stand_in):
+    client = createClient(stand_in)
+    on_finished = MagicMock()
+    on_not_modified = MagicMock()
+
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    stand_in.statuses[CLUSTER["cluster_id"]] = createStatus(print_job_count = 1)
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+
+    assert on_finished.call_count == 2
+    assert on_not_modified.call_count == 0
+    assert [request["status_code"] for request in stand_in.requests] == [200, 200]
+
+
+def test_getClustersNotModifiedReusesResult(stand_in):
+    client = createClient(stand_in)
+    on_finished = MagicMock()
+
+    client.getClusters(on_finished, MagicMock())
+    client.getClusters(on_finished, MagicMock())
+
+    # Without a callback for unchanged clusters, the clusters of the first response are passed again.
+    assert on_finished.call_count == 2
+    first_result = on_finished.call_args_list[0][0][0]
+    assert on_finished.call_args_list[1][0][0] is first_result
+    assert first_result[0].cluster_id == CLUSTER["cluster_id"]
+    assert [request["status_code"] for request in stand_in.requests] == [200, 304]
+
+
+def test_getClusterStatusWithoutETag(stand_in):
+    stand_in.use_etags = False
+    client = createClient(stand_in)
+    on_finished = MagicMock()
+    on_not_modified = MagicMock()
+
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+
+    # The server sent the whole response again, but it's the same so it isn't parsed again.
+    assert on_finished.call_count == 1
+    assert on_not_modified.call_count == 1
+    assert [request["status_code"] for request in stand_in.requests] == [200, 200]
+    assert stand_in.requests[1]["if_none_match"] is None
+
+
+def test_clearCachedResponses(stand_in):
+    client = createClient(stand_in)
+    on_finished = MagicMock()
+    on_not_modified = MagicMock()
+
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    client.clearCachedResponses()
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+
+    assert on_finished.call_count == 2
+    assert stand_in.requests[1]["if_none_match"] is None
+
+
+def test_notModifiedAfterClearCachedResponses(stand_in):
+    http_request_manager = StandInHttpRequestManager(defer_requests = True)
+    client = createClient(stand_in, http_request_manager)
+    on_finished = MagicMock()
+    on_not_modified = MagicMock()
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    http_request_manager.processRequests()
+
+    # The cached response is cleared while the server responds that it's not modified.
+    client.getClusterStatus(CLUSTER["cluster_id"], on_finished, on_not_modified)
+    client.clearCachedResponses()
+    http_request_manager.processRequests()
+
+    assert [request["status_code"] for request in stand_in.requests] == [200, 304]
+    assert on_finished.call_count == 1
+    assert on_not_modified.call_count == 1
+    assert client._on_error.call_count == 0  # The empty body is not parsed as JSON.
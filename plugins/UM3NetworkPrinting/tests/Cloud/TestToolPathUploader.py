@@ -0,0 +1,147 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from ...src.Cloud.ToolPathUploader import ToolPathUploader
+from ...src.Models.Http.CloudPrintJobResponse import CloudPrintJobResponse
+from .CloudApiStandIn import StandInHttpRequestManager, UploadStandIn
+
+CHUNK_SIZE = 10000
+DATA = os.urandom(10 * CHUNK_SIZE + 123)
+
+
+def upload(stand_in, data = DATA, chunk_size = CHUNK_SIZE, parallel_requests = 1, reverse = False):
+    http = StandInHttpRequestManager(defer_requests = True)
+    print_job = CloudPrintJobResponse(job_id = "ABCDEFG", status = "wait_approval", upload_url = stand_in.getUploadUrl(),
+                                      content_type = "application/x-ufp")
+    on_finished = MagicMock()
+    on_progress = MagicMock()
+    on_error = MagicMock()
+    uploader = ToolPathUploader(http, print_job, data, on_finished, on_progress, on_error,
+                                chunk_size = chunk_size, parallel_requests = parallel_requests)
+    uploader.start()
+    http.processRequests(reverse = reverse)
+
+    assert on_finished.call_count == 1
+    return uploader, on_progress, on_error
+
+
+@pytest.fixture
+def stand_in():
+    with UploadStandIn() as stand_in:
+        yield stand_in
+
+
+def test_uploadInChunks(stand_in):
+    uploader, on_progress, on_error = upload(stand_in)
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert len(stand_in.requests) == 11
+    assert stand_in.requests[-1]["content_range"] == "bytes 100000-100122/100123"
+    assert on_progress.call_args[0][0] == 100
+    statistics = uploader.getStatistics()
+    assert statistics["confirmed_bytes"] == len(DATA)
+    assert statistics["bytes_sent"] == len(DATA)
+    assert statistics["retries"] == 0
+    assert statistics["mean_latency"] is not None
+
+
+def test_uploadSmallAtOnce(stand_in):
+    uploader, _, on_error = upload(stand_in, data = DATA[:CHUNK_SIZE])
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA[:CHUNK_SIZE]
+    assert stand_in.requests[0]["content_range"] is None
+
+
+def test_uploadWithoutRangeSupport():
+    with UploadStandIn(supports_ranges = False) as stand_in:
+        uploader, _, on_error = upload(stand_in)
+
+    # The server took the first chunk for the whole print job, so it's uploaded again at once.
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert [request["size"] for request in stand_in.requests] == [CHUNK_SIZE, len(DATA)]
+    assert uploader.getStatistics()["supports_ranges"] is False
+
+
+@pytest.mark.parametrize("status_code", [400, 411, 416])
+def test_uploadAtOnceWhenFirstChunkRejected(stand_in, status_code):
+    stand_in.failures[0] = status_code  # A server that doesn't support ranges may reject the Content-Range header.
+
+    uploader, _, on_error = upload(stand_in)
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert [request["content_range"] for request in stand_in.requests] == ["bytes 0-9999/100123", None]
+    assert uploader.getStatistics()["supports_ranges"] is False
+
+
+def test_resumeAfterDroppedConnection(stand_in):
+    stand_in.failures[3] = ("drop", 4000)  # The fourth chunk is cut off after 4000 bytes.
+
+    uploader, _, on_error = upload(stand_in)
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    # The server is asked which bytes it has, and the upload resumes from there instead of from the start of the chunk.
+    assert stand_in.requests[4]["content_range"] == "bytes */100123"
+    assert stand_in.requests[5]["content_range"] == "bytes 34000-39999/100123"
+    statistics = uploader.getStatistics()
+    assert statistics["retries"] == 1
+    assert statistics["resumes"] == 1
+    assert statistics["bytes_sent"] == len(DATA) + CHUNK_SIZE - 4000  # Only the bytes that didn't arrive are sent again.
+
+
+def test_retryServerError(stand_in):
+    stand_in.failures[5] = 503
+
+    uploader, _, on_error = upload(stand_in)
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert uploader.getStatistics()["retries"] == 1
+
+
+def test_giveUpAfterMaxRetries(stand_in):
+    for index in range(1, 2 * ToolPathUploader.MAX_RETRIES + 2):
+        stand_in.failures[index] = 503
+
+    uploader, _, on_error = upload(stand_in)
+
+    assert on_error.call_count == 1
+    assert not stand_in.completed
+    assert uploader.getStatistics()["retries"] == ToolPathUploader.MAX_RETRIES
+
+
+def test_errorIsNotRetried(stand_in):
+    stand_in.failures[2] = 403
+
+    uploader, _, on_error = upload(stand_in)
+
+    assert on_error.call_count == 1
+    assert len(stand_in.requests) == 3
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_uploadInParallel(stand_in, reverse):
+    uploader, _, on_error = upload(stand_in, parallel_requests = 4, reverse = reverse)
+
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert uploader.getStatistics()["bytes_sent"] == len(DATA)
+
+
+def test_uploadInParallelToServerThatNeedsOrder():
+    with UploadStandIn(in_order_only = True) as stand_in:
+        uploader, _, on_error = upload(stand_in, parallel_requests = 4, reverse = True)
+
+    # The chunks that the server dropped are uploaded again.
+    assert on_error.call_count == 0
+    assert bytes(stand_in.data) == DATA
+    assert uploader.getStatistics()["resumes"] >= 1
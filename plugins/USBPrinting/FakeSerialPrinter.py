@@ -0,0 +1,327 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import deque
+import os
+import queue
+import random
+import re
+import select
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+from .SerialFlowControl import calculateChecksum
+
+# A numbered line: "N<line number><command>*<checksum>".
+_numbered_line_pattern = re.compile(rb"^N(\d+)\s*(.*?)(?:\*(\d+))?$")
+_parameter_pattern = re.compile(rb"([A-Z])(-?\d+\.?\d*)")
+_code_pattern = re.compile(rb"^([A-Z]\d+)")
+_move_commands = {b"G0", b"G1", b"G2", b"G3", b"G5"}
+
+
+class FakeSerialPrinter:
+    """A printer that behaves like a Marlin firmware on the other side of a pseudo-terminal, to test and benchmark
+    printing over USB without a printer.
+
+    Like the firmware, it reads lines into a command buffer of a few slots, checks the line numbers and checksums of
+    numbered lines and asks to resend lines that were corrupted or lost. Commands are acknowledged with "ok" when they
+    are processed, which for moves means when there is room for them in the planner. The planner executes moves at a
+    fixed rate. Bytes that arrive while the receive buffer is full are lost, like on a real serial port.
+
+    Only available on systems with pseudo-terminals, i.e. not on Windows.
+    """
+
+    def __init__(self, buffer_size: int = 4, rx_buffer_size: int = 128, planner_size: int = 16,
+                 moves_per_second: float = 200.0, latency: float = 0.0, corruption_rate: float = 0.0,
+                 drop_rate: float = 0.0, advanced_ok: bool = False, temperature_report_interval: float = 0.0,
+                 seed: Optional[int] = None) -> None:
+        """Creates a fake printer. It starts responding once it's started.
+
+        :param buffer_size: The number of commands that the firmware can buffer before it processes them (BUFSIZE).
+        :param rx_buffer_size: The number of bytes that the serial port of the firmware can buffer (RX_BUFFER_SIZE).
+        :param planner_size: The number of moves that the planner can buffer (BLOCK_BUFFER_SIZE).
+        :param moves_per_second: How many moves the planner executes per second.
+        :param latency: The number of seconds that it takes for a response to arrive, on top of the processing.
+        :param corruption_rate: The fraction of the received lines in which a character gets corrupted, which makes
+            the checksum of numbered lines mismatch.
+        :param drop_rate: The fraction of the received lines that get lost, which makes the line number of the next
+            line mismatch.
+        :param advanced_ok: Whether to report the free planner and buffer slots in each "ok", like ADVANCED_OK.
+        :param temperature_report_interval: Every how many seconds to report temperatures without being asked, like
+            M155 does. 0 to only report temperatures after M105.
+        :param seed: The seed of the random errors, to make a run reproducible.
+        """
+
+        self._buffer_size = buffer_size
+        self._rx_buffer_size = rx_buffer_size
+        self._planner_size = planner_size
+        self._move_duration = 1.0 / moves_per_second
+        self._latency = latency
+        self._corruption_rate = corruption_rate
+        self._drop_rate = drop_rate
+        self._advanced_ok = advanced_ok
+        self._temperature_report_interval = temperature_report_interval
+        self._random = random.Random(seed)
+
+        self._master_fd = None  # type: Optional[int]
+        self._slave_fd = None  # type: Optional[int]
+        self._running = False
+        self._threads = []  # type: List[threading.Thread]
+
+        # Guards all state of the firmware, which is shared between the threads.
+        self._condition = threading.Condition()
+        self._rx_buffer = bytearray()
+        self._commands = deque()  # type: Deque[bytes]
+        self._planner = deque()  # type: Deque[bytes]
+        self._planner_ran_empty = False
+        self._last_line_number = 0
+        self._hotend_temperature = 20.0
+        self._bed_temperature = 20.0
+        self._responses = queue.Queue()  # type: queue.Queue  # Tuples of the time to send a response at, and the response.
+
+        self._statistics = {}  # type: Dict[str, int]
+        self.resetStatistics()
+
+    def start(self) -> None:
+        """Open the pseudo-terminal and start processing what is sent to it."""
+
+        import pty  # Not available on Windows.
+        import tty
+
+        self._master_fd, self._slave_fd = pty.openpty()
+        tty.setraw(self._slave_fd)  # Don't echo or translate anything.
+        self._running = True
+        for target, name in ((self._receive, "Receive"), (self._processCommands, "Commands"), (self._executeMoves, "Planner"), (self._respond, "Respond")):
+            thread = threading.Thread(target = target, daemon = True, name = "FakeSerialPrinter" + name)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop responding and close the pseudo-terminal."""
+
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd = None
+        self._slave_fd = None
+
+    def __enter__(self) -> "FakeSerialPrinter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def getPortName(self) -> str:
+        """The name of the device to connect to, like a serial port."""
+
+        if self._slave_fd is None:
+            raise ValueError("The fake printer isn't started.")
+        return os.ttyname(self._slave_fd)
+
+    def resetStatistics(self) -> None:
+        self._statistics = {
+            "lines_received": 0,
+            "bytes_lost": 0,
+            "lines_corrupted": 0,
+            "lines_dropped": 0,
+            "checksum_errors": 0,
+            "line_number_errors": 0,
+            "resends_requested": 0,
+            "commands_processed": 0,
+            "moves_executed": 0,
+            "planner_starved": 0
+        }
+
+    def getStatistics(self) -> Dict[str, Any]:
+        with self._condition:
+            return dict(self._statistics)
+
+    def isIdle(self) -> bool:
+        """Whether everything that was received is processed and executed."""
+
+        with self._condition:
+            return b"\n" not in self._rx_buffer and not self._commands and not self._planner
+
+    def _receive(self) -> None:
+        """Read from the pseudo-terminal into the receive buffer, losing what doesn't fit."""
+
+        while self._running:
+            readable, _, _ = select.select([self._master_fd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master_fd, 4096)
+            except OSError:  # The other side closed.
+                time.sleep(0.1)
+                continue
+            with self._condition:
+                room = self._rx_buffer_size - len(self._rx_buffer)
+                if len(data) > room:
+                    self._statistics["bytes_lost"] += len(data) - room
+                    data = data[:max(0, room)]
+                self._rx_buffer += data
+                self._condition.notify_all()
+
+    def _processCommands(self) -> None:
+        """Move received lines into the command buffer, and process the commands in it."""
+
+        with self._condition:
+            while self._running:
+                while len(self._commands) < self._buffer_size and b"\n" in self._rx_buffer:
+                    line_end = self._rx_buffer.index(b"\n")
+                    line = bytes(self._rx_buffer[:line_end]).strip()
+                    del self._rx_buffer[:line_end + 1]
+                    self._readLine(line)
+                self._condition.notify_all()  # There may be room in the receive buffer again.
+
+                if not self._commands or (self._isMove(self._commands[0]) and len(self._planner) >= self._planner_size):
+                    self._condition.wait(0.1)
+                    continue
+                self._processCommand(self._commands.popleft())
+
+    def _readLine(self, line: bytes) -> None:
+        """Check a line like the firmware does, and put its command into the command buffer if it's fine."""
+
+        if not line:
+            return
+        self._statistics["lines_received"] += 1
+        if self._drop_rate and self._random.random() < self._drop_rate:
+            self._statistics["lines_dropped"] += 1
+            return
+        if self._corruption_rate and self._random.random() < self._corruption_rate:
+            self._statistics["lines_corrupted"] += 1
+            position = self._random.randrange(len(line))
+            line = line[:position] + bytes((line[position] ^ 0x01, )) + line[position + 1:]
+
+        match = _numbered_line_pattern.match(line)
+        if match is None:
+            self._commands.append(line)
+            return
+        line_number = int(match.group(1))
+        command = match.group(2)
+        if command.startswith(b"M110"):
+            parameters = self._getParameters(command)
+            self._last_line_number = int(parameters.get(b"N", line_number)) - 1
+        if line_number != self._last_line_number + 1:
+            self._statistics["line_number_errors"] += 1
+            self._requestResend(b"Line Number is not Last Line Number+1")
+            return
+        if match.group(3) is None:
+            self._statistics["checksum_errors"] += 1
+            self._requestResend(b"No Checksum with line number")
+            return
+        if calculateChecksum(line[:line.rindex(b"*")]) != int(match.group(3)):
+            self._statistics["checksum_errors"] += 1
+            self._requestResend(b"checksum mismatch")
+            return
+        self._last_line_number = line_number
+        self._commands.append(command)
+
+    def _requestResend(self, error: bytes) -> None:
+        self._statistics["resends_requested"] += 1
+        self._sendResponse(b"Error:%s, Last Line: %d" % (error, self._last_line_number))
+        self._sendResponse(b"Resend: %d" % (self._last_line_number + 1))
+        self._sendOk()
+
+    def _processCommand(self, command: bytes) -> None:
+        self._statistics["commands_processed"] += 1
+        code = self._getCode(command)
+        if code in _move_commands:
+            if not self._planner and self._planner_ran_empty:
+                self._statistics["planner_starved"] += 1
+            self._planner_ran_empty = False
+            self._planner.append(command)
+            self._condition.notify_all()
+            self._sendOk()
+        elif code == b"M105":
+            self._sendOk(b" " + self._getTemperatureReport())
+        elif code in (b"M104", b"M109"):
+            self._hotend_temperature = float(self._getParameters(command).get(b"S", self._hotend_temperature))
+            self._sendOk()
+        elif code in (b"M140", b"M190"):
+            self._bed_temperature = float(self._getParameters(command).get(b"S", self._bed_temperature))
+            self._sendOk()
+        elif code == b"M155":
+            self._temperature_report_interval = float(self._getParameters(command).get(b"S", 0))
+            self._sendOk()
+        elif code == b"M115":
+            self._sendResponse(b"FIRMWARE_NAME:Marlin FakeSerialPrinter SOURCE_CODE_URL:https://github.com/MarlinFirmware/Marlin PROTOCOL_VERSION:1.0 MACHINE_TYPE:Fake EXTRUDER_COUNT:1")
+            self._sendOk()
+        else:
+            self._sendOk()
+
+    def _executeMoves(self) -> None:
+        """Execute the moves in the planner, one after another."""
+
+        while self._running:
+            with self._condition:
+                while self._running and not self._planner:
+                    self._condition.wait(0.1)
+            time.sleep(self._move_duration)
+            with self._condition:
+                if not self._planner:
+                    continue
+                self._planner.popleft()
+                self._statistics["moves_executed"] += 1
+                if not self._planner:
+                    # If more moves arrive, the printer had to stop and wait for them.
+                    self._planner_ran_empty = True
+                self._condition.notify_all()
+
+    def _respond(self) -> None:
+        """Write the responses to the pseudo-terminal once their latency has passed."""
+
+        next_temperature_report = time.time()
+        while self._running:
+            try:
+                send_time, response = self._responses.get(timeout = 0.05)
+            except queue.Empty:
+                response = None
+            if response is not None:
+                delay = send_time - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                self._write(response)
+            if self._temperature_report_interval > 0 and time.time() >= next_temperature_report:
+                next_temperature_report = time.time() + self._temperature_report_interval
+                with self._condition:
+                    report = self._getTemperatureReport()
+                self._write(b" " + report + b"\n")
+
+    def _write(self, data: bytes) -> None:
+        try:
+            os.write(self._master_fd, data)
+        except OSError:
+            pass  # Nobody is listening.
+
+    def _sendOk(self, suffix: bytes = b"") -> None:
+        if self._advanced_ok:
+            suffix = b" N%d P%d B%d" % (self._last_line_number, self._planner_size - len(self._planner), self._buffer_size - len(self._commands)) + suffix
+        self._sendResponse(b"ok" + suffix)
+
+    def _sendResponse(self, response: bytes) -> None:
+        self._responses.put((time.time() + self._latency, response + b"\n"))
+
+    def _getTemperatureReport(self) -> bytes:
+        return b"T:%.2f /%.2f B:%.2f /%.2f @:0 B@:0" % (self._hotend_temperature, self._hotend_temperature, self._bed_temperature, self._bed_temperature)
+
+    @staticmethod
+    def _getCode(command: bytes) -> bytes:
+        match = _code_pattern.match(command.upper())
+        return match.group(1) if match is not None else b""
+
+    @classmethod
+    def _isMove(cls, command: bytes) -> bool:
+        return cls._getCode(command) in _move_commands
+
+    @staticmethod
+    def _getParameters(command: bytes) -> Dict[bytes, bytes]:
+        return {letter: value for letter, value in _parameter_pattern.findall(command)}
@@ -0,0 +1,153 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import deque
+import functools
+import operator
+import re
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# The buffer reports of Marlin's ADVANCED_OK: "ok N<last line number> P<free planner slots> B<free command slots>".
+_advanced_ok_pattern = re.compile(rb"\bP(\d+) B(\d+)")
+
+
+def calculateChecksum(data: bytes) -> int:
+    """The checksum that the firmware verifies numbered lines with: the XOR of all bytes before the asterisk."""
+
+    return functools.reduce(operator.xor, data, 0)
+
+
+def formatNumberedLine(line_number: int, command: bytes, command_checksum: Optional[int] = None) -> bytes:
+    """Format a command as a numbered line with checksum, like "N12G1 X10*85".
+
+    :param command_checksum: The checksum of the command alone, if it's known already, e.g. when the line is resent. The
+        checksum of the line number is added to it.
+    """
+
+    prefix = b"N%d" % line_number
+    if command_checksum is None:
+        command_checksum = calculateChecksum(command)
+    return b"%s%s*%d\n" % (prefix, command, calculateChecksum(prefix) ^ command_checksum)
+
+
+class SerialFlowControl:
+    """Keeps track of the lines that were sent to the printer but not acknowledged with an "ok" yet.
+
+    Sending a line only after the previous one was acknowledged leaves the firmware's buffers empty during every round
+    trip, which starves the planner on prints with many short moves. Instead, lines are sent for as long as they fit in
+    the receive buffer of the firmware and the firmware has room for the commands. If the firmware reports how many
+    commands it has room for (ADVANCED_OK), that is used. Otherwise the configured number of lines is used.
+
+    Every line that the firmware receives is acknowledged with exactly one "ok", also lines that it asks to resend.
+    """
+
+    def __init__(self, max_lines_in_flight: int = 4, rx_buffer_size: int = 127) -> None:
+        """Creates the flow control of a serial connection.
+
+        :param max_lines_in_flight: How many lines may wait for an "ok" at the same time, at most.
+        :param rx_buffer_size: The size of the receive buffer of the firmware in bytes. Lines that wait for an "ok" may
+            not take more bytes than this, except for a single line that is longer.
+        """
+
+        self._max_lines_in_flight = max(1, max_lines_in_flight)
+        self._rx_buffer_size = rx_buffer_size
+
+        self._lines_in_flight = deque()  # type: Deque[Tuple[int, bool]]  # The size and whether it's numbered, per line.
+        self._bytes_in_flight = 0
+        self._firmware_buffer_size = None  # type: Optional[int]  # The most command slots that the firmware reported free.
+        self._planner_size = None  # type: Optional[int]  # The most planner slots that the firmware reported free.
+
+        self._last_resend_line = None  # type: Optional[int]
+        self._resends_to_ignore = 0
+
+        self._statistics = {}  # type: Dict[str, int]
+        self.resetStatistics()
+
+    def reset(self) -> None:
+        """Forget about the lines in flight, e.g. when their acknowledgements got lost."""
+
+        self._lines_in_flight.clear()
+        self._bytes_in_flight = 0
+        self._last_resend_line = None
+        self._resends_to_ignore = 0
+
+    def resetStatistics(self) -> None:
+        self._statistics = {
+            "lines_sent": 0,
+            "bytes_sent": 0,
+            "oks_received": 0,
+            "resends_requested": 0,
+            "resends_ignored": 0,
+            "planner_starved": 0,
+            "most_lines_in_flight": 0
+        }
+
+    def getStatistics(self) -> Dict[str, Any]:
+        statistics = dict(self._statistics)  # type: Dict[str, Any]
+        statistics["max_lines_in_flight"] = self.getMaxLinesInFlight()
+        statistics["firmware_buffer_size"] = self._firmware_buffer_size
+        return statistics
+
+    def getMaxLinesInFlight(self) -> int:
+        if self._firmware_buffer_size is not None:
+            return max(1, min(self._max_lines_in_flight, self._firmware_buffer_size))
+        return self._max_lines_in_flight
+
+    def getLinesInFlight(self) -> int:
+        return len(self._lines_in_flight)
+
+    def canSend(self, size: int) -> bool:
+        """Whether a line of a number of bytes can be sent now without overflowing the buffers of the firmware."""
+
+        if not self._lines_in_flight:
+            return True
+        if len(self._lines_in_flight) >= self.getMaxLinesInFlight():
+            return False
+        return self._bytes_in_flight + size <= self._rx_buffer_size
+
+    def lineSent(self, size: int, numbered: bool = True) -> None:
+        self._lines_in_flight.append((size, numbered))
+        self._bytes_in_flight += size
+        self._statistics["lines_sent"] += 1
+        self._statistics["bytes_sent"] += size
+        self._statistics["most_lines_in_flight"] = max(self._statistics["most_lines_in_flight"], len(self._lines_in_flight))
+
+    def okReceived(self, line: bytes) -> None:
+        """Register an "ok" of the firmware, which acknowledges the oldest line in flight.
+
+        :param line: The line with the "ok", which may contain the buffer reports of ADVANCED_OK.
+        """
+
+        self._statistics["oks_received"] += 1
+        if self._lines_in_flight:
+            size, _ = self._lines_in_flight.popleft()
+            self._bytes_in_flight -= size
+
+        match = _advanced_ok_pattern.search(line)
+        if match is None:
+            return
+        planner_free, buffer_free = int(match.group(1)), int(match.group(2))
+        self._firmware_buffer_size = max(self._firmware_buffer_size or 0, buffer_free)
+        self._planner_size = max(self._planner_size or 0, planner_free)
+        if planner_free == self._planner_size and self._lines_in_flight:
+            # The planner ran empty while we still had lines for it.
+            self._statistics["planner_starved"] += 1
+
+    def resendRequested(self, line_number: int) -> bool:
+        """Register a request of the firmware to resend from a line number on.
+
+        The firmware drops the lines that were sent after the faulty line, and asks to resend for each of them again.
+        These requests for the same line must be ignored, or the lines would be resent several times.
+
+        :return: Whether the lines must be resent from the line number on.
+        """
+
+        if line_number == self._last_resend_line and self._resends_to_ignore > 0:
+            self._resends_to_ignore -= 1
+            self._statistics["resends_ignored"] += 1
+            return False
+        self._last_resend_line = line_number
+        # The faulty line is the oldest numbered line in flight. All numbered lines after it get a request too.
+        self._resends_to_ignore = max(0, sum(1 for _, numbered in self._lines_in_flight if numbered) - 1)
+        self._statistics["resends_requested"] += 1
+        return True
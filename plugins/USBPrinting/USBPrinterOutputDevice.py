@@ -18,16 +18,17 @@ from cura.PrinterOutput.GenericOutputController import GenericOutputController
 
 from .AutoDetectBaudJob import AutoDetectBaudJob
 from .AvrFirmwareUpdater import AvrFirmwareUpdater
+from .SerialFlowControl import SerialFlowControl, calculateChecksum, formatNumberedLine
 
+from collections import deque
 from io import StringIO #To write the g-code output.
 from queue import Queue
 from serial import Serial, SerialException, SerialTimeoutException
-from threading import Thread, Event
+from threading import Thread, RLock
 from time import time
-from typing import Union, Optional, List, cast, TYPE_CHECKING
+from typing import Any, Deque, Dict, Union, Optional, List, Tuple, cast, TYPE_CHECKING
 
 import re
-import functools  # Used for reduce
 
 if TYPE_CHECKING:
     from UM.FileHandler.FileHandler import FileHandler
@@ -50,9 +51,14 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
 
         self._timeout = 3
 
-        # List of gcode lines to be printed
-        self._gcode = [] # type: List[str]
-        self._gcode_position = 0
+        # The g-code to be printed. Lines are read from it while they are sent.
+        self._gcode = "" # type: str
+        self._gcode_line_count = 0
+        self._gcode_read_offset = 0  # Where the next line that wasn't sent before starts in the g-code.
+        self._gcode_read_position = 0  # The number of the next line that wasn't sent before.
+        # The lines that were sent last, with the checksums of the commands, in case the printer asks to resend them.
+        self._sent_gcode = deque(maxlen = 1000)  # type: Deque[Tuple[bytes, int]]
+        self._gcode_position = 0  # The number of the next line to send.
 
         self._use_auto_detect = True
 
@@ -81,9 +87,12 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
 
         # Queue for commands that need to be sent.
         self._command_queue = Queue()   # type: Queue
-        # Event to indicate that an "ok" was received from the printer after sending a command.
-        self._command_received = Event()
-        self._command_received.set()
+        # Keeps track of the lines that the printer didn't acknowledge yet, to send as many as its buffers can hold.
+        preferences = CuraApplication.getInstance().getPreferences()
+        preferences.addPreference("usbprinting/max_lines_in_flight", 4)
+        preferences.addPreference("usbprinting/rx_buffer_size", 127)
+        self._flow_control = SerialFlowControl(int(preferences.getValue("usbprinting/max_lines_in_flight")), int(preferences.getValue("usbprinting/rx_buffer_size")))
+        self._send_lock = RLock()  # Lines are sent from the update thread as well as from the Qt thread.
 
         self._firmware_name_requested = False
         self._firmware_updater = AvrFirmwareUpdater(self)
@@ -155,22 +164,25 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
 
         :param gcode: The g-code to print.
         """
-        self._gcode.clear()
-        self._paused = False
-
-        self._gcode.extend(gcode.split("\n"))
-
-        # Reset line number. If this is not done, first line is sometimes ignored
-        self._gcode.insert(0, "M110")
-        self._gcode_position = 0
-        self._print_start_time = time()
-
-        self._print_estimated_time = int(CuraApplication.getInstance().getPrintInformation().currentPrintTime.getDisplayString(DurationFormat.Format.Seconds))
-
-        for i in range(0, 4):  # Push first 4 entries before accepting other inputs
-            self._sendNextGcodeLine()
-
-        self._is_printing = True
+        print_estimated_time = int(CuraApplication.getInstance().getPrintInformation().currentPrintTime.getDisplayString(DurationFormat.Format.Seconds))
+
+        # The update thread sends the next lines whenever an "ok" arrives, so don't let it see a half reset state.
+        with self._send_lock:
+            self._paused = False
+
+            # Reset line number. If this is not done, first line is sometimes ignored
+            self._gcode = "M110\n" + gcode
+            self._gcode_line_count = self._gcode.count("\n") + 1
+            self._gcode_read_offset = 0
+            self._gcode_read_position = 0
+            self._sent_gcode.clear()
+            self._gcode_position = 0
+            self._print_start_time = time()
+            self._print_estimated_time = print_estimated_time
+
+            self._flow_control.resetStatistics()
+            self._is_printing = True
+            self._sendNextGcodeLines()  # Fill the buffers of the printer before accepting other inputs.
         self.writeFinished.emit(self)
 
     def _autoDetectFinished(self, job: AutoDetectBaudJob):
@@ -230,12 +242,14 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
     def sendCommand(self, command: Union[str, bytes]):
         """Send a command to printer."""
 
-        if not self._command_received.is_set():
-            self._command_queue.put(command)
-        else:
-            self._sendCommand(command)
+        with self._send_lock:
+            # Wait for an "ok" like before, so that the commands don't keep the printer talking if a line got lost.
+            if not self._command_queue.empty() or self._flow_control.getLinesInFlight() > 0:
+                self._command_queue.put(command)
+            else:
+                self._sendCommand(command)
 
-    def _sendCommand(self, command: Union[str, bytes]):
+    def _sendCommand(self, command: Union[str, bytes], numbered: bool = False):
         if self._serial is None or self._connection_state != ConnectionState.Connected:
             return
 
@@ -243,15 +257,19 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
         if not new_command.endswith(b"\n"):
             new_command += b"\n"
         try:
-            self._command_received.clear()
             self._serial.write(new_command)
+            self._flow_control.lineSent(len(new_command), numbered)
         except SerialTimeoutException:
             Logger.log("w", "Timeout when sending command to printer via USB.")
-            self._command_received.set()
         except SerialException:
             Logger.logException("w", "An unexpected exception occurred while writing to the serial.")
             self.setConnectionState(ConnectionState.Error)
 
+    def getStreamingStatistics(self) -> Dict[str, Any]:
+        """Get how many lines were sent during the current or last print, and how often the printer had to wait."""
+
+        return self._flow_control.getStatistics()
+
     def _update(self):
         while self._connection_state == ConnectionState.Connected and self._serial is not None:
             try:
@@ -314,14 +332,19 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
             if line.startswith(b"ok") or self._firmware_idle_count > 1:
                 self._printer_busy = False
 
-                self._command_received.set()
-                if not self._command_queue.empty():
-                    self._sendCommand(self._command_queue.get())
-                elif self._is_printing:
-                    if self._paused:
-                        pass  # Nothing to do!
+                with self._send_lock:
+                    if line.startswith(b"ok"):
+                        self._flow_control.okReceived(line)
                     else:
-                        self._sendNextGcodeLine()
+                        # The acknowledgements of the lines in flight got lost, or they'll never come.
+                        self._flow_control.reset()
+                    while not self._command_queue.empty() and self._flow_control.canSend(len(self._command_queue.queue[0]) + 1):
+                        self._sendCommand(self._command_queue.get())
+                    if self._is_printing and self._command_queue.empty():
+                        if self._paused:
+                            pass  # Nothing to do!
+                        else:
+                            self._sendNextGcodeLines()
 
             if line.startswith(b"echo:busy:"):
                 self._printer_busy = True
@@ -333,11 +356,16 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
                 elif line.lower().startswith(b"resend") or line.startswith(b"rs"):
                     # A resend can be requested either by Resend, resend or rs.
                     try:
-                        self._gcode_position = int(line.replace(b"N:", b" ").replace(b"N", b" ").replace(b":", b" ").split()[-1])
+                        resend_position = int(line.replace(b"N:", b" ").replace(b"N", b" ").replace(b":", b" ").split()[-1])
                     except:
+                        resend_position = None
                         if line.startswith(b"rs"):
                             # In some cases of the RS command it needs to be handled differently.
-                            self._gcode_position = int(line.split()[1])
+                            resend_position = int(line.split()[1])
+                    if resend_position is not None:
+                        with self._send_lock:
+                            if self._flow_control.resendRequested(resend_position):
+                                self._gcode_position = resend_position
 
     def _setFirmwareName(self, name):
         new_name = re.findall(r"FIRMWARE_NAME:(.*);", str(name))
@@ -356,14 +384,21 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
 
     def resumePrint(self):
         self._paused = False
-        self._sendNextGcodeLine() #Send one line of g-code next so that we'll trigger an "ok" response loop even if we're not polling temperatures.
+        with self._send_lock:
+            self._sendNextGcodeLines() #Send g-code next so that we'll trigger an "ok" response loop even if we're not polling temperatures.
 
     def cancelPrint(self):
-        self._gcode_position = 0
-        self._gcode.clear()
+        # The update thread sends the next lines whenever an "ok" arrives, so stop it before the g-code is gone.
+        with self._send_lock:
+            self._is_printing = False
+            self._paused = False
+            self._gcode_position = 0
+            self._gcode = ""
+            self._gcode_line_count = 0
+            self._gcode_read_offset = 0
+            self._gcode_read_position = 0
+            self._sent_gcode.clear()
         self._printers[0].updateActivePrintJob(None)
-        self._is_printing = False
-        self._paused = False
 
         # Turn off temperatures, fan and steppers
         self._sendCommand("M140 S0")
@@ -375,6 +410,75 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
         self.printers[0].homeHead()
         self._sendCommand("M84")
 
+    def _sendNextGcodeLines(self):
+        """Send lines of g-code for as long as the buffers of the printer can hold them.
+
+        If nothing is waiting for an "ok", at least one line is sent, so that an "ok" response loop starts.
+        """
+        while self._is_printing and not self._paused and self._flow_control.canSend(self._getNextGcodeLineSize()):
+            self._sendNextGcodeLine()
+
+    def _getNextGcodeLineSize(self) -> int:
+        """The number of bytes of the next line, as an estimate of the size it will have once it's numbered."""
+
+        if self._gcode_position < self._gcode_read_position:
+            sent_command = self._getSentGcodeCommand(self._gcode_position)
+            if sent_command is None:
+                return 0  # Sending it fails, which is handled there.
+            return len(sent_command[0]) + 12
+        line_end = self._gcode.find("\n", self._gcode_read_offset)
+        if line_end < 0:
+            line_end = len(self._gcode)
+        return line_end - self._gcode_read_offset + 12  # The line number and checksum.
+
+    def _getGcodeCommand(self, position: int) -> Optional[Tuple[bytes, int]]:
+        """Get the command that is sent as the line with a number, with its checksum.
+
+        Lines are read from the g-code in order. Lines that were sent before are taken from the lines that were sent
+        last, since the printer can ask to send them again.
+
+        :return: The command and the checksum of the command, or None if the g-code has no such line.
+        """
+        if position < self._gcode_read_position:
+            sent_command = self._getSentGcodeCommand(position)
+            if sent_command is None:
+                Logger.log("e", "The printer asked to resend line %d, which was sent too long ago.", position)
+            return sent_command
+
+        while self._gcode_read_position <= position:
+            if self._gcode_read_position >= self._gcode_line_count:
+                return None
+            line_end = self._gcode.find("\n", self._gcode_read_offset)
+            if line_end < 0:
+                line_end = len(self._gcode)
+            line = self._gcode[self._gcode_read_offset:line_end]
+            self._gcode_read_offset = line_end + 1
+            self._gcode_read_position += 1
+
+            if ";" in line:
+                line = line[:line.find(";")]
+
+            line = line.strip()
+
+            # Don't send empty lines. But we do have to send something, so send M105 instead.
+            # Don't send the M0 or M1 to the machine, as M0 and M1 are handled as an LCD menu pause.
+            if line == "" or line == "M0" or line == "M1":
+                line = "M105"
+
+            command = line.encode()
+            self._sent_gcode.append((command, calculateChecksum(command)))
+        return self._sent_gcode[-1]
+
+    def _getSentGcodeCommand(self, position: int) -> Optional[Tuple[bytes, int]]:
+        """Get a command that was sent before from the history, with its checksum.
+
+        :return: The command and its checksum, or None if it was sent too long ago to still be in the history.
+        """
+        history_index = position - self._gcode_read_position
+        if -history_index > len(self._sent_gcode):
+            return None
+        return self._sent_gcode[history_index]
+
     def _sendNextGcodeLine(self):
         """
         Send the next line of g-code, at the current `_gcode_position`, via a
@@ -382,30 +486,17 @@ class USBPrinterOutputDevice(PrinterOutputDevice):
 
         If the print is done, this sets `_is_printing` to `False` as well.
         """
-        try:
-            line = self._gcode[self._gcode_position]
-        except IndexError:  # End of print, or print got cancelled.
+        command = self._getGcodeCommand(self._gcode_position)
+        if command is None:  # End of print, or print got cancelled.
             self._printers[0].updateActivePrintJob(None)
             self._is_printing = False
             return
 
-        if ";" in line:
-            line = line[:line.find(";")]
-
-        line = line.strip()
-
-        # Don't send empty lines. But we do have to send something, so send M105 instead.
-        # Don't send the M0 or M1 to the machine, as M0 and M1 are handled as an LCD menu pause.
-        if line == "" or line == "M0" or line == "M1":
-            line = "M105"
-
-        checksum = functools.reduce(lambda x, y: x ^ y, map(ord, "N%d%s" % (self._gcode_position, line)))
-
-        self._sendCommand("N%d%s*%d" % (self._gcode_position, line, checksum))
+        self._sendCommand(formatNumberedLine(self._gcode_position, command[0], command[1]), numbered = True)
 
         print_job = self._printers[0].activePrintJob
         try:
-            progress = self._gcode_position / len(self._gcode)
+            progress = self._gcode_position / self._gcode_line_count
         except ZeroDivisionError:
             # There is nothing to send!
             if print_job is not None:
@@ -0,0 +1,173 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import os
+import select
+import sys
+import time
+
+import pytest
+
+from ..FakeSerialPrinter import FakeSerialPrinter
+from ..SerialFlowControl import SerialFlowControl, formatNumberedLine
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason = "Pseudo-terminals are not available on Windows.")
+
+
+class Connection:
+    """The side of the serial port that Cura is on, with just enough to talk to the fake printer."""
+
+    def __init__(self, printer):
+        self._fd = os.open(printer.getPortName(), os.O_RDWR | os.O_NOCTTY)
+        self._received = b""
+
+    def close(self):
+        os.close(self._fd)
+
+    def write(self, data):
+        os.write(self._fd, data)
+
+    def readline(self, timeout = 2.0):
+        deadline = time.time() + timeout
+        while b"\n" not in self._received:
+            readable, _, _ = select.select([self._fd], [], [], max(0.0, deadline - time.time()))
+            if not readable:
+                return b""
+            self._received += os.read(self._fd, 4096)
+        line, self._received = self._received.split(b"\n", 1)
+        return line
+
+
+@pytest.fixture
+def connect():
+    printers = []
+    connections = []
+
+    def connect(**kwargs):
+        printer = FakeSerialPrinter(**kwargs)
+        printer.start()
+        printers.append(printer)
+        connection = Connection(printer)
+        connections.append(connection)
+        return printer, connection
+
+    yield connect
+    for connection in connections:
+        connection.close()
+    for printer in printers:
+        printer.stop()
+
+
+def test_ok(connect):
+    printer, connection = connect()
+
+    connection.write(formatNumberedLine(0, b"M110"))
+    assert connection.readline() == b"ok"
+    connection.write(formatNumberedLine(1, b"G1 X10 Y10"))
+    assert connection.readline() == b"ok"
+    connection.write(b"M115\n")
+    assert connection.readline().startswith(b"FIRMWARE_NAME:Marlin")
+    assert connection.readline() == b"ok"
+
+
+def test_temperatures(connect):
+    printer, connection = connect()
+
+    connection.write(b"M104 S210\nM140 S60\nM105\n")
+    assert connection.readline() == b"ok"
+    assert connection.readline() == b"ok"
+    assert connection.readline() == b"ok T:210.00 /210.00 B:60.00 /60.00 @:0 B@:0"
+
+    connection.write(b"M155 S0.1\n")
+    assert connection.readline() == b"ok"
+    assert connection.readline().startswith(b" T:210.00")
+
+
+def test_advancedOk(connect):
+    printer, connection = connect(advanced_ok = True, buffer_size = 4, planner_size = 8)
+
+    connection.write(formatNumberedLine(0, b"M110"))
+    assert connection.readline() == b"ok N0 P8 B4"
+    connection.write(formatNumberedLine(1, b"G1 X10"))
+    assert connection.readline() == b"ok N1 P7 B4"
+
+
+def test_checksumMismatch(connect):
+    printer, connection = connect()
+
+    connection.write(formatNumberedLine(0, b"M110"))
+    assert connection.readline() == b"ok"
+    connection.write(b"N1G1 X10*1\n")
+    assert connection.readline() == b"Error:checksum mismatch, Last Line: 0"
+    assert connection.readline() == b"Resend: 1"
+    assert connection.readline() == b"ok"
+
+    # The lines after the faulty line are rejected too, until it's resent.
+    connection.write(formatNumberedLine(2, b"G1 X20"))
+    assert connection.readline() == b"Error:Line Number is not Last Line Number+1, Last Line: 0"
+    assert connection.readline() == b"Resend: 1"
+    assert connection.readline() == b"ok"
+
+    connection.write(formatNumberedLine(1, b"G1 X10"))
+    assert connection.readline() == b"ok"
+    statistics = printer.getStatistics()
+    assert statistics["checksum_errors"] == 1
+    assert statistics["line_number_errors"] == 1
+    assert statistics["resends_requested"] == 2
+
+
+def test_latency(connect):
+    printer, connection = connect(latency = 0.2)
+
+    start = time.time()
+    connection.write(b"M105\n")
+    assert connection.readline().startswith(b"ok")
+    assert time.time() - start >= 0.2
+
+
+def test_plannerStarved(connect):
+    printer, connection = connect(moves_per_second = 100)
+
+    connection.write(b"G1 X10\n")
+    assert connection.readline() == b"ok"
+    time.sleep(0.1)  # The planner runs empty.
+    connection.write(b"G1 X20\n")
+    assert connection.readline() == b"ok"
+    assert printer.getStatistics()["planner_starved"] == 1
+
+
+@pytest.mark.parametrize("max_lines_in_flight, corruption_rate, drop_rate", [(1, 0.0, 0.0), (4, 0.0, 0.0), (4, 0.05, 0.0), (8, 0.02, 0.02)])
+def test_streaming(connect, max_lines_in_flight, corruption_rate, drop_rate):
+    """Stream lines like the USB printer output device does, and check that every line gets executed once."""
+
+    printer, connection = connect(moves_per_second = 5000, corruption_rate = corruption_rate, drop_rate = drop_rate, advanced_ok = True, seed = 1)
+    flow_control = SerialFlowControl(max_lines_in_flight = max_lines_in_flight)
+    commands = [b"M110"] + [b"G1 X%d Y%d E%.5f" % (i % 200, i % 150, i / 100) for i in range(500)]
+    commands += [b"M105"] * 3  # If the last move gets lost, the next line reveals it.
+
+    position = 0
+    while position < len(commands) or flow_control.getLinesInFlight():
+        while position < len(commands) and flow_control.canSend(len(commands[position]) + 12):
+            line = formatNumberedLine(position, commands[position])
+            connection.write(line)
+            flow_control.lineSent(len(line))
+            position += 1
+
+        response = connection.readline(timeout = 0.5)
+        if response == b"":  # The "ok" of a lost line never comes.
+            flow_control.reset()
+        elif response.startswith(b"ok"):
+            flow_control.okReceived(response)
+        elif response.startswith(b"Resend: "):
+            line_number = int(response.split()[-1])
+            if flow_control.resendRequested(line_number):
+                position = line_number
+
+    deadline = time.time() + 5
+    while not printer.isIdle() and time.time() < deadline:
+        time.sleep(0.01)
+    statistics = printer.getStatistics()
+    assert statistics["moves_executed"] == 500  # Line numbers are checked, so each line is executed once.
+    assert statistics["bytes_lost"] == 0
+    # Lines that get corrupted while they would be rejected anyway don't cause another resend.
+    assert flow_control.getStatistics()["resends_requested"] <= statistics["lines_corrupted"] + statistics["lines_dropped"]
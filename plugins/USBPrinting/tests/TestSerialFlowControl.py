@@ -0,0 +1,97 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import functools
+
+import pytest
+
+from ..SerialFlowControl import SerialFlowControl, calculateChecksum, formatNumberedLine
+
+
+def legacyChecksum(line):
+    """How the USB printer output device calculated the checksum of a line."""
+
+    return functools.reduce(lambda x, y: x ^ y, map(ord, line))
+
+
+@pytest.mark.parametrize("line_number, command", [(0, "M110"), (12, "G1 X10 Y20.5 E0.12345"), (123456, "M105"), (7, "")])
+def test_formatNumberedLine(line_number, command):
+    prefix = "N%d%s" % (line_number, command)
+    expected = ("%s*%d\n" % (prefix, legacyChecksum(prefix))).encode()
+
+    assert formatNumberedLine(line_number, command.encode()) == expected
+    assert formatNumberedLine(line_number, command.encode(), calculateChecksum(command.encode())) == expected
+
+
+def test_canSendLimitsLines():
+    flow_control = SerialFlowControl(max_lines_in_flight = 3, rx_buffer_size = 1000)
+    for _ in range(3):
+        assert flow_control.canSend(10)
+        flow_control.lineSent(10)
+    assert not flow_control.canSend(10)
+
+    flow_control.okReceived(b"ok")
+    assert flow_control.getLinesInFlight() == 2
+    assert flow_control.canSend(10)
+
+
+def test_canSendLimitsBytes():
+    flow_control = SerialFlowControl(max_lines_in_flight = 10, rx_buffer_size = 64)
+    flow_control.lineSent(40)
+    assert flow_control.canSend(24)
+    assert not flow_control.canSend(25)
+
+    flow_control.okReceived(b"ok")
+    assert flow_control.canSend(200)  # A long line can always be sent on its own.
+
+
+def test_advancedOk():
+    flow_control = SerialFlowControl(max_lines_in_flight = 8)
+    flow_control.lineSent(10)
+    flow_control.okReceived(b"ok N1 P15 B3")
+    assert flow_control.getMaxLinesInFlight() == 3  # The firmware has less room than configured.
+
+    for _ in range(3):
+        flow_control.lineSent(10)
+    assert not flow_control.canSend(10)
+
+    flow_control.okReceived(b"ok N2 P15 B1")  # Still lines in flight while the planner is empty.
+    flow_control.okReceived(b"ok N3 P10 B2")
+    statistics = flow_control.getStatistics()
+    assert statistics["planner_starved"] == 1
+    assert statistics["firmware_buffer_size"] == 3
+    assert statistics["lines_sent"] == 4
+    assert statistics["oks_received"] == 3
+    assert statistics["most_lines_in_flight"] == 3
+
+
+def test_resendRequested():
+    flow_control = SerialFlowControl(max_lines_in_flight = 4)
+    for _ in range(4):
+        flow_control.lineSent(20)
+
+    # The firmware drops the lines after the faulty one and asks for the faulty line for every one of them.
+    assert flow_control.resendRequested(5)
+    for _ in range(4):
+        flow_control.okReceived(b"ok")
+    assert not flow_control.resendRequested(5)
+    assert not flow_control.resendRequested(5)
+    assert not flow_control.resendRequested(5)
+
+    # The line failed again after it was resent.
+    flow_control.lineSent(20)
+    assert flow_control.resendRequested(5)
+
+    statistics = flow_control.getStatistics()
+    assert statistics["resends_requested"] == 2
+    assert statistics["resends_ignored"] == 3
+
+
+def test_resendIgnoresUnnumberedLines():
+    flow_control = SerialFlowControl(max_lines_in_flight = 4)
+    flow_control.lineSent(20)
+    flow_control.lineSent(5, numbered = False)
+
+    assert flow_control.resendRequested(3)
+    flow_control.lineSent(20)
+    assert flow_control.resendRequested(3)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+"""Measures how fast the USB printer output device streams g-code to a fake printer on a pseudo-terminal.
+
+For each number of lines in flight, a print is streamed to a FakeSerialPrinter and the number of lines per second is
+reported, together with how often the planner of the printer ran empty and how many lines had to be resent. With a
+planner that is never starved, the lines per second equal the moves per second of the printer.
+
+Run it from the root of the Cura repository, with Uranium on the Python path:
+
+    python3 scripts/benchmark_usb_printing.py --lines 5000 --latency 0.002 --corruption-rate 0.001
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def create_gcode(line_count: int) -> str:
+    """Create g-code of short moves, which is the hardest to stream fast enough."""
+
+    lines = [";FLAVOR:Marlin", "M104 S200", "M140 S60", "G28"]
+    for i in range(line_count):
+        lines.append("G1 X{x:.3f} Y{y:.3f} E{e:.5f}".format(x = 100 + (i % 50) * 0.2, y = 100 + (i % 70) * 0.15, e = i * 0.01))
+    return "\n".join(lines) + "\n"
+
+
+def create_application(preferences: Dict[str, Any]) -> MagicMock:
+    """Create just enough of the application for the output device to run without Cura."""
+
+    application = MagicMock()
+    application.getPreferences().getValue.side_effect = lambda key: preferences[key]
+    application.getGlobalContainerStack().getProperty.return_value = 1
+    application.getGlobalContainerStack().getName.return_value = "Fake printer"
+    application.getPrintInformation().currentPrintTime.getDisplayString.return_value = "0"
+    return application
+
+
+def benchmark(args: argparse.Namespace, max_lines_in_flight: int) -> Dict[str, Any]:
+    from USBPrinting.FakeSerialPrinter import FakeSerialPrinter
+
+    printer = FakeSerialPrinter(buffer_size = args.buffer_size, rx_buffer_size = args.rx_buffer_size,
+                                planner_size = args.planner_size, moves_per_second = args.moves_per_second,
+                                latency = args.latency, corruption_rate = args.corruption_rate,
+                                drop_rate = args.drop_rate, advanced_ok = args.advanced_ok, seed = 0)
+    application = create_application({
+        "usbprinting/max_lines_in_flight": max_lines_in_flight,
+        "usbprinting/rx_buffer_size": args.rx_buffer_size
+    })
+    with printer, \
+            patch("UM.Application.Application.getInstance", MagicMock(return_value = application)), \
+            patch("cura.CuraApplication.CuraApplication.getInstance", MagicMock(return_value = application)), \
+            patch("UM.PluginRegistry.PluginRegistry.getInstance"):
+        from USBPrinting.USBPrinterOutputDevice import USBPrinterOutputDevice
+
+        device = USBPrinterOutputDevice(printer.getPortName(), 115200)
+        device.connect()
+        time.sleep(0.5)  # Let the device ask for the firmware name and temperatures first.
+        printer.resetStatistics()
+
+        start_time = time.time()
+        device._printGCode(create_gcode(args.lines))
+        while device._is_printing or not printer.isIdle():
+            time.sleep(0.01)
+        duration = time.time() - start_time
+        device.close()
+
+    printer_statistics = printer.getStatistics()
+    device_statistics = device.getStreamingStatistics()
+    return {
+        "max_lines_in_flight": max_lines_in_flight,
+        "lines_per_second": printer_statistics["moves_executed"] / duration,
+        "planner_starved": printer_statistics["planner_starved"],
+        "resends": device_statistics["resends_requested"],
+        "resends_ignored": device_statistics["resends_ignored"],
+        "most_lines_in_flight": device_statistics["most_lines_in_flight"],
+        "bytes_lost": printer_statistics["bytes_lost"]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Measure the throughput of printing over USB against a fake printer.")
+    parser.add_argument("--lines", type = int, default = 5000, help = "The number of moves to print.")
+    parser.add_argument("--max-lines-in-flight", type = int, nargs = "+", default = [1, 2, 4, 8], help = "The numbers of lines in flight to compare.")
+    parser.add_argument("--buffer-size", type = int, default = 4, help = "The number of commands that the firmware buffers.")
+    parser.add_argument("--rx-buffer-size", type = int, default = 128, help = "The number of bytes that the serial port of the firmware buffers.")
+    parser.add_argument("--planner-size", type = int, default = 16, help = "The number of moves that the planner buffers.")
+    parser.add_argument("--moves-per-second", type = float, default = 500.0, help = "How fast the printer executes moves.")
+    parser.add_argument("--latency", type = float, default = 0.002, help = "The delay of the responses of the printer, in seconds.")
+    parser.add_argument("--corruption-rate", type = float, default = 0.0, help = "The fraction of lines with a checksum error.")
+    parser.add_argument("--drop-rate", type = float, default = 0.0, help = "The fraction of lines that get lost.")
+    parser.add_argument("--advanced-ok", action = "store_true", help = "Report the free buffer slots in each \"ok\".")
+    args = parser.parse_args()
+
+    results = []  # type: List[Dict[str, Any]]
+    for max_lines_in_flight in args.max_lines_in_flight:
+        results.append(benchmark(args, max_lines_in_flight))
+
+    columns = ["max_lines_in_flight", "lines_per_second", "planner_starved", "resends", "resends_ignored", "most_lines_in_flight", "bytes_lost"]
+    print(" ".join("{:>20}".format(column) for column in columns))
+    for result in results:
+        print(" ".join("{:>20.1f}".format(result[column]) if isinstance(result[column], float) else "{:>20}".format(result[column]) for column in columns))
+
+
+if __name__ == "__main__":
+    main()
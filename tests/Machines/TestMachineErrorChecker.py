@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from UM.Settings.SettingRelation import RelationType
+
+from cura.Machines.MachineErrorChecker import MachineErrorChecker, ValidateSettingsJob
+
+
+@pytest.fixture
+def machine_error_checker(application):
+    with patch("cura.CuraApplication.CuraApplication.getInstance", MagicMock(return_value = application)):
+        return MachineErrorChecker()
+
+
+def test_waitForResult(machine_error_checker):
+    assert machine_error_checker.waitForResult(timeout = 0)  # Nothing to wait for yet.
+
+    machine_error_checker.startErrorCheck()
+    assert not machine_error_checker.waitForResult(timeout = 0)
+
+    machine_error_checker._setResult(False)
+    assert machine_error_checker.waitForResult(timeout = 0)
+
+
+def test_stackHasErrorsIsCached(machine_error_checker):
+    stack = MagicMock()
+    stack.getId = MagicMock(return_value = "per_object_stack")
+    machine_error_checker._findStackErrors = MagicMock(return_value = True)
+
+    assert machine_error_checker.stackHasErrors(stack)
+    assert machine_error_checker.stackHasErrors(stack)
+    assert machine_error_checker._findStackErrors.call_count == 1
+
+    # When a setting of the stack changes, it needs to be checked again.
+    on_stack_changed = stack.propertyChanged.connect.call_args[0][0]
+    on_stack_changed("infill_sparse_density", "value")
+    machine_error_checker._findStackErrors.return_value = False
+    assert not machine_error_checker.stackHasErrors(stack)
+    assert machine_error_checker._findStackErrors.call_count == 2
+
+    # And also when the settings of the machine change.
+    machine_error_checker.startErrorCheck()
+    machine_error_checker.stackHasErrors(stack)
+    assert machine_error_checker._findStackErrors.call_count == 3
+
+
+def test_stackHasErrorsChangedDuringCheck(machine_error_checker):
+    stack = MagicMock()
+    stack.getId = MagicMock(return_value = "per_object_stack")
+    def findStackErrors(checked_stack):
+        # The user changes a setting of the stack while it's being checked on another thread.
+        on_stack_changed = stack.propertyChanged.connect.call_args[0][0]
+        on_stack_changed("infill_sparse_density", "value")
+        return True
+    machine_error_checker._findStackErrors = MagicMock(side_effect = findStackErrors)
+
+    assert machine_error_checker.stackHasErrors(stack)
+
+    # The result may be outdated, so it's not remembered.
+    machine_error_checker.stackHasErrors(stack)
+    assert machine_error_checker._findStackErrors.call_count == 2
+
+
+def test_stackHasErrorsForgetsRemovedStack(machine_error_checker):
+    stack = MagicMock()
+    stack.getId = MagicMock(return_value = "per_object_stack")
+    machine_error_checker._findStackErrors = MagicMock(return_value = False)
+    machine_error_checker.stackHasErrors(stack)
+    callback = stack.propertyChanged.connect.call_args[0][0]
+
+    machine_error_checker._onContainerRemoved(stack)
+
+    stack.propertyChanged.disconnect.assert_called_once_with(callback)
+    stack.containersChanged.disconnect.assert_called_once_with(callback)
+    assert machine_error_checker._stack_changed_callbacks == {}
+
+    # A new stack that gets the same ID is connected to again.
+    new_stack = MagicMock()
+    new_stack.getId = MagicMock(return_value = "per_object_stack")
+    machine_error_checker.stackHasErrors(new_stack)
+    assert new_stack.propertyChanged.connect.call_count == 1
+
+
+def test_getDependentKeys():
+    relations = {
+        "layer_height": [("wall_thickness", RelationType.RequiredByTarget), ("machine_height", RelationType.RequiresTarget)],
+        "wall_thickness": [("wall_line_count", RelationType.RequiredByTarget)],
+        "wall_line_count": [],
+        "machine_height": [("layer_height", RelationType.RequiredByTarget)]
+    }
+    def findDefinitions(key):
+        return [MagicMock(relations = [MagicMock(type = relation_type, target = MagicMock(key = target)) for target, relation_type in relations[key]])]
+    definition = MagicMock()
+    definition.findDefinitions = MagicMock(side_effect = findDefinitions)
+
+    assert ValidateSettingsJob.getDependentKeys(definition, ["layer_height"]) == {"layer_height", "wall_thickness", "wall_line_count"}
+    assert ValidateSettingsJob.getDependentKeys(definition, ["wall_line_count"]) == {"wall_line_count"}
+
+
+def test_applyIncrementalResult(machine_error_checker):
+    machine_error_checker._error_keys = {"extruder": {"layer_height", "wall_thickness"}}
+
+    job = ValidateSettingsJob(MagicMock(), {"layer_height"})
+    job._checked_keys = {"extruder": {"layer_height", "wall_line_count"}}
+    job._error_keys = {"extruder": {"wall_line_count"}}
+    machine_error_checker._check_job = job
+    machine_error_checker._onCheckJobFinished(job)
+
+    # Settings that were not checked again keep their errors.
+    assert machine_error_checker._error_keys == {"extruder": {"wall_thickness", "wall_line_count"}}
+    assert machine_error_checker.hasError
+    assert machine_error_checker.waitForResult(timeout = 0)
+
+
+def test_validateSettingsJobFinishesOnOwnThread():
+    job = ValidateSettingsJob(MagicMock(), {"layer_height"})
+    job.run = MagicMock(side_effect = RuntimeError("Failing on purpose."))
+    job.finished = MagicMock()
+
+    job._runOnOwnThread()
+
+    # Even if the check fails, the error checker needs to hear that it's done, or slicing would wait forever.
+    job.finished.emit.assert_called_once_with(job)
@@ -0,0 +1,74 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import gzip
+
+import pytest
+
+from cura.PrinterOutput.CompressGCodeJob import CompressGCodeJob, CompressedGCodeStream
+
+
+def createGCode(line_count):
+    return [";FLAVOR:Marlin\n"] + ["G1 X{x} Y{y} E{e:.5f}\n".format(x = i % 200, y = i % 150, e = i / 100) for i in range(line_count)]
+
+
+@pytest.mark.parametrize("line_count", [0, 10, 50000])
+def test_compressList(line_count):
+    gcode = createGCode(line_count)
+    stream = CompressedGCodeStream()
+    job = CompressGCodeJob(gcode, stream)
+
+    job.run()
+
+    data = bytes(stream.readAll())
+    assert gzip.decompress(data).decode("utf-8") == "".join(gcode)
+    assert job.getResult() == len(data)
+    assert stream.atEnd()
+
+
+def test_compressString():
+    gcode = "".join(createGCode(50000)) + ";MESH:würfel.stl\n"
+    stream = CompressedGCodeStream()
+
+    CompressGCodeJob(gcode, stream).run()
+
+    assert gzip.decompress(bytes(stream.readAll())).decode("utf-8") == gcode
+
+
+def test_readWhileAppending():
+    stream = CompressedGCodeStream()
+    assert stream.isSequential()
+    assert not stream.atEnd()  # Nothing to read yet, but more is coming.
+
+    stream.appendData(b"abc")
+    assert stream.bytesAvailable() == 3
+    assert bytes(stream.read(2)) == b"ab"
+    assert not stream.atEnd()
+
+    stream.appendData(b"def")
+    stream.finish()
+    assert bytes(stream.readAll()) == b"cdef"
+    assert stream.atEnd()
+    assert stream.getAppendedSize() == 6
+
+
+def test_abort():
+    stream = CompressedGCodeStream()
+    job = CompressGCodeJob(createGCode(1000), stream)
+    job.abort()
+
+    job.run()
+
+    assert job.getResult() is None
+    assert stream.isFinished()  # Whoever reads the stream doesn't wait for more.
+
+
+def test_onBatchCompressed():
+    stream = CompressedGCodeStream()
+    batches = []
+    job = CompressGCodeJob(createGCode(50000), stream, on_batch_compressed = batches.append)
+
+    job.run()
+
+    assert len(batches) > 1
+    assert all(batch_job is job for batch_job in batches)
@@ -1,8 +1,10 @@
+import gzip
 import time
 from unittest.mock import MagicMock, patch
 
 from PyQt5.QtNetwork import QNetworkAccessManager
 from PyQt5.QtCore import QUrl
+from cura.PrinterOutput.CompressGCodeJob import CompressedGCodeStream
 from cura.PrinterOutput.NetworkedPrinterOutputDevice import NetworkedPrinterOutputDevice, AuthState
 from cura.PrinterOutput.PrinterOutputDevice import ConnectionState
 
@@ -137,3 +139,49 @@ def test_timeout():
     assert output_device.connectionState == ConnectionState.Closed
 
 
+
+
+def test_putStream():
+    with patch("UM.Qt.QtApplication.QtApplication.getInstance"):
+        output_device = NetworkedPrinterOutputDevice(device_id="test", address="127.0.0.1", properties={})
+    mocked_network_manager = MagicMock()
+    output_device._manager = mocked_network_manager
+
+    reply = MagicMock()
+    reply.operation = MagicMock(return_value=QNetworkAccessManager.PutOperation)
+    reply.url = MagicMock(return_value=QUrl("127.0.0.1"))
+    mocked_network_manager.put = MagicMock(return_value = reply)
+
+    stream = CompressedGCodeStream()
+    output_device.put("whatever", stream)
+
+    # The stream is sent as it is, and kept alive while it's being sent.
+    assert mocked_network_manager.put.call_args[0][1] is stream
+    assert output_device._kept_alive_bodies[reply] is stream
+
+    output_device._handleOnFinished(reply)
+    assert reply not in output_device._kept_alive_bodies
+
+
+def test_compressGCode():
+    with patch("UM.Qt.QtApplication.QtApplication.getInstance"):
+        output_device = NetworkedPrinterOutputDevice(device_id="test", address="127.0.0.1", properties={})
+    output_device._gcode = [";FLAVOR:Marlin\n", "G28\n"] + ["G1 X10 Y10\n" * 1000] * 100
+
+    assert gzip.decompress(output_device._compressGCode()).decode("utf-8") == "".join(output_device._gcode)
+    assert not output_device._compressing_gcode
+    assert output_device._last_response_time is not None  # Compressing doesn't make the device time out.
+
+
+def test_compressGCodeAborted():
+    with patch("UM.Qt.QtApplication.QtApplication.getInstance"):
+        output_device = NetworkedPrinterOutputDevice(device_id="test", address="127.0.0.1", properties={})
+    output_device._gcode = [";FLAVOR:Marlin\n"] + ["G1 X10 Y10\n" * 100000] * 10
+
+    original_on_batch_compressed = output_device._onGCodeBatchCompressed
+    def abortSending(job):
+        output_device._compressing_gcode = False
+        original_on_batch_compressed(job)
+    output_device._onGCodeBatchCompressed = abortSending
+
+    assert output_device._compressGCode() is None
@@ -12,6 +12,7 @@ from UM.Settings.SettingInstance import InstanceState
 import UM.Settings.ContainerRegistry
 import UM.Settings.ContainerStack
 import UM.Settings.SettingDefinition #To add settings to the definition.
+from UM.Settings.SettingFunction import SettingFunction #To have settings that depend on other settings.
 
 from cura.Settings.cura_empty_instance_containers import empty_container
 
@@ -421,6 +422,38 @@ def test_getPropertyInstancesBeforeResolve(global_stack):
     assert global_stack.getProperty("material_bed_temperature", "value") == 10
 
 
+def test_getSettingsSnapshot(global_stack):
+    """Tests whether a settings snapshot has the same values as getProperty, evaluating shared settings only once."""
+
+    definition_values = {
+        "infill_sparse_density": 20,
+        "infill_line_distance": SettingFunction("infill_sparse_density * 2"),
+        "top_layers": SettingFunction("infill_sparse_density + 1")
+    }
+    value_queries = []
+    def getDefinitionProperty(key, property, context = None):
+        if property != "value":
+            return None
+        value_queries.append(key)
+        return definition_values.get(key)
+
+    definition = unittest.mock.MagicMock()
+    definition.getProperty = unittest.mock.MagicMock(side_effect = getDefinitionProperty)
+    definition.getAllKeys = unittest.mock.MagicMock(return_value = set(definition_values))
+    definition.findDefinitions = unittest.mock.MagicMock(return_value = [unittest.mock.MagicMock(relations = [])])
+    with unittest.mock.patch("cura.Settings.CuraContainerStack.DefinitionContainer", unittest.mock.MagicMock): #To guard against the type checking.
+        global_stack.definition = definition
+
+    snapshot = global_stack.getSettingsSnapshot()
+
+    assert dict(snapshot) == {"infill_sparse_density": 20, "infill_line_distance": 40, "top_layers": 21}
+    assert value_queries.count("infill_sparse_density") == 1 #Only evaluated once, even though other settings depend on it.
+    with pytest.raises(TypeError):
+        snapshot["top_layers"] = 3 #Snapshots are immutable.
+    assert global_stack.getProperty("top_layers", "value") == 21 #Outside of a snapshot, values are evaluated normally.
+    assert value_queries.count("infill_sparse_density") == 2
+
+
 def test_hasUserValueUserChanges(global_stack):
     """Tests whether the hasUserValue returns true for settings that are changed in the user-changes container."""
 
@@ -0,0 +1,82 @@
+# Copyright (c) 2020 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import gzip
+import io
+import random
+
+import pytest
+
+from cura.Utils.GzipStream import GzipStream, TextEncodingStream
+
+
+def createData(size):
+    generator = random.Random(size)
+    lines = []
+    length = 0
+    while length < size:
+        line = "G1 X{x:.3f} Y{y:.3f} E{e:.5f}\n".format(x = generator.uniform(0, 200), y = generator.uniform(0, 200), e = length / 1000)
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode("utf-8")
+
+
+@pytest.mark.parametrize("thread_count", [1, 2, 4])
+@pytest.mark.parametrize("size", [0, 10, 100000, 3 * GzipStream.block_size + 123])
+def test_decompress(thread_count, size):
+    data = createData(size)
+    output = io.BytesIO()
+
+    with GzipStream(output, thread_count = thread_count) as gzip_stream:
+        for start in range(0, len(data), 30000):  # Written in pieces, like the layers of g-code.
+            gzip_stream.write(data[start:start + 30000])
+
+    assert gzip.decompress(output.getvalue()) == data
+
+
+def test_compressesLikeGzip():
+    data = createData(200000)
+    output = io.BytesIO()
+
+    with GzipStream(output) as gzip_stream:
+        gzip_stream.write(data)
+
+    # Only the modification time in the header may differ.
+    expected = gzip.compress(data)
+    assert output.getvalue()[:4] == expected[:4]
+    assert output.getvalue()[8:] == expected[8:]
+
+
+def test_writeAfterClose():
+    gzip_stream = GzipStream(io.BytesIO())
+    gzip_stream.close()
+
+    with pytest.raises(ValueError):
+        gzip_stream.write(b"G28")
+
+
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_abort(thread_count):
+    output = io.BytesIO()
+
+    with pytest.raises(RuntimeError):
+        with GzipStream(output, thread_count = thread_count) as gzip_stream:
+            gzip_stream.write(createData(3 * GzipStream.block_size))
+            raise RuntimeError("The g-code writer failed.")
+
+    # Without the end of the data and the trailer, the incomplete data is not taken for a complete file.
+    with pytest.raises(EOFError):
+        gzip.decompress(output.getvalue())
+    with pytest.raises(ValueError):
+        gzip_stream.write(b"G28")
+
+
+def test_textEncodingStream():
+    output = io.BytesIO()
+
+    with GzipStream(output) as gzip_stream:
+        text_stream = TextEncodingStream(gzip_stream)
+        text_stream.write(";Generated with Cura\n")
+        text_stream.write(";MESH:würfel.stl\n")
+
+    assert gzip.decompress(output.getvalue()).decode("utf-8") == ";Generated with Cura\n;MESH:würfel.stl\n"
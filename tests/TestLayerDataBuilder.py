@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock
+
+import numpy
+
+from cura.LayerDataBuilder import LayerDataBuilder
+
+
+def createMockLayer(vertex_count, index_count):
+    """Creates a layer that fills its part of the arrays with a single line strip of vertex_count vertices."""
+
+    layer = MagicMock()
+    layer.lineMeshVertexCount = MagicMock(return_value = vertex_count)
+    layer.lineMeshElementCount = MagicMock(return_value = index_count)
+    layer.elementCount = index_count * 2
+
+    def build(vertex_offset, index_offset, vertices, colors, line_dimensions, feedrates, extruders, line_types, indices):
+        vertices[vertex_offset:vertex_offset + vertex_count] = 1
+        colors[vertex_offset:vertex_offset + vertex_count] = 1
+        line_dimensions[vertex_offset:vertex_offset + vertex_count] = 1
+        feedrates[vertex_offset:vertex_offset + vertex_count] = 1
+        extruders[vertex_offset:vertex_offset + vertex_count] = 0
+        line_types[vertex_offset:vertex_offset + vertex_count] = 1
+        indices[index_offset:index_offset + index_count] = numpy.arange(index_count).reshape((-1, 1)) + numpy.array([vertex_offset, vertex_offset + 1])
+        return vertex_offset + vertex_count, index_offset + index_count
+    layer.build = MagicMock(side_effect = build)
+    return layer
+
+
+def addMockLayer(builder, layer_number, vertex_count, index_count):
+    builder.addLayer(layer_number)
+    builder.getLayers()[layer_number] = createMockLayer(vertex_count, index_count)
+
+
+def test_build():
+    builder = LayerDataBuilder()
+    addMockLayer(builder, 0, 4, 3)
+    addMockLayer(builder, 1, 5, 4)
+
+    layer_data = builder.build(numpy.ones((1, 4), dtype = numpy.float32))
+
+    assert len(layer_data.getLayers()) == 2
+    assert layer_data.getElementCounts() == {0: 6, 1: 8}
+    assert layer_data.getAttribute("line_dimensions")["value"].shape == (9, 2)
+
+
+def test_buildIncremental():
+    builder = LayerDataBuilder()
+    material_color_map = numpy.ones((1, 4), dtype = numpy.float32)
+    addMockLayer(builder, 0, 4, 3)
+    first_layer_data = builder.build(material_color_map, incremental = True)
+
+    addMockLayer(builder, 1, 5, 4)
+    layer_data = builder.build(material_color_map, incremental = True)
+
+    # The first layer must not have been built again.
+    assert builder.getLayer(0).build.call_count == 1
+    assert len(first_layer_data.getLayers()) == 1
+    assert len(layer_data.getLayers()) == 2
+    assert layer_data.getElementCounts() == {0: 6, 1: 8}
+    assert layer_data.getAttribute("feedrates")["value"].shape == (9, )
+    # The indices of the appended layer refer to the vertices that come after the vertices of the first layer.
+    indices = layer_data.getIndices().reshape((-1, 2))
+    assert indices[3].tolist() == [4, 5]
+    assert indices[-1].tolist() == [7, 8]
+
+
+def test_buildIncrementalLayerInBetween():
+    builder = LayerDataBuilder()
+    material_color_map = numpy.ones((1, 4), dtype = numpy.float32)
+    addMockLayer(builder, 0, 4, 3)
+    addMockLayer(builder, 2, 4, 3)
+    builder.build(material_color_map, incremental = True)
+
+    addMockLayer(builder, 1, 5, 4)
+    layer_data = builder.build(material_color_map, incremental = True)
+
+    # The new layer had to go in between the other layers, so everything is built again.
+    assert builder.getLayer(0).build.call_count == 2
+    assert layer_data.getAttribute("line_types")["value"].shape == (13, )
+
+
+def test_buildIncrementalManyChunks():
+    builder = LayerDataBuilder()
+    material_color_map = numpy.ones((1, 4), dtype = numpy.float32)
+    buffers = []
+    for layer_number in range(100):
+        addMockLayer(builder, layer_number, 4, 3)
+        layer_data = builder.build(material_color_map, incremental = True)
+        if not buffers or layer_data.getVertices().base is not buffers[-1]:
+            buffers.append(layer_data.getVertices().base)
+
+    # The layers are built into the same buffers, which only grow now and then instead of with every build.
+    assert len(buffers) <= 8
+    assert layer_data.getVertices().shape == (400, 3)
+    assert not layer_data.getVertices().flags.writeable
+    assert layer_data.getIndices().reshape((-1, 2))[-1].tolist() == [398, 399]
+    assert layer_data.getAttribute("colors")["value"].shape == (400, 4)
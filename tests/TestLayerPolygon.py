@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import numpy
+import pytest
+
+from cura.LayerPolygon import LayerPolygon
+
+color_map = numpy.arange(12 * 4, dtype = numpy.float32).reshape((12, 4))
+
+
+def buildArrays(polygons):
+    vertex_count = sum(polygon.lineMeshVertexCount() for polygon in polygons)
+    index_count = sum(polygon.lineMeshElementCount() for polygon in polygons)
+    result = {
+        "vertices": numpy.zeros((vertex_count, 3), numpy.float32),
+        "colors": numpy.zeros((vertex_count, 4), numpy.float32),
+        "line_dimensions": numpy.zeros((vertex_count, 2), numpy.float32),
+        "feedrates": numpy.zeros((vertex_count, ), numpy.float32),
+        "extruders": numpy.zeros((vertex_count, ), numpy.float32),
+        "line_types": numpy.zeros((vertex_count, ), numpy.float32),
+        "indices": numpy.zeros((index_count, 2), numpy.int32)
+    }
+    vertex_offset = 0
+    index_offset = 0
+    for polygon in polygons:
+        polygon.build(vertex_offset, index_offset, result["vertices"], result["colors"], result["line_dimensions"], result["feedrates"], result["extruders"], result["line_types"], result["indices"])
+        vertex_offset += polygon.lineMeshVertexCount()
+        index_offset += polygon.lineMeshElementCount()
+    return result
+
+
+@patch("cura.LayerPolygon.LayerPolygon.getColorMap", return_value = color_map)
+def test_unknownLineTypes(get_color_map):
+    line_types = numpy.array([[1], [42], [3]], dtype = numpy.uint8)
+    polygon = LayerPolygon(0, line_types, numpy.zeros((4, 3), numpy.float32), numpy.ones((3, 1)), numpy.ones((3, 1)), numpy.ones((3, 1)))
+
+    assert polygon.types.ravel().tolist() == [1, LayerPolygon.NoneType, 3]
+
+
+@pytest.mark.parametrize("line_counts", [[3], [4, 1, 6], [2, 0, 5]])
+@patch("cura.LayerPolygon.LayerPolygon.getColorMap", return_value = color_map)
+def test_fromArrays(get_color_map, line_counts):
+    total_lines = sum(line_counts)
+    line_offsets = numpy.concatenate(([0], numpy.cumsum(line_counts)))
+    extruders = numpy.arange(len(line_counts))
+    line_types = numpy.array([1, 1, 8, 3, 3, 9, 6, 1, 1, 2, 0, 15, 4, 4, 4][:total_lines], dtype = numpy.uint8).reshape((-1, 1))
+    points = numpy.random.rand(total_lines + len(line_counts), 3).astype(numpy.float32)
+    line_widths = numpy.random.rand(total_lines, 1).astype(numpy.float32)
+    line_thicknesses = numpy.random.rand(total_lines, 1).astype(numpy.float32)
+    line_feedrates = numpy.random.rand(total_lines, 1).astype(numpy.float32)
+
+    batch_polygons = LayerPolygon.fromArrays(extruders, line_offsets, line_types, points, line_widths, line_thicknesses, line_feedrates)
+
+    single_polygons = []
+    for i in range(len(line_counts)):
+        begin, end = line_offsets[i], line_offsets[i + 1]
+        polygon = LayerPolygon(i, line_types[begin:end].copy(), points[begin + i:end + i + 1], line_widths[begin:end], line_thicknesses[begin:end], line_feedrates[begin:end])
+        polygon.buildCache()
+        single_polygons.append(polygon)
+
+    assert len(batch_polygons) == len(single_polygons)
+    for batch_polygon, single_polygon in zip(batch_polygons, single_polygons):
+        assert batch_polygon.extruder == single_polygon.extruder
+        assert batch_polygon.types.tolist() == single_polygon.types.tolist()
+        assert batch_polygon.jumpCount == single_polygon.jumpCount
+        assert batch_polygon.meshLineCount == single_polygon.meshLineCount
+        assert batch_polygon.lineMeshVertexCount() == single_polygon.lineMeshVertexCount()
+        assert batch_polygon.lineMeshElementCount() == single_polygon.lineMeshElementCount()
+
+    batch_result = buildArrays(batch_polygons)
+    single_result = buildArrays(single_polygons)
+    for key in batch_result:
+        assert numpy.array_equal(batch_result[key], single_result[key])